@@ -0,0 +1,125 @@
+# connection_bench.py — read-heavy throughput across threads
+# Runs the same mix of purse and sack reads with occasional purse writes on
+# 1..N threads, two ways: the old pattern, where every read and write opens
+# its own read-write connection and writers race in SQLite's busy handler,
+# and the split one, where reads go through each thread's cached read-only
+# connection and writes queue behind the file's single in-process writer.
+#
+#   python benchmarks/connection_bench.py --threads 1 2 4 8 --ops 4000
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ECONOMY_MODE"] = "global"  # One ledger file, so every thread shares its locks
+import pot
+
+ITEMS = [item for item, data in pot.ROYAL_MARKET.items() if data.get("type") != "title"]
+
+def legacy_connect():
+    return sqlite3.connect(pot.DB_NAME, timeout=pot.DB_BUSY_TIMEOUT)
+
+def legacy_read(user_id):
+    with legacy_connect() as db:
+        db.execute("SELECT gold, debt, debt_since, hp, hp_updated_at FROM economy WHERE user_id=?", (user_id,)).fetchone()
+        return db.execute("SELECT item, qty, equipped FROM inventory WHERE user_id=? ORDER BY item", (user_id,)).fetchall()
+
+def legacy_write(user_id, gold):
+    with legacy_connect() as db:
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("UPDATE economy SET gold=gold+? WHERE user_id=?", (gold, user_id))
+        db.commit()
+
+def split_read(user_id):
+    pot.get_pouch(user_id)
+    return pot.get_sack(user_id)
+
+def split_write(user_id, gold):
+    pot.add_coin(user_id, gold)
+
+def seed(users, rng):
+    with pot.db_connect() as db:
+        db.executemany("INSERT INTO economy (user_id, gold, hp) VALUES (?,?,?)", [(u, 1_000, pot.MAX_HP) for u in range(1, users + 1)])
+        db.executemany("INSERT INTO inventory (user_id, item, qty, equipped) VALUES (?,?,?,0)",
+                       [(u, item, rng.randint(1, 9)) for u in range(1, users + 1) for item in rng.sample(ITEMS, 8)])
+        db.commit()
+
+def total_gold():
+    with pot.db_connect() as db:
+        return db.execute("SELECT SUM(gold) FROM economy").fetchone()[0]
+
+def workload(ops, users, write_share, rng):
+    return [(rng.random() < write_share, rng.randint(1, users)) for _ in range(ops)]
+
+def run(threads, plans, read, write):
+    """Run one plan per thread; returns (seconds, reads, writes, write latencies, errors)"""
+    barrier = threading.Barrier(threads + 1)
+    latencies, errors, counts = [], [], [0, 0]
+    lock = threading.Lock()
+
+    def worker(plan):
+        mine, reads, writes = [], 0, 0
+        barrier.wait()
+        try:
+            for is_write, user_id in plan:
+                if is_write:
+                    started = time.perf_counter()
+                    write(user_id, 1)
+                    mine.append(time.perf_counter() - started)
+                    writes += 1
+                else:
+                    read(user_id)
+                    reads += 1
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+        finally:
+            pot.close_readers()
+            with lock:
+                latencies.extend(mine)
+                counts[0] += reads
+                counts[1] += writes
+
+    workers = [threading.Thread(target=worker, args=(plan,)) for plan in plans[:threads]]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - started, counts[0], counts[1], latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read-only connections against the shared pattern")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=4_000, help="operations per thread")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--writes", type=float, default=0.05, help="share of operations that write")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    os.chdir(tempfile.mkdtemp(prefix="connection_bench_"))
+    pot.init_db()
+    seed(args.users, rng)
+    plans = [workload(args.ops, args.users, args.writes, rng) for _ in range(max(args.threads))]
+    print(f"📚 {args.ops:,} ops per thread, {args.writes:.0%} writes, over {args.users:,} purses ({os.getcwd()})\n")
+    print(f"{'path':<8} {'threads':>7} {'reads/s':>12} {'writes/s':>10} {'write p50':>10} {'write p99':>10} {'errors':>7}")
+    for label, read, write in (("shared", legacy_read, legacy_write), ("split", split_read, split_write)):
+        for threads in args.threads:
+            before = total_gold()
+            elapsed, reads, writes, latencies, errors = run(threads, plans, read, write)
+            assert total_gold() - before == writes, "a write went missing"
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(f"{label:<8} {threads:>7} {reads / elapsed:>12,.0f} {writes / elapsed:>10,.0f} "
+                  f"{p50:>8.2f}ms {p99:>8.2f}ms {len(errors):>7}")
+    print("\n📊 every write landed exactly once on both paths")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# inventory_bench.py — sack mutation throughput
+# Compares the old read-then-replace inventory path (SELECT, then INSERT OR
+# REPLACE or UPDATE/DELETE, one connection per call) against the upsert
+# engine: single-statement add_item()/remove_item() and batched
+# change_items() applying a whole cart in one transaction.
+#
+#   python benchmarks/inventory_bench.py --ops 5000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ECONOMY_MODE"] = "global"  # Keep every user in one ledger file
+import pot
+
+ITEMS = [item for item, data in pot.ROYAL_MARKET.items() if data.get("type") != "title"]
+
+def legacy_add_item(user_id, item, qty=1, equipped=0, guild_id=None):
+    key = pot.ledger_key(user_id, guild_id)
+    with pot.ledger_connect(guild_id) as db:
+        old = db.execute(f"SELECT qty, equipped FROM inventory WHERE {pot.KEY_WHERE} AND item=?", (*key, item)).fetchone()
+        old_qty = old[0] if old else 0
+        old_equipped = old[1] if old else 0
+        db.execute(f"INSERT OR REPLACE INTO inventory ({pot.KEY_COLS}, item, qty, equipped) VALUES ({','.join('?' * len(key))},?,?,?)",
+                   (*key, item, old_qty + qty, max(old_equipped, equipped)))
+        db.commit()
+
+def legacy_remove_item(user_id, item, qty=1, guild_id=None):
+    key = pot.ledger_key(user_id, guild_id)
+    with pot.ledger_connect(guild_id) as db:
+        old = db.execute(f"SELECT qty FROM inventory WHERE {pot.KEY_WHERE} AND item=?", (*key, item)).fetchone()
+        if not old or old[0] < qty:
+            return False
+        new_qty = old[0] - qty
+        if new_qty <= 0:
+            db.execute(f"DELETE FROM inventory WHERE {pot.KEY_WHERE} AND item=?", (*key, item))
+        else:
+            db.execute(f"UPDATE inventory SET qty=? WHERE {pot.KEY_WHERE} AND item=?", (new_qty, *key, item))
+        db.commit()
+        return True
+
+def timed(label, count, unit, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<48} {elapsed * 1000:>9.1f} ms  {count / elapsed:>12,.0f} {unit}/s")
+
+def mutations(ops, users, rng):
+    """The same random workload for every path: (user, item, qty), adds then removes"""
+    adds = [(rng.randint(1, users), rng.choice(ITEMS), rng.randint(1, 5)) for _ in range(ops)]
+    return adds, [(user, item, 1) for user, item, _ in adds]
+
+def sack_rows():
+    with pot.db_connect() as db:
+        return db.execute("SELECT COUNT(*), COALESCE(SUM(qty), 0) FROM inventory").fetchone()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inventory mutations")
+    parser.add_argument("--ops", type=int, default=5_000, help="adds, then as many removes, per path")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cart", type=int, default=10, help="distinct wares per change_items() batch")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    os.chdir(tempfile.mkdtemp(prefix="inventory_bench_"))
+    pot.init_db()
+    adds, removes = mutations(args.ops, args.users, rng)
+    print(f"🎒 {args.ops:,} adds then {args.ops:,} removes across {args.users:,} sacks ({os.getcwd()})\n")
+
+    timed("legacy add_item: select + insert or replace", args.ops, "ops",
+          lambda: [legacy_add_item(*m) for m in adds])
+    timed("legacy remove_item: select + update/delete", args.ops, "ops",
+          lambda: [legacy_remove_item(*m) for m in removes])
+    legacy = sack_rows()
+    with pot.db_connect() as db:
+        db.execute("DELETE FROM inventory")
+        db.commit()
+
+    timed("add_item: upsert ... returning", args.ops, "ops",
+          lambda: [pot.add_item(user, item, qty) for user, item, qty in adds])
+    timed("remove_item: conditional update ... returning", args.ops, "ops",
+          lambda: [pot.remove_item(*m) for m in removes])
+    engine = sack_rows()
+    assert engine == legacy, (engine, legacy)
+
+    carts = []
+    for user, _, _ in adds[::args.cart]:
+        carts.append((user, {item: rng.randint(1, 5) for item in rng.sample(ITEMS, args.cart)}))
+    timed(f"change_items: {args.cart}-ware carts in, one commit each", len(carts) * args.cart, "ops",
+          lambda: [pot.change_items(user, cart) for user, cart in carts])
+    timed(f"change_items: {args.cart}-ware carts out, one commit each", len(carts) * args.cart, "ops",
+          lambda: [pot.change_items(user, {item: -qty for item, qty in cart.items()}) for user, cart in carts])
+    assert sack_rows() == engine
+    print(f"\n📊 {engine[0]:,} sack rows holding {engine[1]:,} goods, identical on both paths")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# memory_bench.py — discord.py cache footprint of each runtime profile
+# Feeds synthetic GUILD_CREATE and MESSAGE_CREATE payloads to a client built
+# with pot.client_options(), one fresh process per profile, and reports what
+# the caches hold: tracemalloc's count of live Python allocations and the
+# growth in resident set size, scaled per 10k guild members.
+#
+#   python benchmarks/memory_bench.py --members 100000 --guilds 10
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+PROFILES = [("default", "cache"), ("lean", "database")]
+
+def rss_kib():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+
+def member_payload(user_id, roles):
+    return {"user": {"id": str(user_id), "username": f"subject{user_id}", "discriminator": "0", "avatar": None, "global_name": None},
+            "roles": roles, "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "nick": None, "flags": 0}
+
+def guild_payload(guild_id, members):
+    roles = [{"id": str(guild_id * 100 + r), "name": f"role{r}", "permissions": "0", "position": r, "color": 0,
+              "hoist": False, "managed": False, "mentionable": False} for r in range(5)]
+    roles[0]["id"] = str(guild_id)  # @everyone shares the guild's id
+    return {"id": str(guild_id), "name": f"Realm {guild_id}", "member_count": members,
+            "roles": roles, "channels": [{"id": str(guild_id + 1), "type": 0, "name": "market", "position": 0, "permission_overwrites": []}],
+            "members": [member_payload(guild_id * 1_000_000 + i, [str(guild_id * 100 + 1 + i % 4)]) for i in range(members)]}
+
+def message_payload(guild, message_id):
+    member = guild["members"][message_id % len(guild["members"])]
+    return {"id": str(message_id), "channel_id": str(int(guild["id"]) + 1), "guild_id": guild["id"], "author": member["user"],
+            "member": {k: v for k, v in member.items() if k != "user"}, "content": "!pouch",
+            "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False, "mention_everyone": False,
+            "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+def measure(profile, directory, members, guilds, messages):
+    """Child process: build one client, fill its caches, report what they cost"""
+    import discord
+    import pot
+    per_guild = members // guilds
+    payloads = [guild_payload(g + 1, per_guild) for g in range(guilds)]
+    client = discord.Client(intents=pot.intents, **pot.client_options(profile, directory))
+    state = client._connection
+    rss_before = rss_kib()
+    tracemalloc.start()
+
+    async def feed():
+        for payload in payloads:
+            state._add_guild_from_data(payload)
+        for i in range(messages):
+            state.parse_message_create(message_payload(payloads[i % guilds], 10**12 + i))
+        await asyncio.sleep(0)  # Let the dispatched on_message events drain
+    asyncio.run(feed())
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cached = sum(len(guild.members) for guild in client.guilds)
+    return {"held": held, "rss": (rss_kib() - rss_before) * 1024, "members": cached,
+            "messages": len(state._messages or ())}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure discord.py cache memory per runtime profile")
+    parser.add_argument("--members", type=int, default=100_000, help="guild members across all guilds")
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=5_000, help="messages seen after startup")
+    parser.add_argument("--child", nargs=2, metavar=("PROFILE", "DIRECTORY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(*args.child, args.members, args.guilds, args.messages)))
+        return
+    print(f"👥 {args.members:,} members in {args.guilds} guilds, then {args.messages:,} messages\n")
+    print(f"{'profile':<10} {'cached members':>15} {'cached msgs':>12} {'python heap':>12} {'RSS growth':>12} {'heap/10k':>10} {'RSS/10k':>10}")
+    for profile, directory in PROFILES:
+        out = subprocess.run([sys.executable, __file__, "--members", str(args.members), "--guilds", str(args.guilds),
+                              "--messages", str(args.messages), "--child", profile, directory],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        scale = 10_000 / args.members
+        print(f"{profile:<10} {r['members']:>15,} {r['messages']:>12,} {r['held'] / 2**20:>10.1f}MB {r['rss'] / 2**20:>10.1f}MB "
+              f"{r['held'] * scale / 2**20:>8.2f}MB {r['rss'] * scale / 2**20:>8.2f}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# orderbook_bench.py — matching throughput of the player order book
+# Fills a scratch ledger with resting asks, then measures cold book loading,
+# in-memory heap matching against a linear best-price scan, end-to-end
+# place_order() transactions with settlement, and how a second process
+# catches up with orders placed elsewhere: patched from the change log
+# against a full reload.
+#
+#   python benchmarks/orderbook_bench.py --orders 100000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ECONOMY_MODE"] = "global"  # The seeding below writes single-column ledger keys
+import pot
+
+ITEM = "iron_ore"
+
+def seed_book(orders, sellers, rng):
+    with pot.db_connect() as db:
+        db.executemany(f"INSERT INTO economy ({pot.KEY_COLS}, gold, hp) VALUES (?,?,?)",
+                       [(seller, 0, pot.MAX_HP) for seller in range(1, sellers + 1)])
+        db.execute(f"INSERT INTO economy ({pot.KEY_COLS}, gold, hp) VALUES (?,?,?)", (0, pot.CAP_GOLD, pot.MAX_HP))
+        db.executemany("INSERT INTO orders (book, item, side, user_id, price, qty) VALUES (0,?,?,?,?,?)",
+                       [(ITEM, "ask", rng.randint(1, sellers), rng.randint(100, 1099), rng.randint(1, 10)) for _ in range(orders)])
+        db.execute("INSERT INTO order_books (book, item, seq) VALUES (0, ?, 1)", (ITEM,))
+        db.commit()
+
+def timed(label, count, unit, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<44} {elapsed * 1000:>9.1f} ms  {count / elapsed:>12,.0f} {unit}/s")
+    return result
+
+def heap_matching(book, trades, rng, next_id):
+    # Each incoming bid takes the best ask; a fresh ask keeps the book at size
+    for i in range(trades):
+        book.match("bid", 1100, rng.randint(1, 10))
+        book.rest(next_id + i, "ask", 1, rng.randint(100, 1099), rng.randint(1, 10))
+
+def scan_matching(resting, trades, rng, next_id):
+    for i in range(trades):
+        qty = rng.randint(1, 10)
+        while qty:
+            best = min(resting, key=lambda order_id: (resting[order_id][2], order_id))
+            fill = min(qty, resting[best][3])
+            resting[best][3] -= fill
+            qty -= fill
+            if not resting[best][3]:
+                del resting[best]
+        resting[next_id + i] = ["ask", 1, rng.randint(100, 1099), rng.randint(1, 10)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the order book matching engine")
+    parser.add_argument("--orders", type=int, default=100_000, help="resting asks on the book")
+    parser.add_argument("--trades", type=int, default=20_000, help="incoming orders matched in memory")
+    parser.add_argument("--scan-trades", type=int, default=100, help="incoming orders for the linear-scan baseline")
+    parser.add_argument("--db-trades", type=int, default=2_000, help="incoming orders placed through place_order()")
+    parser.add_argument("--sync-rounds", type=int, default=20, help="orders placed by another process, caught up one at a time")
+    parser.add_argument("--sellers", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    os.chdir(tempfile.mkdtemp(prefix="orderbook_bench_"))
+    pot.init_db()
+    seed_book(args.orders, args.sellers, rng)
+    print(f"📜 {args.orders:,} resting asks for {ITEM} from {args.sellers:,} sellers ({os.getcwd()})\n")
+
+    with pot.db_connect() as db:
+        book = timed("cold load into heaps", args.orders, "orders", lambda: pot.load_order_book(db, 0, ITEM))
+    next_id = max(book.orders) + 1
+    snapshot = {order_id: list(order) for order_id, order in book.orders.items()}
+    timed("heap matching, in memory", args.trades, "orders",
+          lambda: heap_matching(book, args.trades, rng, next_id))
+    timed("linear best-price scan, in memory", args.scan_trades, "orders",
+          lambda: scan_matching(snapshot, args.scan_trades, rng, next_id))
+
+    def place():
+        for _ in range(args.db_trades):
+            pot.place_order(0, "bid", ITEM, 1100, rng.randint(1, 10))
+    timed("place_order(): match + settle + commit", args.db_trades, "orders", place)
+
+    def catch_up(reload):
+        # This process keeps its book in _order_books; stand in for another one with a spare dict
+        ours, theirs = pot._order_books, {}
+        seconds = 0.0
+        for _ in range(args.sync_rounds):
+            pot._order_books = theirs
+            pot.place_order(0, "bid", ITEM, 1100, rng.randint(1, 10))
+            pot._order_books = ours
+            if reload:
+                ours.clear()
+            with pot.db_connect() as db:
+                started = time.perf_counter()
+                pot.load_order_book(db, 0, ITEM)
+                seconds += time.perf_counter() - started
+        print(f"{'catch up, ' + ('full reload' if reload else 'change log'):<44} {seconds * 1000 / args.sync_rounds:>9.2f} ms per order elsewhere")
+    catch_up(reload=True)
+    catch_up(reload=False)
+    with pot.db_connect() as db:
+        left = db.execute("SELECT COUNT(*), SUM(qty) FROM orders").fetchone()
+    print(f"\n📊 {left[0]:,} orders ({left[1]:,} goods) still resting")
+
+if __name__ == "__main__":
+    main()
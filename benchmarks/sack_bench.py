@@ -0,0 +1,96 @@
+# sack_bench.py — rendering cost of `!sack` for hoarders
+# Fills one sack with thousands of distinct wares, then times the old
+# rendering (get_inventory + get_equipped on two connections, an if/elif
+# chain per item, one ever-growing embed) against get_sack's single query,
+# the module-level category table and paged embeds.
+#
+#   python benchmarks/sack_bench.py --kinds 2000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ECONOMY_MODE"] = "global"  # The seeding below writes single-column ledger keys
+import pot
+
+USER = 1
+
+def seed_sack(kinds, rng):
+    # Every real ware, then made-up relics until the sack holds `kinds` of them
+    items = list(pot.ROYAL_MARKET) + [f"relic_{n:05d}" for n in range(max(0, kinds - len(pot.ROYAL_MARKET)))]
+    with pot.db_connect() as db:
+        db.executemany(f"INSERT INTO inventory ({pot.KEY_COLS}, item, qty, equipped) VALUES (?,?,?,?)",
+                       [(USER, item, rng.randint(1, 99), int(item in ("shortsword", "chainmail"))) for item in items[:kinds]])
+        db.commit()
+
+def legacy_render():
+    inventory = pot.get_inventory(USER)
+    categories = {name: {} for name in pot.SACK_CATEGORIES}
+    for item_key, qty in inventory.items():
+        item_type = pot.ROYAL_MARKET.get(item_key, {}).get("type", "misc")
+        item_name = item_key.replace('_', ' ').title()
+        if item_type == "weapon":
+            categories["⚔️ Weapons"][item_name] = qty
+        elif item_type == "armor":
+            categories["🛡️ Armor"][item_name] = qty
+        elif item_type == "magic":
+            categories["🔮 Magic"][item_name] = qty
+        elif item_type == "potion":
+            categories["🧪 Potions"][item_name] = qty
+        elif item_type in ["food", "drink"]:
+            categories["🍞 Provisions"][item_name] = qty
+        elif item_type == "tool":
+            categories["🛠️ Tools"][item_name] = qty
+        elif item_type == "luxury":
+            categories["💎 Luxuries"][item_name] = qty
+        elif item_type in ["companion", "mount"]:
+            categories["🐕 Companions"][item_name] = qty
+        elif item_type == "resource":
+            categories["⛏️ Resources"][item_name] = qty
+        elif item_type == "title":
+            categories["👑 Titles"][item_name] = qty
+        else:
+            categories["📦 Miscellaneous"][item_name] = qty
+    embed = pot.medieval_embed(title="🎒 Sack", description=f"**Total Items:** {sum(inventory.values())}", color_name="blue")
+    for category_name, items in categories.items():
+        if items:
+            embed.add_field(name=category_name, value="\n".join(f"• {k}: **{v}**" for k, v in items.items()), inline=False)
+    equipped = pot.get_equipped(USER)
+    if equipped:
+        embed.add_field(name="⚔️ Equipped", value=", ".join(e.replace('_', ' ').title() for e in equipped), inline=False)
+    return [embed]
+
+def paged_render():
+    return pot.sack_pages("Hoarder", pot.get_sack(USER), "More room for treasures and trinkets!")
+
+def within_limits(embed):
+    return (len(embed) <= pot.EMBED_TOTAL_LIMIT and len(embed.fields) <= pot.EMBED_MAX_FIELDS
+            and all(len(field.value) <= pot.EMBED_FIELD_LIMIT for field in embed.fields))
+
+def timed(label, renders, func):
+    started = time.perf_counter()
+    for _ in range(renders):
+        pages = func()
+    elapsed = time.perf_counter() - started
+    sendable = all(within_limits(page) for page in pages)
+    print(f"{label:<42} {elapsed * 1000 / renders:>8.2f} ms/render  {len(pages):>4} embed(s)  "
+          f"{'✅ sendable' if sendable else '❌ over Discord limits'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sack rendering")
+    parser.add_argument("--kinds", type=int, default=2_000, help="distinct wares in the sack")
+    parser.add_argument("--renders", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="sack_bench_"))
+    pot.init_db()
+    seed_sack(args.kinds, random.Random(args.seed))
+    print(f"🎒 one sack holding {args.kinds:,} kinds of ware ({os.getcwd()})\n")
+    timed("legacy: two queries, if/elif, one embed", args.renders, legacy_render)
+    timed("get_sack + category table + pages", args.renders, paged_render)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# write_behind_bench.py — commits saved by buffering cooldown stamps
+# Replays bursts of `!labour` and `!daily`, the commands that stamp
+# cooldowns: each checks its cooldown, credits its wage with add_coin (a
+# commit of its own either way) and stamps the cooldown. Users are drawn
+# without repeats, as each can only claim once per hour or day. The stamps
+# are written through one commit apiece, then through the write-behind
+# buffer's per-window group commits.
+#
+#   python benchmarks/write_behind_bench.py --commands 5000 --window-ms 10
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ECONOMY_MODE"] = "global"  # One ledger file, so commits are counted in one place
+import pot
+
+def commands(count, rng):
+    users = rng.sample(range(1, count * 10), count)
+    return [(user_id, rng.choice(("labour", "daily")), rng.randint(1, 10)) for user_id in users]
+
+async def replay(plan, burst):
+    """Run the plan in bursts, yielding to the loop between them as a busy bot would"""
+    for start in range(0, len(plan), burst):
+        for user_id, action, wage in plan[start:start + burst]:
+            if pot.get_cooldown(user_id, action) is None:
+                pot.add_coin(user_id, wage)
+                pot.set_cooldown(user_id, action)
+        await asyncio.sleep(0.002)
+    pot.write_behind.flush()
+
+def state():
+    with pot.db_connect() as db:
+        return (db.execute("SELECT SUM(gold) FROM economy").fetchone(),
+                db.execute("SELECT COUNT(*), COUNT(last_labour), COUNT(last_daily) FROM cooldowns").fetchone())
+
+def timed(label, plan, burst, window):
+    pot.write_behind = pot.WriteBehind(window)
+    with pot.db_connect() as db:
+        db.execute("DELETE FROM economy")
+        db.execute("DELETE FROM cooldowns")
+        db.commit()
+    started = time.perf_counter()
+    asyncio.run(replay(plan, burst))
+    elapsed = time.perf_counter() - started
+    stamps = pot.write_behind.commits
+    commits = len(plan) + stamps  # One add_coin commit per command, plus the stamp commits
+    print(f"{label:<30} {elapsed * 1000:>9.1f} ms  {len(plan) / elapsed:>9,.0f} commands/s  "
+          f"{stamps:>6,} stamp commits  {commits / len(plan):>5.2f} commits/command")
+    return state()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark write-behind group commits of cooldown stamps")
+    parser.add_argument("--commands", type=int, default=5_000)
+    parser.add_argument("--burst", type=int, default=20, help="commands handled between loop turns")
+    parser.add_argument("--window-ms", type=float, default=pot.WRITE_BEHIND_MS)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="write_behind_bench_"))
+    pot.init_db()
+    plan = commands(args.commands, random.Random(args.seed))
+    print(f"🔨 {args.commands:,} labour and daily claims by as many users ({os.getcwd()})\n")
+    through = timed("write-through", plan, args.burst, 0)
+    buffered = timed(f"write-behind, {args.window_ms:g} ms window", plan, args.burst, args.window_ms / 1000)
+    assert through == buffered, (through, buffered)
+    print("\n📊 purses and cooldown rows identical on both paths")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
 # royal_market.py — Royal Market Economy Bot (Python 3.13 Compatible)
 # Economy-only commands for medieval marketplace
+import asyncio
+import atexit
+import bisect
+import collections
+import contextlib
+import functools
+import heapq
+import json
+import math
 import os
 import random
+import signal
 import sqlite3
 import sys
+import threading
+import time
 import types
+import urllib.parse
+import uuid
+import weakref
+import zlib
 
 # ----- PATCH FOR PYTHON 3.13 -----
 # audioop was removed in Python 3.13, create a mock module
@@ -119,11 +135,15 @@ sys.modules['audioop'] = MockAudioop()
 
 # Now import discord
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 from datetime import timedelta, datetime as dt, timezone
 from discord.utils import utcnow
+try:
+    import numpy as np  # Optional: only batch duels and simulate.py use it
+except ImportError:
+    np = None
 
 # ---------- ENV ----------
 load_dotenv()
@@ -135,6 +155,17 @@ DAYS_BEFORE_PRISON = 3
 PRISON_ROLE_NAME = "Debtor"
 MAX_DAILY_GOLD = 10  # Maximum daily stipend
 DAILY_TAX = 4  # Daily royal tax deduction
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))  # Seconds to wait on a locked database
+COORDINATOR_URL = os.getenv("COORDINATOR_URL", "")  # "" = in-process, or unix:/path.sock / tcp://host:port
+LOCK_TIMEOUT = float(os.getenv("LOCK_TIMEOUT", "10"))  # Seconds to wait for a user's ledger lock
+ECONOMY_MODE = os.getenv("ECONOMY_MODE", "global")  # "global" = one purse per user, "guild" = one per (guild, user)
+ECONOMY_SHARDS = int(os.getenv("ECONOMY_SHARDS", "8"))  # Shard files used in per-guild mode
+SHARD_NAME = "royal_market_shard{}.db"
+PRICING_MODE = os.getenv("PRICING_MODE", "fixed")  # "fixed" = ROYAL_MARKET prices, "dynamic" = prices follow demand
+RUNTIME_PROFILE = os.getenv("RUNTIME_PROFILE", "default")  # "lean" = no member or message caches (see client_options)
+MEMBER_DIRECTORY = os.getenv("MEMBER_DIRECTORY", "database" if RUNTIME_PROFILE == "lean" else "cache")  # "cache" = full member lists in RAM, "database" = guild_members table
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "25"))  # Seconds a SIGTERM waits for jobs and queues to drain
+WRITE_BEHIND_MS = float(os.getenv("WRITE_BEHIND_MS", "10"))  # Most a cooldown stamp waits for its group commit; 0 = write through
 
 # ---------- MEDIEVAL FLAIR ----------
 MEDIEVAL_COLORS = {
@@ -200,39 +231,608 @@ def medieval_response(message, success=True, extra=""):
 
 # ---------- BOT ----------
 intents = discord.Intents.default()
-intents.members = True
+intents.members = True  # Member events feed the directory even when nothing is cached
 intents.message_content = True
-bot = commands.Bot(command_prefix=PREFIX, intents=intents, help_command=None, case_insensitive=True)
+
+def client_options(profile, directory):
+    """discord.py cache settings for a runtime profile.
+
+    The economy needs only user ids and a few roles, which arrive with every
+    command, so the lean profile caches no members (fetching one on the rare
+    occasion a job needs it, see resolve_member) and no messages. Its tax
+    must then run from the member directory.
+    """
+    if profile == "lean":
+        return {"member_cache_flags": discord.MemberCacheFlags.none(), "max_messages": None, "chunk_guilds_at_startup": False}
+    return {"chunk_guilds_at_startup": directory != "database"}
+
+bot = commands.Bot(command_prefix=PREFIX, intents=intents, help_command=None, case_insensitive=True,
+                   **client_options(RUNTIME_PROFILE, MEMBER_DIRECTORY))
 tree = bot.tree
 
+# ---------- COORDINATION ----------
+# Several bot processes may share one box and one database. Everything that
+# must hold across processes (ledger locks, once-only jobs, cache invalidation)
+# goes through the coordinator: in-process by default, or a small socket
+# server standing in for Redis when COORDINATOR_URL is set.
+class CoordinatorTimeout(Exception):
+    """Raised when a coordination lock cannot be acquired in time"""
+
+class LocalCoordinator:
+    """In-process coordinator for single-process deployments"""
+    def __init__(self):
+        self._locks = {}
+        self._claims = {}
+        self._subscribers = {}
+
+    async def claim(self, key, ttl):
+        now = time.monotonic()
+        expires = self._claims.get(key)
+        if expires is not None and expires > now:
+            return False
+        self._claims[key] = now + ttl
+        return True
+
+    async def release(self, key):
+        self._claims.pop(key, None)
+
+    async def acquire(self, key, ttl=30, timeout=LOCK_TIMEOUT):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._drop_lock(key, entry)
+            raise CoordinatorTimeout(key)
+        return entry
+
+    async def unlock(self, key, token):
+        token[0].release()
+        self._drop_lock(key, token)
+
+    def _drop_lock(self, key, entry):
+        entry[1] -= 1
+        if entry[1] == 0 and self._locks.get(key) is entry:
+            del self._locks[key]
+
+    async def publish(self, channel, message):
+        for callback in self._subscribers.get(channel, []):
+            callback(message)
+
+    async def subscribe(self, channel, callback):
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def _keep_alive(self, key, token, ttl):
+        """Task renewing a held lock's lease; in-process locks never expire"""
+        return None
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key, ttl=30, timeout=LOCK_TIMEOUT):
+        token = await self.acquire(key, ttl, timeout)
+        renewer = self._keep_alive(key, token, ttl)
+        try:
+            yield
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+            await self.unlock(key, token)
+
+    @contextlib.asynccontextmanager
+    async def user_locks(self, user_ids, scope="", ttl=30, timeout=LOCK_TIMEOUT):
+        # Sorted acquisition keeps two-party commands (pay, battle) deadlock-free
+        async with contextlib.AsyncExitStack() as stack:
+            for uid in sorted(set(user_ids)):
+                await stack.enter_async_context(self.lock(f"user:{scope}{uid}", ttl, timeout))
+            yield
+
+    async def close(self):
+        pass
+
+class SocketCoordinator(LocalCoordinator):
+    """Client for the coordinator server started with `python pot.py coordinator`"""
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._reader = None
+        self._writer = None
+        self._pending = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+        self._listener = None
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await open_coordinator_connection(self.url)
+            self._listener = asyncio.create_task(self._listen())
+            for channel in self._subscribers:
+                await self._call("subscribe", channel=channel)
+
+    async def _listen(self):
+        try:
+            while line := await self._reader.readline():
+                msg = json.loads(line)
+                if "event" in msg:
+                    for callback in self._subscribers.get(msg["event"], []):
+                        callback(msg["data"])
+                    continue
+                future = self._pending.pop(msg["id"], None)
+                if future and not future.done():
+                    future.set_result(msg)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("coordinator connection lost"))
+            self._pending.clear()
+            self._writer.close()
+
+    async def _call(self, op, **fields):
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._writer.write(json.dumps({"id": self._next_id, "op": op, **fields}).encode() + b"\n")
+        await self._writer.drain()
+        return await future
+
+    async def claim(self, key, ttl):
+        return (await self._call("claim", key=key, ttl=ttl))["ok"]
+
+    async def release(self, key):
+        await self._call("release", key=key)
+
+    async def acquire(self, key, ttl=30, timeout=LOCK_TIMEOUT):
+        token = uuid.uuid4().hex
+        reply = await self._call("lock", key=key, token=token, ttl=ttl, timeout=timeout)
+        if not reply["ok"]:
+            raise CoordinatorTimeout(key)
+        return token
+
+    async def unlock(self, key, token):
+        await self._call("unlock", key=key, token=token)
+
+    def _keep_alive(self, key, token, ttl):
+        return asyncio.create_task(self._renew_lease(key, token, ttl))
+
+    async def _renew_lease(self, key, token, ttl):
+        # A holder may outlive one lease (a whole tournament bracket, member
+        # fetches from Discord), so renew well before the server expires it
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                reply = await self._call("renew", key=key, token=token, ttl=ttl)
+            except ConnectionError:
+                return  # The server released everything this connection held
+            if not reply["ok"]:
+                print(f"⚠️ Lost the coordinator lease on {key}")
+                return
+
+    async def publish(self, channel, message):
+        await self._call("publish", channel=channel, data=message)
+
+    async def subscribe(self, channel, callback):
+        first = channel not in self._subscribers
+        self._subscribers.setdefault(channel, []).append(callback)
+        if first:
+            await self._call("subscribe", channel=channel)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+async def open_coordinator_connection(url):
+    if url.startswith("unix:"):
+        return await asyncio.open_unix_connection(url[len("unix:"):])
+    host, _, port = url.removeprefix("tcp://").rpartition(":")
+    return await asyncio.open_connection(host or "127.0.0.1", int(port))
+
+class CoordinatorServer:
+    """Local-socket stand-in for Redis: leased locks, TTL claims and pub/sub"""
+    def __init__(self):
+        self.claims = {}
+        self.locks = {}  # key -> [token, writer, expiry handle, waiters deque]
+        self.subscribers = {}
+
+    def _grant(self, key):
+        entry = self.locks[key]
+        while entry[3]:
+            token, writer, ttl, future = entry[3].popleft()
+            if future.done() or writer.is_closing():
+                continue
+            self._hold(key, entry, token, writer, ttl)
+            future.set_result(True)
+            return
+        del self.locks[key]
+
+    def _hold(self, key, entry, token, writer, ttl):
+        entry[0], entry[1] = token, writer
+        # Leases expire so a hung holder cannot wedge a user's ledger forever;
+        # live holders renew theirs while they work
+        entry[2] = asyncio.get_running_loop().call_later(ttl, self._expire, key, token)
+
+    def _renew(self, key, token, ttl):
+        entry = self.locks.get(key)
+        if not entry or entry[0] != token:
+            return False
+        entry[2].cancel()
+        entry[2] = asyncio.get_running_loop().call_later(ttl, self._expire, key, token)
+        return True
+
+    def _expire(self, key, token):
+        entry = self.locks.get(key)
+        if entry and entry[0] == token:
+            self._grant(key)
+
+    async def _lock(self, key, token, writer, ttl, timeout):
+        entry = self.locks.get(key)
+        if entry is None:
+            entry = self.locks[key] = [None, None, None, collections.deque()]
+            self._hold(key, entry, token, writer, ttl)
+            return True
+        future = asyncio.get_running_loop().create_future()
+        entry[3].append((token, writer, ttl, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def _unlock(self, key, token):
+        entry = self.locks.get(key)
+        if entry and entry[0] == token:
+            entry[2].cancel()
+            self._grant(key)
+
+    async def _dispatch(self, msg, writer):
+        op = msg["op"]
+        if op == "claim":
+            now = time.monotonic()
+            expires = self.claims.get(msg["key"])
+            ok = expires is None or expires <= now
+            if ok:
+                self.claims[msg["key"]] = now + msg["ttl"]
+            return {"ok": ok}
+        if op == "release":
+            self.claims.pop(msg["key"], None)
+        elif op == "lock":
+            return {"ok": await self._lock(msg["key"], msg["token"], writer, msg["ttl"], msg["timeout"])}
+        elif op == "unlock":
+            self._unlock(msg["key"], msg["token"])
+        elif op == "renew":
+            return {"ok": self._renew(msg["key"], msg["token"], msg["ttl"])}
+        elif op == "subscribe":
+            self.subscribers.setdefault(msg["channel"], set()).add(writer)
+        elif op == "publish":
+            event = json.dumps({"event": msg["channel"], "data": msg["data"]}).encode() + b"\n"
+            for peer in list(self.subscribers.get(msg["channel"], ())):
+                if peer.is_closing():
+                    self.subscribers[msg["channel"]].discard(peer)
+                else:
+                    peer.write(event)
+        return {"ok": True}
+
+    async def _serve_request(self, msg, writer):
+        reply = await self._dispatch(msg, writer)
+        if not writer.is_closing():
+            writer.write(json.dumps({"id": msg["id"], **reply}).encode() + b"\n")
+
+    async def handle_client(self, reader, writer):
+        tasks_ = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._serve_request(json.loads(line), writer))
+                tasks_.add(task)
+                task.add_done_callback(tasks_.discard)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            # A departed process gives up every lock it held
+            for key, entry in list(self.locks.items()):
+                if entry[1] is writer:
+                    entry[2].cancel()
+                    self._grant(key)
+            for peers in self.subscribers.values():
+                peers.discard(writer)
+
+    async def serve(self, url):
+        if url.startswith("unix:"):
+            path = url[len("unix:"):]
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            server = await asyncio.start_unix_server(self.handle_client, path)
+        else:
+            host, _, port = url.removeprefix("tcp://").rpartition(":")
+            server = await asyncio.start_server(self.handle_client, host or "127.0.0.1", int(port))
+        print(f"🕯️ Royal coordinator listening on {url}")
+        async with server:
+            await server.serve_forever()
+
+coordinator = SocketCoordinator(COORDINATOR_URL) if COORDINATOR_URL else LocalCoordinator()
+
+_background_tasks = set()
+
+def spawn(coro):
+    """Run a coroutine in the background without losing the task reference"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coro.close()
+        return None
+    task = loop.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+CACHE_INVALIDATORS = {}
+
+def on_invalidate(kind):
+    """Register a handler that drops a process-local cache entry of the given kind"""
+    def decorator(func):
+        CACHE_INVALIDATORS.setdefault(kind, []).append(func)
+        return func
+    return decorator
+
+def _apply_invalidation(message):
+    for handler in CACHE_INVALIDATORS.get(message["kind"], []):
+        handler(message["key"])
+
+def invalidate(kind, key):
+    """Drop a cache entry here and broadcast the invalidation to every other process"""
+    message = {"kind": kind, "key": key}
+    _apply_invalidation(message)
+    spawn(coordinator.publish("invalidate", message))
+
 # ---------- ECONOMY DB ----------
+# Writers use db_connect: a fresh connection whose `with` block holds its
+# file's in-process write lock, so writers in this process queue on a mutex
+# one at a time rather than spinning in SQLite's busy handler. Display paths
+# read through db_read instead: one read-only (mode=ro, query_only)
+# connection per thread and file, which WAL lets run beside the writer.
+_write_locks = {}  # absolute path -> RLock held by that file's current writer
+_readers = threading.local()
+
+class WriterConnection(sqlite3.Connection):
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self._write_lock = _write_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+    def __enter__(self):
+        self._write_lock.acquire()
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self._write_lock.release()
+
+def db_connect(path=DB_NAME):
+    # Other processes may hold the write lock; wait for it rather than fail
+    return sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT, factory=WriterConnection)
+
+def db_read(path=DB_NAME):
+    """This thread's read-only connection to a database file, opened on first use"""
+    readers = getattr(_readers, "connections", None)
+    if readers is None:
+        readers = _readers.connections = {}
+    db = readers.get(path)
+    if db is None:
+        uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+        db = readers[path] = sqlite3.connect(uri, uri=True, timeout=DB_BUSY_TIMEOUT)
+        db.execute("PRAGMA query_only=ON")
+    return db
+
+def close_readers():
+    """Close this thread's read-only connections"""
+    for db in getattr(_readers, "connections", {}).values():
+        db.close()
+    _readers.connections = {}
+
+# Ledger tables (economy, inventory, cooldowns) live either in the main
+# database keyed by user_id, or, in per-guild mode, keyed by (guild_id,
+# user_id) and partitioned across shard files by guild hash. Each shard has
+# its own write lock and its own, smaller B-trees.
+PER_GUILD_ECONOMY = ECONOMY_MODE == "guild"
+KEY_COLS = "guild_id, user_id" if PER_GUILD_ECONOMY else "user_id"
+KEY_WHERE = "guild_id=? AND user_id=?" if PER_GUILD_ECONOMY else "user_id=?"
+
+def key_join(left, right):
+    """SQL condition matching ledger rows of two table aliases"""
+    return " AND ".join(f"{left}.{col}={right}.{col}" for col in KEY_COLS.split(", "))
+
+def ledger_key(user_id, guild_id=None):
+    if not PER_GUILD_ECONOMY:
+        return (user_id,)
+    if guild_id is None:
+        raise ValueError("guild_id is required in per-guild economy mode")
+    return (guild_id, user_id)
+
+def shard_path(guild_id, shards=ECONOMY_SHARDS):
+    # crc32 rather than hash(): stable across processes and restarts
+    return SHARD_NAME.format(zlib.crc32(str(guild_id).encode()) % shards)
+
+def ledger_paths():
+    return [SHARD_NAME.format(i) for i in range(ECONOMY_SHARDS)] if PER_GUILD_ECONOMY else [DB_NAME]
+
+def ledger_file(guild_id=None):
+    if not PER_GUILD_ECONOMY:
+        return DB_NAME
+    if guild_id is None:
+        raise ValueError("guild_id is required in per-guild economy mode")
+    return shard_path(guild_id)
+
+def ledger_connect(guild_id=None):
+    return db_connect(ledger_file(guild_id))
+
+def ledger_read(guild_id=None):
+    return db_read(ledger_file(guild_id))
+
+def guild_of(ctx):
+    return ctx.guild.id if ctx and ctx.guild else None
+
+def create_ledger_tables(db, per_guild):
+    scope = "guild_id INTEGER, " if per_guild else ""
+    key = "guild_id, user_id" if per_guild else "user_id"
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS economy (
+        {scope}user_id INTEGER,
+        gold INTEGER DEFAULT 0,
+        debt INTEGER DEFAULT 0,
+        debt_since TEXT,
+        hp INTEGER DEFAULT 100,
+        hp_updated_at TEXT,
+        PRIMARY KEY ({key})
+    )""")
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS inventory (
+        {scope}user_id INTEGER,
+        item TEXT,
+        qty INTEGER,
+        equipped INTEGER DEFAULT 0,
+        PRIMARY KEY ({key}, item)
+    )""")
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS cooldowns (
+        {scope}user_id INTEGER,
+        last_labour TEXT,
+        last_daily TEXT,
+        last_gamble TEXT,
+        last_slots TEXT,
+        last_coinflip TEXT,
+        last_battle TEXT,
+        PRIMARY KEY ({key})
+    )""")
+    # Tournaments are always per guild, but live beside the purses that pay for them
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS tournaments (
+        guild_id INTEGER PRIMARY KEY,
+        channel_id INTEGER,
+        entry_fee INTEGER DEFAULT 0,
+        pot INTEGER DEFAULT 0,
+        round INTEGER DEFAULT 0
+    )""")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS tournament_entrants (
+        guild_id INTEGER,
+        user_id INTEGER,
+        eliminated_in INTEGER,
+        PRIMARY KEY (guild_id, user_id)
+    )""")
+    # Order books: `book` is the guild in per-guild mode, 0 for the global ledger
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id INTEGER PRIMARY KEY,
+        book INTEGER,
+        item TEXT,
+        side TEXT,
+        user_id INTEGER,
+        price INTEGER,
+        qty INTEGER,
+        placed_at TEXT
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS orders_by_item ON orders (book, item, side, price)")
+    db.execute("CREATE INDEX IF NOT EXISTS orders_by_user ON orders (book, user_id)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS order_books (
+        book INTEGER,
+        item TEXT,
+        seq INTEGER DEFAULT 0,
+        PRIMARY KEY (book, item)
+    )""")
+    # Which orders each seq touched, so other processes catch up without a full reload
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS order_changes (
+        book INTEGER,
+        item TEXT,
+        seq INTEGER,
+        order_id INTEGER,
+        PRIMARY KEY (book, item, seq, order_id)
+    )""")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS auctions (
+        auction_id INTEGER PRIMARY KEY,
+        guild_id INTEGER,
+        channel_id INTEGER,
+        seller_id INTEGER,
+        item TEXT,
+        qty INTEGER,
+        min_bid INTEGER,
+        high_bid INTEGER,
+        high_bidder INTEGER,
+        closes_at TEXT
+    )""")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS auction_bids (
+        auction_id INTEGER,
+        user_id INTEGER,
+        amount INTEGER,
+        placed_at TEXT
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS auction_bids_by_auction ON auction_bids (auction_id)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS guild_members (
+        guild_id INTEGER,
+        user_id INTEGER,
+        is_bot INTEGER DEFAULT 0,
+        role_bitmask INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    )""")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        job TEXT,
+        slot TEXT,
+        scope INTEGER,
+        cursor TEXT,
+        state TEXT,
+        done INTEGER DEFAULT 0,
+        PRIMARY KEY (job, slot, scope)
+    )""")
+
+# Safe column additions
+LEDGER_COLUMNS = [
+    ("economy", "hp", "INTEGER DEFAULT 100"),
+    ("economy", "hp_updated_at", "TEXT"),
+    ("inventory", "equipped", "INTEGER DEFAULT 0"),
+    ("cooldowns", "last_battle", "TEXT"),
+]
+GUILD_COLUMNS = [
+    ("guild_config", "baron_role", "INTEGER"),
+    ("guild_config", "viscount_role", "INTEGER"),
+    ("guild_config", "tax_roles", "TEXT"),
+    ("guild_config", "prison_role", "INTEGER"),
+]
+
+def add_columns(db, columns_to_add):
+    for table, column, col_type in columns_to_add:
+        try:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+        except sqlite3.OperationalError:
+            pass
+
+def start_hp_clocks(db):
+    # Wounds taken before hp_updated_at existed start healing from now
+    db.execute("UPDATE economy SET hp_updated_at=? WHERE hp_updated_at IS NULL AND hp < ?", (utcnow().isoformat(), MAX_HP))
+
 def init_db():
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("""
-        CREATE TABLE IF NOT EXISTS economy (
-            user_id INTEGER PRIMARY KEY,
-            gold INTEGER DEFAULT 0,
-            debt INTEGER DEFAULT 0,
-            debt_since TEXT,
-            hp INTEGER DEFAULT 100
-        )""")
+    with db_connect() as db:
+        # WAL lets readers in one process proceed while another process writes
+        db.execute("PRAGMA journal_mode=WAL")
+        # The main file always keeps the single-file ledger so that
+        # migrate-guilds has a source to read from
+        create_ledger_tables(db, per_guild=False)
         db.execute("""
-        CREATE TABLE IF NOT EXISTS inventory (
-            user_id INTEGER,
-            item TEXT,
-            qty INTEGER,
-            equipped INTEGER DEFAULT 0,
-            PRIMARY KEY (user_id, item)
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            last_slot TEXT,
+            finished_at TEXT
         )""")
         db.execute("""
-        CREATE TABLE IF NOT EXISTS cooldowns (
-            user_id INTEGER PRIMARY KEY,
-            last_labour TEXT,
-            last_daily TEXT,
-            last_gamble TEXT,
-            last_slots TEXT,
-            last_coinflip TEXT,
-            last_battle TEXT
+        CREATE TABLE IF NOT EXISTS market_demand (
+            item TEXT PRIMARY KEY,
+            volume REAL,
+            updated_at REAL
         )""")
         db.execute("""
         CREATE TABLE IF NOT EXISTS guild_config (
@@ -243,50 +843,249 @@ def init_db():
             tax_roles TEXT,
             prison_role INTEGER
         )""")
+        add_columns(db, GUILD_COLUMNS + LEDGER_COLUMNS)
+        start_hp_clocks(db)
+        db.commit()
+    if PER_GUILD_ECONOMY:
+        for path in ledger_paths():
+            with db_connect(path) as db:
+                db.execute("PRAGMA journal_mode=WAL")
+                create_ledger_tables(db, per_guild=True)
+                add_columns(db, LEDGER_COLUMNS)
+                start_hp_clocks(db)
+                db.commit()
 
-        # Safe column additions
-        columns_to_add = [
-            ("guild_config", "baron_role", "INTEGER"),
-            ("guild_config", "viscount_role", "INTEGER"),
-            ("guild_config", "tax_roles", "TEXT"),
-            ("guild_config", "prison_role", "INTEGER"),
-            ("economy", "hp", "INTEGER DEFAULT 100"),
-            ("inventory", "equipped", "INTEGER DEFAULT 0"),
-            ("cooldowns", "last_battle", "TEXT"),
-        ]
-        
-        for table, column, col_type in columns_to_add:
-            try:
-                db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
-            except sqlite3.OperationalError:
-                pass
+def directory_roster(guild_id):
+    """A guild's human members as the single-file ledger's member directory lists them"""
+    # Read from DB_NAME whatever the mode: it is where the directory was kept before the switch
+    with db_read(DB_NAME) as db:
+        return [uid for uid, in db.execute("SELECT user_id FROM guild_members WHERE guild_id=? AND is_bot=0", (guild_id,))]
 
-        db.commit()
+async def home_guilds(guild_ids):
+    """user_id -> the first of guild_ids the user belongs to.
+
+    Rosters come from the member directory, or from the REST member list for
+    guilds it never listed (MEMBER_DIRECTORY=cache keeps none).
+    """
+    rosters = {guild_id: directory_roster(guild_id) for guild_id in guild_ids}
+    unlisted = [guild_id for guild_id, roster in rosters.items() if not roster]
+    if unlisted:
+        # A bare client: the bot's setup_hook would start its jobs and queues
+        async with discord.Client(intents=intents) as client:
+            await client.login(TOKEN)
+            for guild_id in unlisted:
+                guild = await client.fetch_guild(guild_id)
+                rosters[guild_id] = [member.id async for member in guild.fetch_members(limit=None) if not member.bot]
+                print(f"👥 Guild {guild_id}: {len(rosters[guild_id])} members fetched")
+    homes = {}
+    for guild_id in guild_ids:
+        for user_id in rosters[guild_id]:
+            homes.setdefault(user_id, guild_id)
+    return homes
+
+def homeless_users(homes):
+    """Holders of purses, goods, resting orders or auction lots in the single-file ledger with no home among the migrated guilds"""
+    with db_read(DB_NAME) as db:
+        holders = {uid for uid, in db.execute("SELECT user_id FROM economy UNION SELECT user_id FROM inventory "
+                                              "UNION SELECT user_id FROM orders WHERE book=0 "
+                                              "UNION SELECT seller_id FROM auctions WHERE seller_id IS NOT NULL")}
+    return sorted(holders - homes.keys())
+
+def first_migration(db, guild_id, source, source_id):
+    """Mark a source row as migrated into a guild; False if an earlier run already moved it"""
+    return db.execute("INSERT OR IGNORE INTO migrated_rows (guild_id, source, source_id) VALUES (?,?,?)",
+                      (guild_id, source, source_id)).rowcount == 1
+
+def migrate_orders(db, guild_id, orders):
+    """Rest orders in the guild's own book, refunding the escrow of wares no longer traded; returns (rested, refunded)"""
+    rested, refunded, books = 0, 0, set()
+    for order_id, item, side, user_id, price, qty, placed_at in orders:
+        if not first_migration(db, guild_id, "orders", order_id):
+            continue
+        if tradeable(item):
+            db.execute("INSERT INTO orders (book, item, side, user_id, price, qty, placed_at) VALUES (?,?,?,?,?,?,?)",
+                       (guild_id, item, side, user_id, price, qty, placed_at))
+            books.add(item)
+            rested += 1
+        else:
+            if side == "bid":
+                credit_gold(db, user_id, price * qty, guild_id)
+            else:
+                credit_item(db, user_id, item, qty, guild_id)
+            refunded += 1
+    for item in books:
+        # A seq with no change logged makes any cached copy of the book reload
+        db.execute("INSERT OR IGNORE INTO order_books (book, item) VALUES (?,?)", (guild_id, item))
+        db.execute("UPDATE order_books SET seq=seq+1 WHERE book=? AND item=?", (guild_id, item))
+    return rested, refunded
+
+def migrate_auctions(db, guild_id, auctions, bids):
+    """Reopen a guild's auctions in its shard with their bids, or return a lot to its seller's
+    sack when the seller now lives in this guild but the lot's guild is another; returns (moved, returned)"""
+    moved = returned = 0
+    for auction_id, lot_guild, channel_id, seller_id, item, qty, min_bid, high_bid, high_bidder, closes_at in auctions:
+        if not first_migration(db, guild_id, "auctions", auction_id):
+            continue
+        if lot_guild != guild_id:
+            credit_item(db, seller_id, item, qty, guild_id)
+            returned += 1
+            continue
+        cur = db.execute("INSERT INTO auctions (guild_id, channel_id, seller_id, item, qty, min_bid, high_bid, high_bidder, closes_at) "
+                         "VALUES (?,?,?,?,?,?,?,?,?)",
+                         (guild_id, channel_id, seller_id, item, qty, min_bid, high_bid, high_bidder, closes_at))
+        db.executemany("INSERT INTO auction_bids (auction_id, user_id, amount, placed_at) VALUES (?,?,?,?)",
+                       [(cur.lastrowid, *bid) for bid in bids.get(auction_id, ())])
+        moved += 1
+    return moved, returned
+
+def migrate_tournament(db, guild_id, tournament, entrants):
+    """Carry a guild's proclaimed or half-fought tournament into its shard, pot and bracket intact.
+
+    If the shard already holds a tournament of its own, the old one's
+    entrants get their fees back there instead. Returns "moved", "refunded"
+    or None when there was nothing (new) to carry.
+    """
+    if tournament is None or not first_migration(db, guild_id, "tournaments", guild_id):
+        return None
+    channel_id, entry_fee, pot, round_no = tournament
+    if db.execute("SELECT 1 FROM tournaments WHERE guild_id=?", (guild_id,)).fetchone():
+        for user_id, _ in entrants:
+            if entry_fee:
+                credit_gold(db, user_id, entry_fee, guild_id)
+        return "refunded"
+    db.execute("INSERT INTO tournaments (guild_id, channel_id, entry_fee, pot, round) VALUES (?,?,?,?,?)",
+               (guild_id, channel_id, entry_fee, pot, round_no))
+    db.executemany("INSERT OR IGNORE INTO tournament_entrants (guild_id, user_id, eliminated_in) VALUES (?,?,?)",
+                   [(guild_id, *entrant) for entrant in entrants])
+    return "moved"
+
+def migrate_to_guild_shards(guild_ids, homes=None, shards=ECONOMY_SHARDS):
+    """Copy the single-file ledger into the per-guild shards of the given guilds.
+
+    Each user's purse, sack, cooldowns and resting orders move to their home
+    guild only (homes maps user_id -> guild_id, see home_guilds), so no gold
+    or goods are created; orders join the guild's own book, or are refunded
+    into the migrated purse or sack if their ware is no longer traded. Open
+    auctions move to their guild's shard with their bids when the Crown or
+    a member of that guild is selling; a lot listed in another guild than
+    its seller's home goes back into the seller's migrated sack, since the
+    seller could no longer be paid there. A guild's tournament moves with
+    its pot and bracket. Users without a listed home are left behind. With homes
+    None every listed guild gets a copy of every user, which multiplies the
+    economy and is only for starting fresh realms from one template. Rows
+    already present in a shard are left untouched, so the migration can be
+    re-run safely: migrated_rows records which orders, auctions and
+    tournaments each guild has received. The source is always the single-file ledger in DB_NAME;
+    the shards written are those of ECONOMY_SHARDS, so run it with the
+    settings the bot will use after the switch, and with the bot stopped.
+    """
+    write_behind.flush()
+    with db_connect() as src:
+        economy = src.execute("SELECT user_id, gold, debt, debt_since, hp, hp_updated_at FROM economy").fetchall()
+        inventory = src.execute("SELECT user_id, item, qty, equipped FROM inventory").fetchall()
+        cooldowns = src.execute(
+            "SELECT user_id, last_labour, last_daily, last_gamble, last_slots, last_coinflip, last_battle FROM cooldowns"
+        ).fetchall()
+        orders = src.execute("SELECT order_id, item, side, user_id, price, qty, placed_at FROM orders WHERE book=0").fetchall()
+        auctions = src.execute(f"SELECT {AUCTION_COLUMNS} FROM auctions").fetchall()
+        bids = collections.defaultdict(list)
+        for auction_id, *bid in src.execute("SELECT auction_id, user_id, amount, placed_at FROM auction_bids ORDER BY rowid"):
+            bids[auction_id].append(bid)
+        tournaments = {row[0]: row[1:] for row in src.execute("SELECT guild_id, channel_id, entry_fee, pot, round FROM tournaments")}
+        entrants = collections.defaultdict(list)
+        for guild_id, *entrant in src.execute("SELECT guild_id, user_id, eliminated_in FROM tournament_entrants"):
+            entrants[guild_id].append(entrant)
+
+    def rows_for(guild_id, rows):
+        return [(guild_id, *row) for row in rows if homes is None or homes.get(row[0]) == guild_id]
+
+    def orders_for(guild_id):
+        return [order for order in orders if homes is None or homes.get(order[3]) == guild_id]
+
+    def auction_home(auction):
+        """The guild whose shard takes an auction: its own, or its seller's to have the lot back"""
+        lot_guild, seller_id = auction[1], auction[3]
+        if homes is None or seller_id is None or homes.get(seller_id) == lot_guild:
+            return lot_guild if lot_guild in guild_ids else None
+        return homes.get(seller_id)
+
+    for guild_id in guild_ids:
+        path = shard_path(guild_id, shards)
+        purses = rows_for(guild_id, economy)
+        sacks = rows_for(guild_id, inventory)
+        with db_connect(path) as db:
+            create_ledger_tables(db, per_guild=True)
+            add_columns(db, LEDGER_COLUMNS)
+            db.execute("CREATE TABLE IF NOT EXISTS migrated_rows (guild_id INTEGER, source TEXT, source_id INTEGER, "
+                       "PRIMARY KEY (guild_id, source, source_id))")
+            # One transaction per guild, so a failed run leaves each guild either migrated or untouched
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("INSERT OR IGNORE INTO economy (guild_id, user_id, gold, debt, debt_since, hp, hp_updated_at) VALUES (?,?,?,?,?,?,?)",
+                           purses)
+            db.executemany("INSERT OR IGNORE INTO inventory (guild_id, user_id, item, qty, equipped) VALUES (?,?,?,?,?)",
+                           sacks)
+            db.executemany(
+                "INSERT OR IGNORE INTO cooldowns (guild_id, user_id, last_labour, last_daily, last_gamble, last_slots, last_coinflip, last_battle) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                rows_for(guild_id, cooldowns))
+            # After the purses, so refunds land in the migrated ones
+            rested, refunded = migrate_orders(db, guild_id, orders_for(guild_id))
+            moved, returned = migrate_auctions(db, guild_id, [a for a in auctions if auction_home(a) == guild_id], bids)
+            tourney = migrate_tournament(db, guild_id, tournaments.get(guild_id), entrants[guild_id])
+            db.commit()
+        print(f"📜 Guild {guild_id}: {len(purses)} purses, {len(sacks)} sack entries, "
+              f"{rested} orders rested, {refunded} refunded, {moved} auctions moved, {returned} lots returned"
+              f"{f', tournament {tourney}' if tourney else ''} -> {path}")
+    if homes is not None:
+        homeless = sum(1 for row in economy if row[0] not in homes)
+        if homeless:
+            print(f"⚠️ {homeless} purses belong to no listed guild's members and were not migrated")
+        stranded = sum(1 for order in orders if order[3] not in homes)
+        if stranded:
+            print(f"⚠️ {stranded} resting orders belong to no listed guild's members and stay in {DB_NAME}")
+    unplaced = sum(1 for auction in auctions if auction_home(auction) is None)
+    if unplaced:
+        print(f"⚠️ {unplaced} open auctions have neither their guild nor their seller's among those listed and stay in {DB_NAME}")
+    unlisted = [guild_id for guild_id in tournaments if guild_id not in guild_ids]
+    if unlisted:
+        print(f"⚠️ Tournaments of unlisted guilds {', '.join(map(str, unlisted))} stay in {DB_NAME}")
 
 # ---------- ECONOMY SYSTEM ----------
 CAP_GOLD = 5000000
 MAX_HP = 100
+HP_REGEN_PER_HOUR = 10  # Natural recovery, worked out whenever HP is read
 
-def get_pouch(user_id, ctx=None):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT gold, debt, debt_since, hp FROM economy WHERE user_id=?", (user_id,)).fetchone()
-        if not row:
-            db.execute("INSERT INTO economy (user_id, gold, hp) VALUES (?,?,?)", (user_id, 10, MAX_HP))
-            db.commit()
-            return 10, 0, None, MAX_HP
-        g, d, ds, hp = row
-        if ctx and ctx.guild:
-            member = ctx.guild.get_member(user_id)
-            if member and member.guild_permissions.administrator:
-                target_gold = CAP_GOLD // 2
-                if g < target_gold:
-                    db.execute("UPDATE economy SET gold=? WHERE user_id=?", (target_gold, user_id))
-                    db.commit()
-                    g = target_gold
-        return g, d, ds, hp
-
-def add_coin(user_id, gold=0, ctx=None):
-    current_gold, d, ds, hp = get_pouch(user_id, ctx)
+def hp_at(hp, hp_updated_at, now=None):
+    """HP after natural recovery since it was last written: min(MAX_HP, hp + rate × elapsed)"""
+    if hp >= MAX_HP or not hp_updated_at:
+        return min(hp, MAX_HP)
+    elapsed = ((now or utcnow()) - dt.fromisoformat(hp_updated_at).replace(tzinfo=timezone.utc)).total_seconds()
+    return min(MAX_HP, hp + int(max(0.0, elapsed) * HP_REGEN_PER_HOUR / 3600))
+
+def get_pouch(user_id, ctx=None, guild_id=None):
+    """A purse as (gold, debt, debt_since, hp); users without one see the newcomer's"""
+    guild_id = guild_id if guild_id is not None else guild_of(ctx)
+    with ledger_read(guild_id) as db:
+        row = db.execute(f"SELECT gold, debt, debt_since, hp, hp_updated_at FROM economy WHERE {KEY_WHERE}",
+                         ledger_key(user_id, guild_id)).fetchone()
+    g, d, ds, hp, hp_updated_at = row or (10, 0, None, MAX_HP, None)
+    return g, d, ds, hp_at(hp, hp_updated_at)
+
+def add_coin(user_id, gold=0, ctx=None, guild_id=None):
+    guild_id = guild_id if guild_id is not None else guild_of(ctx)
+    key = ledger_key(user_id, guild_id)
+    with ledger_connect(guild_id) as db:
+        # Read and write under one IMMEDIATE transaction so a concurrent
+        # process cannot slip a balance change in between
+        db.execute("BEGIN IMMEDIATE")
+        open_purses(db, [user_id], guild_id)
+        current_gold, d, ds = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+        new_gold, d, ds = settle_coin(current_gold, d, ds, gold)
+        db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}", (new_gold, d, ds, *key))
+        db.commit()
+
+def settle_coin(current_gold, d, ds, gold):
+    """Apply a gold change to a purse, paying debt first and running into debt below zero"""
     if gold > 0 and d > 0:
         pay_amount = min(gold, d)
         d -= pay_amount
@@ -300,83 +1099,206 @@ def add_coin(user_id, gold=0, ctx=None):
             ds = utcnow().isoformat()
         new_gold = 0
     new_gold = min(new_gold, CAP_GOLD)
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("UPDATE economy SET gold=?, debt=?, debt_since=? WHERE user_id=?", (new_gold, d, ds, user_id))
-        db.commit()
+    return new_gold, d, ds
 
-def set_debt(user_id, amount):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT debt_since FROM economy WHERE user_id=?", (user_id,)).fetchone()
+def set_debt(user_id, amount, guild_id=None):
+    key = ledger_key(user_id, guild_id)
+    with ledger_connect(guild_id) as db:
+        row = db.execute(f"SELECT debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
         ds = row[0] if row else None
         if amount > 0 and ds is None:
             ds = utcnow().isoformat()
         elif amount <= 0:
             ds = None
-        db.execute("UPDATE economy SET debt=?, debt_since=? WHERE user_id=?", (amount, ds, user_id))
+        db.execute(f"UPDATE economy SET debt=?, debt_since=? WHERE {KEY_WHERE}", (amount, ds, *key))
         db.commit()
 
-def update_hp(user_id, hp_change):
-    current_gold, d, ds, current_hp = get_pouch(user_id)
-    new_hp = max(0, min(MAX_HP, current_hp + hp_change))
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("UPDATE economy SET hp=? WHERE user_id=?", (new_hp, user_id))
-        db.commit()
-    return new_hp
+# ---------- WRITE-BEHIND BUFFER ----------
+# Labour and daily cooldown stamps are small and safe to lose for a few
+# milliseconds, so they wait here instead of committing one by one. Stamps
+# for the same user coalesce (the latest per action wins) and each ledger
+# file gets one group commit per WRITE_BEHIND_MS window. get_cooldown checks
+# the buffer first. Battle cooldowns are written with the duel itself.
+class PendingWrites:
+    __slots__ = ("guild_id", "user_id", "cooldowns")
+
+    def __init__(self, guild_id, user_id):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.cooldowns = {}  # action -> ISO timestamp
+
+class WriteBehind:
+    def __init__(self, window=WRITE_BEHIND_MS / 1000):
+        self.window = window
+        self._pending = {}  # ledger file -> {ledger key: PendingWrites}
+        self._timer = None
+        self.commits = 0
+        self.writes = 0
+
+    def _entry(self, user_id, guild_id):
+        users = self._pending.setdefault(ledger_file(guild_id), {})
+        key = ledger_key(user_id, guild_id)
+        entry = users.get(key)
+        if entry is None:
+            entry = users[key] = PendingWrites(guild_id, user_id)
+        return entry
+
+    def _peek(self, user_id, guild_id):
+        return self._pending.get(ledger_file(guild_id), {}).get(ledger_key(user_id, guild_id))
+
+    def _arm(self, delay):
+        """Flush after delay on the running loop; False outside one"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._timer is None:
+            self._timer = loop.call_later(delay, self.flush)
+        return True
+
+    def _schedule(self):
+        # Outside the bot's loop (scripts, migrations) every write goes through
+        if self.window <= 0 or not self._arm(self.window):
+            self.flush()
+
+    def stamp(self, user_id, guild_id, action_type, at):
+        self._entry(user_id, guild_id).cooldowns[action_type] = at
+        self._schedule()
+
+    def cooldown(self, user_id, guild_id, action_type):
+        entry = self._peek(user_id, guild_id)
+        return entry.cooldowns.get(action_type) if entry else None
+
+    def flush(self):
+        """Group-commit everything buffered, one transaction per ledger file"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        for path, users in pending.items():
+            try:
+                self._commit(path, list(users.values()))
+            except sqlite3.Error as e:
+                print(f"❌ Failed to write back {len(users)} buffered users to {path}: {e}")
+                # Keep what was not superseded meanwhile and try again shortly
+                newer = self._pending.setdefault(path, {})
+                for key, entry in users.items():
+                    latest = newer.setdefault(key, entry)
+                    if latest is not entry:
+                        latest.cooldowns = {**entry.cooldowns, **latest.cooldowns}
+        if self._pending:
+            self._arm(max(self.window, 1.0))
+
+    def _commit(self, path, entries):
+        with db_connect(path) as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(f"INSERT OR IGNORE INTO cooldowns ({KEY_COLS}) VALUES ({','.join('?' * len(KEY_COLS.split(',')))})",
+                           [ledger_key(e.user_id, e.guild_id) for e in entries])
+            for action_type in {action for e in entries for action in e.cooldowns}:
+                db.executemany(f"UPDATE cooldowns SET last_{action_type}=? WHERE {KEY_WHERE}",
+                               [(e.cooldowns[action_type], *ledger_key(e.user_id, e.guild_id))
+                                for e in entries if action_type in e.cooldowns])
+            db.commit()
+        self.commits += 1
+        self.writes += len(entries)
+
+write_behind = WriteBehind()
+atexit.register(write_behind.flush)
 
 # ---------- SEPARATE COOLDOWNS ----------
-def get_cooldown(user_id, action_type):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute(f"SELECT last_{action_type} FROM cooldowns WHERE user_id=?", (user_id,)).fetchone()
+def get_cooldown(user_id, action_type, guild_id=None):
+    stamp = write_behind.cooldown(user_id, guild_id, action_type)
+    if stamp is None:
+        with ledger_read(guild_id) as db:
+            row = db.execute(f"SELECT last_{action_type} FROM cooldowns WHERE {KEY_WHERE}", ledger_key(user_id, guild_id)).fetchone()
         if not row or not row[0]:
             return None
-        try:
-            return dt.fromisoformat(row[0]).replace(tzinfo=timezone.utc)
-        except ValueError:
-            return None
+        stamp = row[0]
+    try:
+        return dt.fromisoformat(stamp).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
 
-def set_cooldown(user_id, action_type):
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("INSERT OR IGNORE INTO cooldowns (user_id) VALUES (?)", (user_id,))
-        db.execute(f"UPDATE cooldowns SET last_{action_type}=? WHERE user_id=?", (utcnow().isoformat(), user_id))
-        db.commit()
+def set_cooldown(user_id, action_type, guild_id=None):
+    write_behind.stamp(user_id, guild_id, action_type, utcnow().isoformat())
 
 # ---------- INVENTORY ----------
-def add_item(user_id, item, qty=1, equipped=0):
-    with sqlite3.connect(DB_NAME) as db:
-        old = db.execute("SELECT qty, equipped FROM inventory WHERE user_id=? AND item=?", (user_id, item)).fetchone()
-        old_qty = old[0] if old else 0
-        old_equipped = old[1] if old else 0
-        db.execute("INSERT OR REPLACE INTO inventory (user_id, item, qty, equipped) VALUES (?,?,?,?)",
-                   (user_id, item, old_qty + qty, max(old_equipped, equipped)))
+# Every change to a sack is a single statement: an upsert that adds in place,
+# or a conditional UPDATE that only subtracts what is there. RETURNING hands
+# back the new quantity, so nothing has to be read first. The db-level
+# helpers run inside the caller's transaction; the rest commit on their own.
+def credit_item(db, user_id, item, qty, guild_id=None, equipped=0):
+    """Add goods to a sack and return how many are held now"""
+    key = ledger_key(user_id, guild_id)
+    return db.execute(f"INSERT INTO inventory ({KEY_COLS}, item, qty, equipped) VALUES ({','.join('?' * len(key))},?,?,?) "
+                      f"ON CONFLICT ({KEY_COLS}, item) DO UPDATE SET qty=qty+excluded.qty, equipped=max(equipped, excluded.equipped) "
+                      f"RETURNING qty", (*key, item, qty, equipped)).fetchone()[0]
+
+def take_item(db, user_id, item, qty, guild_id=None):
+    """Remove goods from a sack and return how many are left, or None if there were too few"""
+    key = ledger_key(user_id, guild_id)
+    row = db.execute(f"UPDATE inventory SET qty=qty-? WHERE {KEY_WHERE} AND item=? AND qty>=? RETURNING qty",
+                     (qty, *key, item, qty)).fetchone()
+    if row is None:
+        return None
+    if row[0] == 0:
+        db.execute(f"DELETE FROM inventory WHERE {KEY_WHERE} AND item=?", (*key, item))
+    return row[0]
+
+def add_item(user_id, item, qty=1, equipped=0, guild_id=None):
+    with ledger_connect(guild_id) as db:
+        held = credit_item(db, user_id, item, qty, guild_id, equipped)
         db.commit()
+    return held
 
-def remove_item(user_id, item, qty=1):
-    with sqlite3.connect(DB_NAME) as db:
-        old = db.execute("SELECT qty FROM inventory WHERE user_id=? AND item=?", (user_id, item)).fetchone()
-        if not old or old[0] < qty:
-            return False
-        new_qty = old[0] - qty
-        if new_qty <= 0:
-            db.execute("DELETE FROM inventory WHERE user_id=? AND item=?", (user_id, item))
-        else:
-            db.execute("UPDATE inventory SET qty=? WHERE user_id=? AND item=?", (new_qty, user_id, item))
+def remove_item(user_id, item, qty=1, guild_id=None):
+    with ledger_connect(guild_id) as db:
+        left = take_item(db, user_id, item, qty, guild_id)
         db.commit()
-        return True
+    return left is not None
+
+def apply_item_changes(db, user_id, changes, guild_id=None):
+    """change_items inside the caller's transaction, which must roll back if short"""
+    held = {}
+    for item, qty in changes.items():
+        if qty > 0:
+            held[item] = credit_item(db, user_id, item, qty, guild_id)
+        elif qty < 0:
+            held[item] = take_item(db, user_id, item, -qty, guild_id)
+            if held[item] is None:
+                return item, held
+    return None, held
+
+def change_items(user_id, changes, guild_id=None):
+    """Apply {item: +added or -removed} to one sack in one transaction.
 
-def get_inventory(user_id):
-    with sqlite3.connect(DB_NAME) as db:
-        rows = db.execute("SELECT item, qty FROM inventory WHERE user_id=?", (user_id,)).fetchall()
+    Returns (short, held): short is the first item whose removal could not be
+    covered, in which case nothing changes, and held maps each item changed
+    to its new quantity.
+    """
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        short, held = apply_item_changes(db, user_id, changes, guild_id)
+        if short:
+            db.rollback()
+            return short, {}
+        db.commit()
+    return None, held
+
+def get_inventory(user_id, guild_id=None):
+    with ledger_read(guild_id) as db:
+        rows = db.execute(f"SELECT item, qty FROM inventory WHERE {KEY_WHERE}", ledger_key(user_id, guild_id)).fetchall()
         return {r[0]: r[1] for r in rows} if rows else {}
 
-def has_item(user_id, item, qty=1):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT qty FROM inventory WHERE user_id=? AND item=?", (user_id, item)).fetchone()
+def has_item(user_id, item, qty=1, guild_id=None):
+    with ledger_read(guild_id) as db:
+        row = db.execute(f"SELECT qty FROM inventory WHERE {KEY_WHERE} AND item=?", (*ledger_key(user_id, guild_id), item)).fetchone()
         return row is not None and row[0] >= qty
 
-def equip_item(user_id, item):
+def equip_item(user_id, item, guild_id=None):
     item_data = ROYAL_MARKET.get(item, {})
     item_type = item_data.get("type")
-    if item_type not in ["weapon", "armor"] or not has_item(user_id, item):
+    if item_type not in ["weapon", "armor"] or not has_item(user_id, item, guild_id=guild_id):
         return False
     
     # Get all items of the same type
@@ -385,23 +1307,30 @@ def equip_item(user_id, item):
         if data.get("type") == item_type:
             same_type_items.append(item_key)
     
-    with sqlite3.connect(DB_NAME) as db:
+    key = ledger_key(user_id, guild_id)
+    with ledger_connect(guild_id) as db:
         # Unequip other items of same type
         if same_type_items:
             placeholders = ','.join(['?'] * len(same_type_items))
             db.execute(f"""
                 UPDATE inventory SET equipped=0
-                WHERE user_id=? AND item IN ({placeholders}) AND item !=?
-            """, (user_id, *same_type_items, item))
+                WHERE {KEY_WHERE} AND item IN ({placeholders}) AND item !=?
+            """, (*key, *same_type_items, item))
         
         # Equip the new item
-        db.execute("UPDATE inventory SET equipped=1 WHERE user_id=? AND item=?", (user_id, item))
+        db.execute(f"UPDATE inventory SET equipped=1 WHERE {KEY_WHERE} AND item=?", (*key, item))
         db.commit()
     return True
 
-def get_equipped(user_id):
-    with sqlite3.connect(DB_NAME) as db:
-        rows = db.execute("SELECT item FROM inventory WHERE user_id=? AND equipped=1", (user_id,)).fetchall()
+def get_sack(user_id, guild_id=None):
+    """(item, qty, equipped) for every ware held, in one query"""
+    with ledger_read(guild_id) as db:
+        return db.execute(f"SELECT item, qty, equipped FROM inventory WHERE {KEY_WHERE} ORDER BY item",
+                          ledger_key(user_id, guild_id)).fetchall()
+
+def get_equipped(user_id, guild_id=None):
+    with ledger_read(guild_id) as db:
+        rows = db.execute(f"SELECT item FROM inventory WHERE {KEY_WHERE} AND equipped=1", ledger_key(user_id, guild_id)).fetchall()
         return [row[0] for row in rows] if rows else []
 
 # ---------- ROYAL MARKETPLACE ----------
@@ -456,250 +1385,2302 @@ ROYAL_MARKET = {
     "baron_title": {"price": 100000, "desc": "Noble title of Baron", "type": "title", "use": "Grants noble privileges"},
     "viscount_title": {"price": 700000, "desc": "Noble title of Viscount", "type": "title", "use": "Grants higher noble privileges"},
 }
+# Wares that are never sold by the Crown, only crafted (see RECIPES)
+CRAFTED_GOODS = {
+    "iron_ingot": {"desc": "Iron smelted from good ore", "type": "resource", "use": "Smithing material"},
+    "leather": {"desc": "Furs tanned into supple hide", "type": "resource", "use": "Armouring material"},
+}
+WARES = {**ROYAL_MARKET, **CRAFTED_GOODS}  # Everything that can sit in a sack
 ITEMS_PER_PAGE = 8
 
+# Presentation tables, built once rather than on every market page, sack or use
+TYPE_ICONS = {
+    "weapon": "⚔️",
+    "armor": "🛡️",
+    "potion": "🧪",
+    "magic": "🔮",
+    "food": "🍞",
+    "drink": "🍺",
+    "tool": "🛠️",
+    "luxury": "💎",
+    "companion": "🐕",
+    "mount": "🐎",
+    "resource": "⛏️",
+    "title": "👑"
+}
+MISC_CATEGORY = "📦 Miscellaneous"
+TYPE_CATEGORY = {
+    "weapon": "⚔️ Weapons",
+    "armor": "🛡️ Armor",
+    "magic": "🔮 Magic",
+    "potion": "🧪 Potions",
+    "food": "🍞 Provisions",
+    "drink": "🍞 Provisions",
+    "tool": "🛠️ Tools",
+    "luxury": "💎 Luxuries",
+    "companion": "🐕 Companions",
+    "mount": "🐕 Companions",
+    "resource": "⛏️ Resources",
+    "title": "👑 Titles",
+}
+SACK_CATEGORIES = list(dict.fromkeys(TYPE_CATEGORY.values())) + [MISC_CATEGORY]  # Display order
+ITEM_CATEGORY = {item: TYPE_CATEGORY.get(data.get("type"), MISC_CATEGORY) for item, data in WARES.items()}
+USE_MESSAGES = {
+    "food": [
+        "Thou consumest the {item}. {effect}!",
+        "The {item} fills thy belly. {effect}!",
+        "Thou feastest upon the {item}. {effect}!",
+    ],
+    "drink": [
+        "Thou drinkest the {item}. {effect}!",
+        "The {item} quenches thy thirst. {effect}!",
+        "Thou raisest the {item} in toast. {effect}!",
+    ],
+    "potion": [
+        "Thou drinkest the {item}. {effect}!",
+        "The {item} takes effect. {effect}!",
+        "Thou consumest the mystical {item}. {effect}!",
+    ],
+    "weapon": [
+        "Thou wieldest the {item}. {effect}!",
+        "The {item} feels balanced in thy hand. {effect}!",
+        "Thou brandishest the {item}. {effect}!",
+    ],
+    "armor": [
+        "Thou donnest the {item}. {effect}!",
+        "The {item} protects thee. {effect}!",
+        "Thou equippest the protective {item}. {effect}!",
+    ],
+    "magic": [
+        "Thou channelest the {item}'s power. {effect}!",
+        "The {item} glows with energy. {effect}!",
+        "Thou employest the magical {item}. {effect}!",
+    ],
+    "tool": [
+        "Thou usest the {item}. {effect}!",
+        "The {item} serves thee well. {effect}!",
+        "Thou employest the practical {item}. {effect}!",
+    ],
+    "title": [
+        "Thou assumest the {item}. {effect}!",
+        "The {item} elevates thy status. {effect}!",
+    ]
+}
+DEFAULT_USE_MESSAGES = ["Thou usest the {item}. {effect}!"]
+
 # ---------- GUILD CONFIG FUNCTIONS ----------
-def set_market_channel(guild_id, channel_id):
-    with sqlite3.connect(DB_NAME) as db:
+# Guild config is read on every announcement and tax run but changes only on
+# admin commands, so each process caches it and drops entries on broadcast.
+GUILD_CONFIG_COLUMNS = ("market_channel", "baron_role", "viscount_role", "tax_roles", "prison_role")
+_guild_config_cache = {}
+
+def get_guild_config(guild_id):
+    config = _guild_config_cache.get(guild_id)
+    if config is None:
+        with db_connect() as db:
+            row = db.execute(f"SELECT {', '.join(GUILD_CONFIG_COLUMNS)} FROM guild_config WHERE guild_id=?", (guild_id,)).fetchone()
+        config = dict(zip(GUILD_CONFIG_COLUMNS, row or (None,) * len(GUILD_CONFIG_COLUMNS)))
+        _guild_config_cache[guild_id] = config
+    return config
+
+def set_guild_config(guild_id, column, value):
+    with db_connect() as db:
         db.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (guild_id,))
-        db.execute("UPDATE guild_config SET market_channel=? WHERE guild_id=?", (channel_id, guild_id))
+        db.execute(f"UPDATE guild_config SET {column}=? WHERE guild_id=?", (value, guild_id))
+        db.commit()
+    invalidate("guild_config", guild_id)
+
+@on_invalidate("guild_config")
+def _drop_guild_config(guild_id):
+    _guild_config_cache.pop(guild_id, None)
+
+def set_market_channel(guild_id, channel_id):
+    set_guild_config(guild_id, "market_channel", channel_id)
+
+def get_market_channel(guild_id):
+    return get_guild_config(guild_id)["market_channel"]
+
+def set_title_role(guild_id, title, role_id):
+    column = "baron_role" if title == "baron" else "viscount_role" if title == "viscount" else None
+    if column:
+        set_guild_config(guild_id, column, role_id)
+
+def get_title_role(guild_id, title):
+    column = "baron_role" if title == "baron" else "viscount_role" if title == "viscount" else None
+    if column:
+        return get_guild_config(guild_id)[column]
+    return None
+
+def set_tax_roles(guild_id, role_ids):
+    roles_str = ",".join(map(str, role_ids))
+    set_guild_config(guild_id, "tax_roles", roles_str)
+
+def get_tax_roles(guild_id):
+    return get_guild_config(guild_id)["tax_roles"]
+
+def set_prison_role(guild_id, role_id):
+    set_guild_config(guild_id, "prison_role", role_id)
+
+def get_prison_role(guild_id):
+    return get_guild_config(guild_id)["prison_role"]
+
+# ---------- MEMBER DIRECTORY ----------
+# With MEMBER_DIRECTORY=database the nightly tax never walks guild.members.
+# guild_members mirrors each roster: ids, the bot flag, and a bitmask of the
+# guild's tax roles a member holds (bit i for the i-th role in tax_roles).
+# Join, leave and role-change events keep it current, so the bot can skip
+# chunking guilds at startup, and taxpayers and recipients become SQL
+# queries. A guild is backfilled from the REST member list the first time it
+# is seen and whenever its tax roles change, since the bits follow that list.
+# Discord only reports role changes for members already in the cache, so
+# members running commands are re-checked too, and the few tax recipients
+# are fetched afresh before each night's takings are shared.
+_directory_masks = {}  # (guild_id, user_id) -> bitmask last written for a command user
+
+def tax_role_ids(guild_id):
+    return [int(r) for r in (get_tax_roles(guild_id) or "").split(',') if r]
+
+def role_bitmask(member, tracked):
+    held = {role.id for role in member.roles}
+    return sum(1 << bit for bit, role_id in enumerate(tracked) if role_id in held)
+
+def record_members(guild_id, members, tracked=None):
+    tracked = tax_role_ids(guild_id) if tracked is None else tracked
+    with ledger_connect(guild_id) as db:
+        db.executemany("INSERT INTO guild_members (guild_id, user_id, is_bot, role_bitmask) VALUES (?,?,?,?) "
+                       "ON CONFLICT (guild_id, user_id) DO UPDATE SET is_bot=excluded.is_bot, role_bitmask=excluded.role_bitmask",
+                       [(guild_id, m.id, int(m.bot), role_bitmask(m, tracked)) for m in members])
+        db.commit()
+
+def forget_member(guild_id, user_id):
+    _directory_masks.pop((guild_id, user_id), None)
+    with ledger_connect(guild_id) as db:
+        db.execute("DELETE FROM guild_members WHERE guild_id=? AND user_id=?", (guild_id, user_id))
+        db.commit()
+
+def touch_member(member):
+    """Refresh a command user's row if their tax roles changed unseen"""
+    mask = role_bitmask(member, tax_role_ids(member.guild.id))
+    if _directory_masks.get((member.guild.id, member.id)) != mask:
+        record_members(member.guild.id, [member])
+        _directory_masks[(member.guild.id, member.id)] = mask
+
+def directory_taxpayers(db, guild_id, cursor):
+    """The next JOB_CHUNK human members after cursor, in id order"""
+    return [uid for uid, in db.execute("SELECT user_id FROM guild_members WHERE guild_id=? AND is_bot=0 AND user_id>? "
+                                       "ORDER BY user_id LIMIT ?", (guild_id, cursor or 0, JOB_CHUNK))]
+
+def directory_recipients(guild_id):
+    with ledger_read(guild_id) as db:
+        return [uid for uid, in db.execute("SELECT user_id FROM guild_members WHERE guild_id=? AND role_bitmask!=0 "
+                                           "ORDER BY user_id", (guild_id,))]
+
+async def verify_recipients(guild, user_ids):
+    """Re-fetch the directory's tax recipients, recording what changed unseen; returns those still entitled"""
+    tracked = tax_role_ids(guild.id)
+    entitled, fetched = [], []
+    for user_id in user_ids:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            forget_member(guild.id, user_id)  # Left without a leave event reaching us
+            continue
+        except discord.HTTPException:
+            entitled.append(user_id)  # Cannot check now; the directory's word stands
+            continue
+        fetched.append(member)
+        if role_bitmask(member, tracked):
+            entitled.append(user_id)
+    if fetched:
+        record_members(guild.id, fetched, tracked)
+    return entitled
+
+def in_directory(guild_id, user_id):
+    with ledger_read(guild_id) as db:
+        return db.execute("SELECT 1 FROM guild_members WHERE guild_id=? AND user_id=?", (guild_id, user_id)).fetchone() is not None
+
+async def resolve_member(guild, user_id):
+    """A guild member from the cache, or fetched when the lean profile keeps none"""
+    member = guild.get_member(user_id)
+    if member is not None or RUNTIME_PROFILE != "lean":
+        return member
+    # The directory knows who belongs where, which saves a request per stranger
+    if MEMBER_DIRECTORY == "database" and not in_directory(guild.id, user_id):
+        return None
+    try:
+        return await guild.fetch_member(user_id)
+    except discord.HTTPException:
+        return None
+
+async def backfill_directory(guild):
+    """Rewrite a guild's rows from the REST member list, streamed in batches and never cached"""
+    tracked = tax_role_ids(guild.id)
+    seen, batch = set(), []
+    async for member in guild.fetch_members(limit=None):
+        seen.add(member.id)
+        batch.append(member)
+        if len(batch) == JOB_CHUNK:
+            record_members(guild.id, batch, tracked)
+            batch = []
+    record_members(guild.id, batch, tracked)
+    with ledger_connect(guild.id) as db:
+        stale = [(guild.id, uid) for uid, in db.execute("SELECT user_id FROM guild_members WHERE guild_id=?", (guild.id,))
+                 if uid not in seen]
+        db.executemany("DELETE FROM guild_members WHERE guild_id=? AND user_id=?", stale)
         db.commit()
+    _directory_masks.clear()
+
+async def backfill_new_guilds():
+    for guild in bot.guilds:
+        with ledger_connect(guild.id) as db:
+            known = db.execute("SELECT 1 FROM guild_members WHERE guild_id=? LIMIT 1", (guild.id,)).fetchone()
+        if not known:
+            try:
+                await backfill_directory(guild)
+            except discord.HTTPException as e:
+                print(f"❌ Failed to list the members of {guild.name}: {e}")
+
+# ---------- OUTBOUND QUEUE ----------
+# Background jobs hand their Discord side effects (role changes, market
+# announcements, DMs) to this queue and return in database time. Delivery
+# drains asynchronously under per-route rate limits and bounded concurrency.
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "4"))
+OUTBOUND_MAX_RETRIES = 5
+# Route family -> (burst, refill per second), kept under Discord's published buckets
+ROUTE_LIMITS = {
+    "channel": (5, 1.0),
+    "roles": (10, 1.0),
+    "dm": (5, 1.0),
+}
+
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+class OutboundAction:
+    __slots__ = ("route", "kind", "target", "payload", "on_success", "attempts")
+
+    def __init__(self, route, kind, target, payload, on_success=None):
+        self.route = route
+        self.kind = kind
+        self.target = target
+        self.payload = payload
+        self.on_success = on_success
+        self.attempts = 0
+
+class OutboundQueue:
+    def __init__(self, concurrency=OUTBOUND_CONCURRENCY, max_retries=OUTBOUND_MAX_RETRIES):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._queue = asyncio.Queue()
+        self._buckets = {}
+        self._workers = []
+        self._retries = {}  # Action -> backoff timer that queues it again
+        self.delivered = 0
+        self.dropped = 0
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self, timeout):
+        """Deliver everything queued so far, retries included; False if the deadline passed"""
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                # Cut backoffs short: each waiting action is queued again at once
+                for action, timer in list(self._retries.items()):
+                    timer.cancel()
+                    self._requeue(action)
+                await asyncio.wait_for(self._queue.join(), max(0, deadline - time.monotonic()))
+                if not self._retries:
+                    return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _bucket(self, route):
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = TokenBucket(*ROUTE_LIMITS[route.partition(":")[0]])
+        return bucket
+
+    def _put(self, action):
+        self._queue.put_nowait(action)
+
+    def send(self, channel, content=None, embed=None, embeds=None):
+        self._put(OutboundAction(f"channel:{channel.id}", "send", channel, {"content": content, "embed": embed, "embeds": embeds}))
+
+    def dm(self, user, embed):
+        self._put(OutboundAction("dm", "dm", user, {"embed": embed}))
+
+    def add_role(self, member, role, on_success=None):
+        self._put(OutboundAction(f"roles:{member.guild.id}", "add_role", member, {"role": role}, on_success=on_success))
+
+    def remove_role(self, member, role, on_success=None):
+        self._put(OutboundAction(f"roles:{member.guild.id}", "remove_role", member, {"role": role}, on_success=on_success))
+
+    async def _deliver(self, action):
+        target = action.target
+        if action.kind == "send":
+            await target.send(**{k: v for k, v in action.payload.items() if v is not None})
+        elif action.kind == "dm":
+            await target.send(embed=action.payload["embed"])
+        elif action.kind == "add_role":
+            if action.payload["role"] not in target.roles:
+                await target.add_roles(action.payload["role"])
+        elif action.kind == "remove_role":
+            if action.payload["role"] in target.roles:
+                await target.remove_roles(action.payload["role"])
+
+    def _retry_later(self, action, delay):
+        # A loop timer, not a background task, so settle_tasks never cancels a retry
+        self._retries[action] = asyncio.get_running_loop().call_later(delay, self._requeue, action)
+
+    def _requeue(self, action):
+        self._retries.pop(action, None)
+        self._put(action)
+
+    async def _worker(self):
+        while True:
+            action = await self._queue.get()
+            try:
+                await asyncio.sleep(self._bucket(action.route).reserve())
+                await self._deliver(action)
+                self.delivered += 1
+                if action.on_success:
+                    action.on_success()
+            except (discord.Forbidden, discord.NotFound):
+                self.dropped += 1  # Missing permissions or target gone; retrying cannot help
+            except (discord.HTTPException, OSError, asyncio.TimeoutError) as e:
+                action.attempts += 1
+                if action.attempts > self.max_retries or (isinstance(e, discord.HTTPException) and e.status < 500 and e.status != 429):
+                    self.dropped += 1
+                    print("📯 Outbound action dropped:", action.kind, action.route, e)
+                else:
+                    self._retry_later(action, min(60, 2 ** action.attempts) + random.random())
+            except Exception as e:
+                self.dropped += 1
+                print("📯 Outbound action failed:", action.kind, action.route, type(e).__name__, e)
+            finally:
+                self._queue.task_done()
+
+outbound = OutboundQueue()
+
+# ---------- MARKET HERALD ----------
+# Market-channel news is buffered per guild for ANNOUNCE_WINDOW seconds and
+# cried as one digest embed, split only where Discord's size limits force it.
+ANNOUNCE_WINDOW = float(os.getenv("ANNOUNCE_WINDOW", "60"))
+EMBED_FIELD_LIMIT = 1024
+EMBED_MAX_FIELDS = 25
+EMBED_TOTAL_LIMIT = 6000
+EMBEDS_PER_MESSAGE = 10
+HERALD_SECTIONS = {
+    "tax": "💰 Royal Tax Collection",
+    "prison": "⚖️ Cast into Debtor's Prison",
+    "release": "🏰 Released from Debtor's Prison",
+}
+
+def pack_lines(title, lines):
+    """Pack lines into (name, value) embed fields of at most EMBED_FIELD_LIMIT characters"""
+    fields = []
+    name, chunk = title, ""
+    for line in lines:
+        line = line[:EMBED_FIELD_LIMIT]
+        if chunk and len(chunk) + 1 + len(line) > EMBED_FIELD_LIMIT:
+            fields.append((name, chunk))
+            name, chunk = f"{title} (cont.)", ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        fields.append((name, chunk))
+    return fields
+
+def pack_embeds(fields, title, description, footer, color_name="gold"):
+    """Spread fields over as few embeds as Discord's size limits allow"""
+    embeds = []
+    embed, size = None, 0
+    for name, value in fields:
+        if embed is None or len(embed.fields) >= EMBED_MAX_FIELDS or size + len(name) + len(value) > EMBED_TOTAL_LIMIT - 500:
+            embed = medieval_embed(
+                title=title if not embeds else f"{title} (cont.)",
+                description=description if not embeds else "",
+                color_name=color_name
+            )
+            embed.set_footer(text=footer)
+            embeds.append(embed)
+            size = len(embed.title) + len(embed.description) + len(embed.footer.text)
+        embed.add_field(name=name, value=value, inline=False)
+        size += len(name) + len(value)
+    return embeds
+
+def pack_messages(embeds):
+    """Group embeds into messages; Discord's 6000-character limit covers a message's embeds together"""
+    messages, size = [], 0
+    for embed in embeds:
+        if not messages or len(messages[-1]) >= EMBEDS_PER_MESSAGE or size + len(embed) > EMBED_TOTAL_LIMIT:
+            messages.append([])
+            size = 0
+        messages[-1].append(embed)
+        size += len(embed)
+    return messages
+
+def digest_fields(sections):
+    fields = []
+    for kind, title in HERALD_SECTIONS.items():
+        fields += pack_lines(title, sections.get(kind, []))
+    return fields
+
+def digest_embeds(sections):
+    counts = ", ".join(f"{len(sections[k])} {k}" for k in HERALD_SECTIONS if sections.get(k))
+    return pack_embeds(digest_fields(sections), "📯 The Town Crier's Digest",
+                       "**Hear ye, hear ye!** The news of the realm:", f"By royal decree of the realm • {counts}")
+
+class Herald:
+    def __init__(self, window=ANNOUNCE_WINDOW):
+        self.window = window
+        self._buffers = {}  # guild_id -> (guild, {kind: [lines]})
+        self._timers = {}
+
+    def announce(self, guild, kind, line):
+        _, sections = self._buffers.setdefault(guild.id, (guild, {}))
+        sections.setdefault(kind, []).append(line)
+        if guild.id not in self._timers:
+            self._timers[guild.id] = spawn(self._flush_later(guild.id))
+
+    async def _flush_later(self, guild_id):
+        await asyncio.sleep(self.window)
+        self._timers.pop(guild_id, None)
+        self.flush_guild(guild_id)
+
+    def flush_guild(self, guild_id):
+        guild, sections = self._buffers.pop(guild_id, (None, None))
+        if not sections:
+            return
+        market_chan_id = get_market_channel(guild_id)
+        chan = guild.get_channel(market_chan_id) if market_chan_id else None
+        if not chan:
+            return
+        for message in pack_messages(digest_embeds(sections)):
+            outbound.send(chan, embeds=message)
+
+    def flush(self):
+        """Cry every buffered digest now, e.g. before shutting down"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for guild_id in list(self._buffers):
+            self.flush_guild(guild_id)
+
+herald = Herald()
+
+# ---------- JOB SCHEDULER ----------
+# Nightly jobs run once per wall-clock slot (00:00 UTC plus the job's offset)
+# instead of every 24 hours from whenever the process last started. The slot
+# each job last finished is kept in scheduled_jobs, so restarts neither repeat
+# a night nor skip one: slots missed while the bot was down are run on the
+# next start. A coordinator claim is the per-job mutex across processes, and
+# offsets plus jitter keep heavy jobs from starting together.
+JOB_LOCK_TTL = 3600  # A job's claim outlives any run; a crashed holder's lapses
+JOB_JITTER = 120  # Up to this many seconds of random delay before each run
+JOB_RECHECK = 300  # Longest the scheduler sleeps between looks at the clock
+EPOCH = dt(1970, 1, 1, tzinfo=timezone.utc)
+
+class Job:
+    __slots__ = ("name", "func", "period", "offset", "catch_up")
+
+    def __init__(self, name, func, period, offset, catch_up):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.offset = offset
+        self.catch_up = catch_up  # Most missed slots replayed after downtime
+
+    def slot(self, now):
+        """Start of the latest slot at or before now"""
+        return EPOCH + self.offset + (now - EPOCH - self.offset) // self.period * self.period
+
+    def due(self, last_slot, now):
+        """Slots owed since last_slot, oldest first; only the current one for a job never run"""
+        current = self.slot(now)
+        if last_slot is None:
+            return [current]
+        count = min((current - last_slot) // self.period, self.catch_up)
+        return [current - self.period * i for i in reversed(range(count))]
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        self._running = set()
+        self._task = None
+
+    def job(self, period=timedelta(days=1), offset=timedelta(0), catch_up=1):
+        """Register an async func(slot) to run once per period, offset from 00:00 UTC"""
+        def decorator(func):
+            self.jobs[func.__name__] = Job(func.__name__, func, period, offset, catch_up)
+            return func
+        return decorator
+
+    def last_slots(self):
+        with db_connect() as db:
+            return {name: dt.fromisoformat(slot) for name, slot in db.execute("SELECT name, last_slot FROM scheduled_jobs")}
+
+    def finish(self, job, slot):
+        with db_connect() as db:
+            db.execute("INSERT OR REPLACE INTO scheduled_jobs (name, last_slot, finished_at) VALUES (?,?,?)",
+                       (job.name, slot.isoformat(), utcnow().isoformat()))
+            db.commit()
+
+    def start(self):
+        self._task = spawn(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self):
+        await bot.wait_until_ready()
+        while True:
+            now = utcnow()
+            last = self.last_slots()
+            for job in self.jobs.values():
+                if job.name not in self._running and job.due(last.get(job.name), now):
+                    self._running.add(job.name)
+                    spawn(self.run(job))
+            wake = min(job.slot(now) + job.period for job in self.jobs.values())
+            await asyncio.sleep(min((wake - now).total_seconds(), JOB_RECHECK))
+
+    async def run(self, job):
+        try:
+            await asyncio.sleep(random.uniform(0, JOB_JITTER))
+            if not await coordinator.claim(f"job:{job.name}", JOB_LOCK_TTL):
+                return  # Another process is on it; its record will show next look
+            try:
+                # Read again under the claim: another process may have just finished
+                for slot in job.due(self.last_slots().get(job.name), utcnow()):
+                    await job.func(slot)
+                    self.finish(job, slot)
+            finally:
+                await coordinator.release(f"job:{job.name}")
+        except Exception as e:
+            print(f"❌ Scheduled job {job.name} failed: {e}")
+        finally:
+            self._running.discard(job.name)
+
+scheduler = Scheduler()
+
+# ---------- CHUNKED JOBS ----------
+# Nightly jobs walk the ledgers JOB_CHUNK rows at a time. Each chunk commits
+# in the same transaction as a checkpoint row in that ledger's
+# job_checkpoints table, so a crash loses at most the chunk in flight and a
+# restart resumes after the last one committed, never redoing one. The loop
+# yields between chunks so commands keep flowing during a long run.
+JOB_CHUNK = 500
+
+async def run_chunked(connect, job, slot, scope, step):
+    """Drive step(db, cursor, state) -> next cursor, or None when finished, one chunk per transaction.
+
+    cursor and state must be JSON-serialisable; state is a dict the step may
+    update. Returns the final state, or None if this slot was already done.
+    """
+    slot = slot.isoformat()
+    while True:
+        with connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT cursor, state, done FROM job_checkpoints WHERE job=? AND slot=? AND scope=?",
+                             (job, slot, scope)).fetchone()
+            if row and row[2]:
+                db.rollback()
+                return None
+            if row is None:
+                # A fresh slot; earlier slots' checkpoints are finished with
+                db.execute("DELETE FROM job_checkpoints WHERE job=? AND scope=?", (job, scope))
+            cursor = json.loads(row[0]) if row else None
+            state = json.loads(row[1]) if row else {}
+            cursor = step(db, cursor, state)
+            db.execute("INSERT OR REPLACE INTO job_checkpoints (job, slot, scope, cursor, state, done) VALUES (?,?,?,?,?,?)",
+                       (job, slot, scope, json.dumps(cursor), json.dumps(state), cursor is None))
+            db.commit()
+        if cursor is None:
+            return state
+        await asyncio.sleep(0)
+
+def chunked_state(connect, job, slot, scope):
+    """The state a finished run_chunked walk left for this slot, {} if none is recorded"""
+    with connect() as db:
+        row = db.execute("SELECT state FROM job_checkpoints WHERE job=? AND slot=? AND scope=? AND done",
+                         (job, slot.isoformat(), scope)).fetchone()
+    return json.loads(row[0]) if row else {}
+
+def economy_after(db, columns, where, cursor, params=()):
+    """The next JOB_CHUNK economy rows matching where, in ledger key order after cursor"""
+    after = f" AND ({KEY_COLS}) > ({','.join('?' * len(cursor))})" if cursor else ""
+    return db.execute(f"SELECT {KEY_COLS}, {columns} FROM economy WHERE {where}{after} ORDER BY {KEY_COLS} LIMIT ?",
+                      (*params, *(cursor or ()), JOB_CHUNK)).fetchall()
+
+def next_cursor(rows):
+    """Key of the last row of a full chunk, or None when the walk is done"""
+    return list(rows[-1][:len(KEY_COLS.split(","))]) if len(rows) == JOB_CHUNK else None
+
+# ---------- DEBT & PRISON ----------
+@scheduler.job(catch_up=7)
+async def levy_debt_interest(slot):
+    # Interest compounds for every night missed while the bot was down
+    for path in ledger_paths():
+        await run_chunked(functools.partial(db_connect, path), "levy_debt_interest", slot, 0, levy_chunk)
+    # Sentences only depend on today's debts, so replayed nights need not pass them
+    if slot == scheduler.jobs["levy_debt_interest"].slot(utcnow()):
+        await check_prison_sentences(slot)
+
+def levy_chunk(db, cursor, state):
+    rows = economy_after(db, "debt", "debt > 0", cursor)
+    db.executemany(f"UPDATE economy SET debt=? WHERE {KEY_WHERE}",
+                   [(int(debt * (1 + DEBT_INTEREST_RATE)), *key) for *key, debt in rows])
+    return next_cursor(rows)
+
+async def check_prison_sentences(slot):
+    # Sentences are checkpointed with the walk and carried out once it is done,
+    # so a crash or shutdown before the roles are granted leaves them to the rerun
+    sentenced = []
+    for path in ledger_paths():
+        connect = functools.partial(db_connect, path)
+        state = await run_chunked(connect, "check_prison_sentences", slot, 0, prison_chunk)
+        if state is None:
+            state = chunked_state(connect, "check_prison_sentences", slot, 0)
+        sentenced += state.get("sentenced", [])
+    for key in sentenced:
+        await imprison(key)  # Already-imprisoned debtors are skipped, so a rerun grants nothing twice
+
+def prison_chunk(db, cursor, state):
+    # ISO timestamps sort as text, so the sentence test runs in SQL
+    cutoff = (utcnow() - timedelta(days=DAYS_BEFORE_PRISON)).isoformat()
+    rows = economy_after(db, "debt_since", "debt > 0 AND debt_since <= ?", cursor, (cutoff,))
+    state.setdefault("sentenced", []).extend(key for *key, _ in rows)
+    return next_cursor(rows)
+
+async def imprison(key):
+    uid = key[-1]
+    # A per-guild debt only imprisons in the guild that holds it
+    guilds = [bot.get_guild(key[0])] if PER_GUILD_ECONOMY else bot.guilds
+    for guild in guilds:
+        if guild is None:
+            continue
+        member = await resolve_member(guild, uid)
+        if not member:
+            continue
+        
+        # Get prison role from config or fallback to name
+        prison_role_id = get_prison_role(guild.id)
+        if prison_role_id:
+            role = guild.get_role(prison_role_id)
+        else:
+            role = discord.utils.get(guild.roles, name=PRISON_ROLE_NAME)
+            
+        if role and role not in member.roles:
+            outbound.add_role(member, role, on_success=functools.partial(announce_prisoner, guild, member))
+
+def announce_prisoner(guild, member):
+    herald.announce(guild, "prison", f"• {member.display_name}")
+
+def announce_release(guild, member):
+    herald.announce(guild, "release", f"• {member.display_name}")
+
+# ---------- DAILY TAX COLLECTION ----------
+TAX_SAMPLE = 10  # Taxed subjects named in the announcement
+
+def levy_tax(db, guild_id, member_ids, state):
+    """Charge DAILY_TAX to each member inside the caller's transaction, tallying what was collected"""
+    for key in open_purses(db, member_ids, guild_id):
+        gold, debt, debt_since = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+        new_gold, debt, debt_since = settle_coin(gold, debt, debt_since, -DAILY_TAX)
+        db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}", (new_gold, debt, debt_since, *key))
+        if gold > new_gold:
+            state["total"] = state.get("total", 0) + gold - new_gold
+            state["taxed"] = state.get("taxed", 0) + 1
+            if len(state.setdefault("sample", [])) < TAX_SAMPLE:
+                state["sample"].append([key[-1], gold - new_gold])
+
+def share_tax(db, guild_id, recipient_ids, total):
+    share, remainder = divmod(total, len(recipient_ids))
+    for i, recipient_id in enumerate(recipient_ids):
+        credit_gold(db, recipient_id, share + (1 if i < remainder else 0), guild_id)
+
+@scheduler.job(offset=timedelta(minutes=30))
+async def collect_royal_tax(slot):
+    # Half an hour after interest, so the two heavy jobs never overlap
+    for guild in bot.guilds:
+        tracked = set(tax_role_ids(guild.id))
+        if not tracked:
+            continue
+
+        # Taxpayers in id order, so a resumed run picks up after the last chunk
+        if MEMBER_DIRECTORY == "database":
+            recipients = await verify_recipients(guild, directory_recipients(guild.id))
+            taxpayers = functools.partial(directory_taxpayers, guild_id=guild.id)
+        else:
+            member_ids = sorted(m.id for m in guild.members if not m.bot)
+            recipients = [m.id for m in guild.members if any(r.id in tracked for r in m.roles)]
+
+            def taxpayers(db, cursor):
+                start = bisect.bisect_right(member_ids, cursor) if cursor is not None else 0
+                return member_ids[start:start + JOB_CHUNK]
+
+        def tax_chunk(db, cursor, state):
+            chunk = taxpayers(db, cursor=cursor)
+            levy_tax(db, guild.id, chunk, state)
+            if len(chunk) == JOB_CHUNK:
+                return chunk[-1]
+            # The last chunk shares out the whole night's takings
+            if recipients:
+                share_tax(db, guild.id, recipients, state.get("total", 0))
+            return None
+
+        state = await run_chunked(functools.partial(ledger_connect, guild.id), "collect_royal_tax", slot, guild.id, tax_chunk)
+        if state is None or not recipients:
+            continue
+
+        # Announce in the market digest
+        total_tax = state.get("total", 0)
+        herald.announce(guild, "tax", f"**{total_tax}** gold hath been collected and distributed amongst the nobles!")
+        if state.get("taxed"):
+            taxed_list = ", ".join(f"{member_name(guild, uid)} ({g}g)" for uid, g in state["sample"])
+            if state["taxed"] > TAX_SAMPLE:
+                taxed_list += f", and {state['taxed'] - TAX_SAMPLE} more"
+            herald.announce(guild, "tax", f"**Taxed Subjects:** {taxed_list}")
+        recipients_list = ", ".join(member_name(guild, uid) for uid in recipients[:5])
+        if len(recipients) > 5:
+            recipients_list += f", and {len(recipients) - 5} more"
+        herald.announce(guild, "tax", f"**Noble Recipients:** {recipients_list}")
+
+# ---------- ROYAL ALLOWANCE ----------
+# Administrators' purses are kept at least half full. Rather than topping
+# them up inside every balance read, purses are raised when someone is seen
+# becoming an administrator (a role or permission change, or their first
+# command) and by a sweep every few minutes over each guild's known admins.
+ADMIN_ALLOWANCE = CAP_GOLD // 2
+ADMIN_SWEEP_PERIOD = timedelta(minutes=10)
+_known_admins = collections.defaultdict(set)  # guild_id -> admins seen by commands or events, for the lean profile
+
+def stock_admins(guild_id, user_ids):
+    """Raise these administrators' purses to ADMIN_ALLOWANCE in one transaction; returns how many rose"""
+    if not user_ids:
+        return 0
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        keys = open_purses(db, user_ids, guild_id)
+        raised = db.executemany(f"UPDATE economy SET gold=? WHERE {KEY_WHERE} AND gold<?",
+                                [(ADMIN_ALLOWANCE, *key, ADMIN_ALLOWANCE) for key in keys]).rowcount
+        db.commit()
+    return raised
+
+def guild_admins(guild):
+    """Human administrators of a guild: the owner, cached holders of admin roles, and admins seen since"""
+    admins = {guild.owner_id} | _known_admins[guild.id]
+    for role in guild.roles:
+        if role.permissions.administrator:
+            admins.update(member.id for member in role.members if not member.bot)
+    admins.discard(None)
+    return sorted(admins)
+
+def note_admin(member):
+    """Track a member's admin status, stocking their purse the first time they are seen as one"""
+    known = _known_admins[member.guild.id]
+    if member.guild_permissions.administrator and not member.bot:
+        if member.id not in known:
+            known.add(member.id)
+            stock_admins(member.guild.id, [member.id])
+    else:
+        known.discard(member.id)
+
+async def recheck_known_admins(guild):
+    """Drop known admins who left or lost administrator unseen; role changes of uncached members send no event"""
+    known = _known_admins[guild.id]
+    for user_id in list(known):
+        member = await resolve_member(guild, user_id)
+        if member is None or not member.guild_permissions.administrator:
+            known.discard(user_id)
+
+@scheduler.job(period=ADMIN_SWEEP_PERIOD)
+async def sweep_admin_purses(slot):
+    for guild in bot.guilds:
+        await recheck_known_admins(guild)
+        stock_admins(guild.id, guild_admins(guild))
+        await asyncio.sleep(0)
+
+# ---------- DYNAMIC PRICING ----------
+# With PRICING_MODE=dynamic a ware's price climbs with recent demand: an
+# exponentially decayed count of units bought, held as (volume, as of) so the
+# current price is a closed-form O(1) read. Purchases are folded into the
+# market_demand table in batches, which also picks up other processes' buys.
+PRICE_HALF_LIFE = 6 * 3600  # Seconds for remembered demand to halve
+PRICE_DEMAND_SCALE = 50  # Units of recent demand that lift a price halfway to its ceiling
+PRICE_CEILING = 3.0  # Most a price can climb, as a multiple of its base
+PRICE_FLUSH_INTERVAL = 30
+PRICE_RERENDER_THRESHOLD = 0.05  # Open market views redraw once a shown price moves 5%
+DEMAND_DECAY = math.log(2) / PRICE_HALF_LIFE
+
+def decayed(volume, as_of, now):
+    return volume * math.exp(-DEMAND_DECAY * max(0.0, now - as_of))
+
+def add_demand(table, item, volume, as_of, now):
+    old_volume, old_as_of = table.get(item, (0.0, now))
+    table[item] = (decayed(old_volume, old_as_of, now) + decayed(volume, as_of, now), now)
+
+class MarketPrices:
+    def __init__(self, dynamic):
+        self.dynamic = dynamic
+        self.demand = {}  # item -> (volume, as of): the database's view plus local buys
+        self.pending = {}  # item -> (volume, as of): bought here since the last flush
+        self.shown = {}  # item -> price open market views were last redrawn for
+        self.views = weakref.WeakSet()
+        self._task = None
+
+    def price(self, item, now=None):
+        base = ROYAL_MARKET[item]["price"]
+        if not self.dynamic or item not in self.demand:
+            return base
+        volume = decayed(*self.demand[item], now or time.time())
+        return round(base * (1 + (PRICE_CEILING - 1) * volume / (volume + PRICE_DEMAND_SCALE)))
+
+    def quote(self, item, qty=1):
+        """Cost of qty units bought one after another, each nudging up the next one's price"""
+        base = ROYAL_MARKET[item]["price"]
+        if not self.dynamic:
+            return base * qty
+        now = time.time()
+        volume = decayed(*self.demand.get(item, (0.0, now)), now)
+        return sum(round(base * (1 + (PRICE_CEILING - 1) * v / (v + PRICE_DEMAND_SCALE)))
+                   for v in (volume + k for k in range(qty)))
+
+    def record(self, item, qty=1):
+        if not self.dynamic:
+            return
+        now = time.time()
+        add_demand(self.demand, item, qty, now, now)
+        add_demand(self.pending, item, qty, now, now)
+        self._check_moved(item)
+
+    def _check_moved(self, item):
+        price = self.price(item)
+        shown = self.shown.get(item, ROYAL_MARKET[item]["price"])
+        if abs(price - shown) >= PRICE_RERENDER_THRESHOLD * shown:
+            self.shown[item] = price
+            for view in list(self.views):
+                view.price_moved(item)
+
+    def flush(self):
+        """Fold local purchases into market_demand and pick up everyone else's"""
+        now = time.time()
+        pending, self.pending = self.pending, {}
+        try:
+            with db_connect() as db:
+                db.execute("BEGIN IMMEDIATE")
+                rows = {item: (volume, as_of) for item, volume, as_of in db.execute("SELECT item, volume, updated_at FROM market_demand")}
+                for item, (volume, as_of) in pending.items():
+                    add_demand(rows, item, volume, as_of, now)
+                db.executemany("INSERT OR REPLACE INTO market_demand (item, volume, updated_at) VALUES (?,?,?)",
+                               [(item, *rows[item]) for item in pending])
+                db.commit()
+        except Exception:
+            for item, (volume, as_of) in pending.items():
+                add_demand(self.pending, item, volume, as_of, now)
+            raise
+        self.demand = {item: demand for item, demand in rows.items() if item in ROYAL_MARKET}
+        # Demand decays and other processes buy too, so recheck every ware
+        for item in self.demand:
+            self._check_moved(item)
+
+    def start(self):
+        if self.dynamic:
+            self.flush()
+            self._task = spawn(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(PRICE_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"❌ Failed to record market demand: {e}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if self.dynamic:
+            self.flush()
+
+market_prices = MarketPrices(PRICING_MODE == "dynamic")
+
+# ---------- SHOP VIEW ----------
+class MarketView(discord.ui.View):
+    def __init__(self, ctx, current_page=0, titles_only=False):
+        super().__init__(timeout=120)
+        self.ctx = ctx
+        self.current_page = current_page
+        self.titles_only = titles_only
+        items = {k: v for k, v in ROYAL_MARKET.items() if not titles_only or v.get("type") == "title"}
+        self.total_pages = (len(items) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
+        self.message = None  # Set by dispatch once sent, so price moves can redraw it
+        self._pages = {}  # page -> (embed, {item: price shown})
+        self.update_buttons()
+        market_prices.views.add(self)
+
+    async def on_timeout(self):
+        market_prices.views.discard(self)
+
+    def price_moved(self, item):
+        embed, shown = self._pages.get(self.current_page, (None, {}))
+        if self.message is None or item not in shown:
+            return
+        del self._pages[self.current_page]
+        spawn(self._redraw())
+
+    async def _redraw(self):
+        with contextlib.suppress(discord.HTTPException):
+            await self.message.edit(embed=self.get_page_embed(), view=self)
+
+    def update_buttons(self):
+        self.clear_items()
+        prev_button = discord.ui.Button(emoji="◀️", style=discord.ButtonStyle.gray, disabled=self.current_page == 0)
+        next_button = discord.ui.Button(emoji="▶️", style=discord.ButtonStyle.gray, disabled=self.current_page >= self.total_pages - 1)
+        prev_button.callback = self.prev_callback
+        next_button.callback = self.next_callback
+        self.add_item(prev_button)
+        self.add_item(next_button)
+
+    async def prev_callback(self, interaction: discord.Interaction):
+        if interaction.user.id != self.ctx.author.id:
+            await interaction.response.send_message("🚫 This market stall is not meant for thee, good sir!", ephemeral=True)
+            return
+        self.current_page -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.get_page_embed(), view=self)
+
+    async def next_callback(self, interaction: discord.Interaction):
+        if interaction.user.id != self.ctx.author.id:
+            await interaction.response.send_message("🚫 This market stall is not meant for thee, fair maiden!", ephemeral=True)
+            return
+        self.current_page += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.get_page_embed(), view=self)
+
+    def get_page_embed(self):
+        # Paging back and forth reuses a page until one of its prices has moved enough to matter
+        cached = self._pages.get(self.current_page)
+        if cached and all(abs(market_prices.price(item) - price) < PRICE_RERENDER_THRESHOLD * price for item, price in cached[1].items()):
+            return cached[0]
+        items = {k: v for k, v in ROYAL_MARKET.items() if not self.titles_only or v.get("type") == "title"}
+        item_list = list(items.items())
+        start_idx = self.current_page * ITEMS_PER_PAGE
+        end_idx = start_idx + ITEMS_PER_PAGE
+        page_items = item_list[start_idx:end_idx]
+        title = "🏪 Royal Titles Shop" if self.titles_only else f"🏪 Royal Marketplace - Page {self.current_page + 1} of {self.total_pages}"
+        embed = medieval_embed(
+            title=title,
+            color_name="gold"
+        )
+        shown = {}
+        for item_key, data in page_items:
+            price = shown[item_key] = market_prices.price(item_key)
+            price_str = f"**{price}** gold" + (" 📈" if price > data["price"] else "")
+            icon = TYPE_ICONS.get(data["type"], "📦")
+            item_name = item_key.replace('_', ' ').title()
+            embed.add_field(
+                name=f"{icon} {item_name} - {price_str}",
+                value=f"{data['desc']}\n*Use: {data['use']}*",
+                inline=False
+            )
+        embed.set_footer(text=f"Use {PREFIX}buy <item_name> to purchase • {len(items)} total wares")
+        embed.description = "**Noble titles and privileges!**" if self.titles_only else "**Fine wares from across the realm!**"
+        self._pages[self.current_page] = (embed, shown)
+        return embed
+
+def sack_pages(owner_name, rows, footer):
+    """Render get_sack rows as one or more embeds, grouped by category"""
+    by_category = {category: [] for category in SACK_CATEGORIES}
+    equipped = []
+    for item, qty, worn in rows:
+        item_name = item.replace('_', ' ').title()
+        by_category[ITEM_CATEGORY.get(item, MISC_CATEGORY)].append(f"• {item_name}: **{qty}**")
+        if worn:
+            equipped.append(item_name)
+    fields = [("⚔️ Equipped", ", ".join(equipped))] if equipped else []
+    for category, lines in by_category.items():
+        fields += pack_lines(category, lines)
+    title = f"🎒 Sack of {owner_name}"
+    description = f"**Total Items:** {sum(qty for _, qty, _ in rows)}\n**Unique Wares:** {len(rows)}"
+    pages = pack_embeds(fields, title, description, footer, "blue")
+    if len(pages) > 1:
+        for number, page in enumerate(pages, 1):
+            page.title = f"{title} - Page {number} of {len(pages)}"
+            page.description = description
+    return pages
+
+class SackView(discord.ui.View):
+    def __init__(self, owner_id, pages):
+        super().__init__(timeout=120)
+        self.owner_id = owner_id
+        self.pages = pages
+        self.current_page = 0
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.clear_items()
+        prev_button = discord.ui.Button(emoji="◀️", style=discord.ButtonStyle.gray, disabled=self.current_page == 0)
+        next_button = discord.ui.Button(emoji="▶️", style=discord.ButtonStyle.gray, disabled=self.current_page >= len(self.pages) - 1)
+        prev_button.callback = self.prev_callback
+        next_button.callback = self.next_callback
+        self.add_item(prev_button)
+        self.add_item(next_button)
+
+    async def turn(self, interaction, step):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("🚫 Keep thy hands out of another's sack!", ephemeral=True)
+            return
+        self.current_page += step
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.current_page], view=self)
+
+    async def prev_callback(self, interaction: discord.Interaction):
+        await self.turn(interaction, -1)
+
+    async def next_callback(self, interaction: discord.Interaction):
+        await self.turn(interaction, 1)
+
+# ---------- GAMES & WAGES ----------
+# Payout tables shared by the commands and by simulate.py
+LABOUR_COOLDOWN = timedelta(hours=1)
+LABOUR_JOBS = {
+    "mining": {
+        "gold": (5, 20),
+        "desc": "⛏️ Mining ore in the deep mines",
+        "flair": ["The earth yielded its treasures!", "A rich vein was struck!", "The pickaxe rang true in the depths!"]
+    },
+    "farming": {
+        "gold": (3, 10),
+        "desc": "🌾 Tilling the royal fields",
+        "flair": ["The harvest was bountiful!", "The soil yielded good crop!", "The fields were fertile this day!"]
+    },
+    "blacksmith": {
+        "gold": (5, 15),
+        "desc": "🔥 Forging at the royal smithy",
+        "flair": ["The anvil sang with each strike!", "Steel was tempered to perfection!", "The forge burned bright and hot!"]
+    },
+    "carpentry": {
+        "gold": (4, 12),
+        "desc": "🪵 Crafting in the royal workshop",
+        "flair": ["Wood was shaped with master skill!", "Joints were fitted without flaw!", "The saw made sweet music!"]
+    },
+    "merchant": {
+        "gold": (6, 25),
+        "desc": "💰 Trading in the market square",
+        "flair": ["A shrewd bargain was struck!", "Goods changed hands profitably!", "The market favored thy trade!"]
+    },
+    "guard": {
+        "gold": (4, 15),
+        "desc": "🛡️ Standing watch on castle walls",
+        "flair": ["The watch was uneventful but paid!", "No invaders this shift!", "The walls were well defended!"]
+    }
+}
+DICE_SIDES = 12  # gamble: thy d12 against the house's d12
+COINFLIP_SIDES = ["heads", "tails"]
+SLOT_COST = 1
+SLOT_SYMBOLS = ["🍒", "⭐", "🔔", "👑", "💎", "⚔️", "🛡️", "🐉", "⚜️", "🏰"]
+SLOT_JACKPOTS = {
+    "💎": (40, "**JACKPOT! DIAMONDS OF LEGEND!** 💎", "The gods of fortune shower thee with riches!"),
+    "🐉": (30, "**DRAGON'S HOARD!** 🐉", "Thou hast found a dragon's treasure trove!"),
+    "👑": (20, "**ROYAL FLUSH!** 👑", "A king's ransom is thine!"),
+    "🏰": (16, "**CASTLE FORTUNE!** 🏰", "The castle treasury opens for thee!"),
+}
+SLOT_TRIPLE = (8, "**THREE OF A KIND!**", "A most fortunate alignment of symbols!")
+SLOT_PAIR = (2, "**PAIR WIN!**", "Not the grand prize, but coin nonetheless!")
+SLOT_MISS = (0, "**NO WIN**", "Fortune favors not the bold this day...")
+
+def slot_outcome(slot1, slot2, slot3):
+    """(win, headline, flavour) for one pull of the royal slots"""
+    if slot1 == slot2 == slot3:
+        return SLOT_JACKPOTS.get(slot1, SLOT_TRIPLE)
+    if slot1 == slot2 or slot2 == slot3 or slot1 == slot3:
+        return SLOT_PAIR
+    return SLOT_MISS
+
+# ---------- BATTLE ENGINE ----------
+# Duels load both combatants in one query and commit HP, spoils and cooldowns
+# in one transaction. duel_rounds() is the same exchange of blows over NumPy
+# arrays, for balance testing thousands of duels at once.
+BATTLE_COOLDOWN = timedelta(hours=1)
+BATTLE_DIE = 20
+MIN_DAMAGE = 1
+SPOILS_CAP = 50
+SPOILS_SHARE = 10  # The victor takes a tenth of the fallen's purse, up to SPOILS_CAP
+DUEL_DRAW, DUEL_FIRST, DUEL_SECOND, DUEL_ONGOING = range(4)
+
+# Combat stats per item, looked up by ITEM_INDEX instead of walking ROYAL_MARKET
+ITEM_INDEX = {item: i for i, item in enumerate(ROYAL_MARKET)}
+ITEM_ATK = tuple(data.get("atk_bonus", 0) for data in ROYAL_MARKET.values())
+ITEM_DEF = tuple(data.get("def_bonus", 0) for data in ROYAL_MARKET.values())
+
+def loadout_bonus(items):
+    """(attack, defence) granted by a set of equipped items"""
+    idx = [ITEM_INDEX[item] for item in items if item in ITEM_INDEX]
+    return sum(ITEM_ATK[i] for i in idx), sum(ITEM_DEF[i] for i in idx)
+
+class Combatant:
+    """One side of a duel as loaded from the ledger"""
+    __slots__ = ("user_id", "gold", "debt", "debt_since", "hp", "last_battle", "items", "atk", "defense", "roll", "damage")
+
+    def __init__(self, user_id, gold, debt, debt_since, hp, last_battle):
+        self.user_id = user_id
+        self.gold, self.debt, self.debt_since, self.hp = gold, debt, debt_since, hp
+        self.last_battle = dt.fromisoformat(last_battle).replace(tzinfo=timezone.utc) if last_battle else None
+        self.items = []
+        self.atk = self.defense = self.roll = self.damage = 0
+
+def open_purses(db, user_ids, guild_id=None):
+    """Give users without a purse the newcomer's one that get_pouch reports; returns their keys"""
+    keys = [ledger_key(user_id, guild_id) for user_id in user_ids]
+    db.executemany(f"INSERT OR IGNORE INTO economy ({KEY_COLS}, gold, hp) VALUES ({','.join('?' * len(keys[0]))},?,?)",
+                   [(*key, 10, MAX_HP) for key in keys])
+    return keys
+
+def load_combatants(db, user_ids, guild_id=None, now=None):
+    """Purse, HP, battle cooldown and equipped gear of several users in one query.
+
+    Users without a purse get the newcomer's one first, so run this inside
+    the caller's transaction.
+    """
+    keys = open_purses(db, user_ids, guild_id)
+    row = f"({','.join('?' * len(keys[0]))})"
+    rows = db.execute(f"""
+        SELECT e.user_id, e.gold, e.debt, e.debt_since, e.hp, e.hp_updated_at, c.last_battle, i.item
+        FROM economy e
+        LEFT JOIN cooldowns c ON {key_join("c", "e")}
+        LEFT JOIN inventory i ON {key_join("i", "e")} AND i.equipped=1
+        WHERE ({', '.join(f"e.{col}" for col in KEY_COLS.split(", "))}) IN (VALUES {','.join([row] * len(keys))})
+    """, [value for key in keys for value in key]).fetchall()
+    combatants = {}
+    now = now or utcnow()
+    for user_id, gold, debt, debt_since, hp, hp_updated_at, last_battle, item in rows:
+        combatant = combatants.get(user_id)
+        if combatant is None:
+            combatant = combatants[user_id] = Combatant(user_id, gold, debt, debt_since, hp_at(hp, hp_updated_at, now), last_battle)
+        if item:
+            combatant.items.append(item)
+    for combatant in combatants.values():
+        combatant.atk, combatant.defense = loadout_bonus(combatant.items)
+    return combatants
+
+def duel_outcome(hp1, hp2):
+    if hp1 <= 0 and hp2 <= 0:
+        return DUEL_DRAW
+    if hp1 <= 0:
+        return DUEL_SECOND
+    if hp2 <= 0:
+        return DUEL_FIRST
+    return DUEL_ONGOING
+
+def duel_round(first, second, roll1, roll2):
+    """One exchange of blows between two Combatants; returns the outcome"""
+    first.roll, second.roll = roll1 + first.atk, roll2 + second.atk
+    first.damage = max(MIN_DAMAGE, second.roll - first.defense)
+    second.damage = max(MIN_DAMAGE, first.roll - second.defense)
+    first.hp = max(0, min(MAX_HP, first.hp - first.damage))
+    second.hp = max(0, min(MAX_HP, second.hp - second.damage))
+    return duel_outcome(first.hp, second.hp)
+
+def duel_spoils(loser):
+    return min(SPOILS_CAP, loser.gold // SPOILS_SHARE)
+
+def save_cooldowns(db, user_ids, now, guild_id=None):
+    keys = [ledger_key(user_id, guild_id) for user_id in user_ids]
+    db.executemany(f"INSERT OR IGNORE INTO cooldowns ({KEY_COLS}) VALUES ({','.join('?' * len(keys[0]))})", keys)
+    db.executemany(f"UPDATE cooldowns SET last_battle=? WHERE {KEY_WHERE}", [(now, *key) for key in keys])
+
+def save_duels(db, combatants, now, guild_id=None):
+    """Write back HP, purses and battle cooldowns of every combatant in one go"""
+    db.executemany(f"UPDATE economy SET gold=?, debt=?, debt_since=?, hp=?, hp_updated_at=? WHERE {KEY_WHERE}",
+                   [(c.gold, c.debt, c.debt_since, c.hp, now, *ledger_key(c.user_id, guild_id)) for c in combatants])
+    save_cooldowns(db, [c.user_id for c in combatants], now, guild_id)
+
+def pay_spoils(winner, loser):
+    spoils = duel_spoils(loser)
+    if spoils > 0:
+        winner.gold, winner.debt, winner.debt_since = settle_coin(winner.gold, winner.debt, winner.debt_since, spoils)
+        loser.gold, loser.debt, loser.debt_since = settle_coin(loser.gold, loser.debt, loser.debt_since, -spoils)
+    return spoils
+
+def fight_duel(challenger_id, opponent_id, guild_id=None):
+    """Resolve a duel in one transaction.
+
+    Returns (challenger, opponent, outcome, spoils), or (challenger, None,
+    None, 0) when the challenger is still resting from the last battle.
+    """
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        now = utcnow()
+        combatants = load_combatants(db, [challenger_id, opponent_id], guild_id, now)
+        first, second = combatants[challenger_id], combatants[opponent_id]
+        if first.last_battle and now - first.last_battle < BATTLE_COOLDOWN:
+            db.rollback()
+            return first, None, None, 0
+        outcome = duel_round(first, second, random.randint(1, BATTLE_DIE), random.randint(1, BATTLE_DIE))
+        spoils = 0
+        if outcome == DUEL_FIRST:
+            spoils = pay_spoils(first, second)
+        elif outcome == DUEL_SECOND:
+            spoils = pay_spoils(second, first)
+        save_duels(db, (first, second), now.isoformat(), guild_id)
+        db.commit()
+    return first, second, outcome, spoils
+
+def duel_rounds(atk1, def1, hp1, atk2, def2, hp2, rng):
+    """Vectorised duel_round over arrays of pairings.
+
+    Takes NumPy arrays (or scalars) of bonuses and HP plus a NumPy Generator;
+    returns (hp1, hp2, outcome) arrays with DUEL_* outcome codes.
+    """
+    if np is None:
+        raise RuntimeError("Batch duels need numpy installed")
+    size = np.broadcast(atk1, def1, hp1, atk2, def2, hp2).shape
+    roll1 = rng.integers(1, BATTLE_DIE + 1, size) + atk1
+    roll2 = rng.integers(1, BATTLE_DIE + 1, size) + atk2
+    hp1 = np.clip(hp1 - np.maximum(MIN_DAMAGE, roll2 - def1), 0, MAX_HP)
+    hp2 = np.clip(hp2 - np.maximum(MIN_DAMAGE, roll1 - def2), 0, MAX_HP)
+    outcome = np.select([(hp1 <= 0) & (hp2 <= 0), hp1 <= 0, hp2 <= 0], [DUEL_DRAW, DUEL_SECOND, DUEL_FIRST], DUEL_ONGOING)
+    return hp1, hp2, outcome
+
+def fight_to_the_fall(atk1, def1, atk2, def2, rng, hp=MAX_HP, refight_draws=False):
+    """Fight paired bouts, exchange after exchange, until someone falls in each.
+
+    Takes 1-D arrays of bonuses (scalars broadcast) and returns (outcome,
+    exchanges) arrays. With refight_draws a double knockout is fought again
+    from fresh HP, so every bout ends in DUEL_FIRST or DUEL_SECOND.
+    """
+    if np is None:
+        raise RuntimeError("Batch duels need numpy installed")
+    atk1, def1, atk2, def2 = np.broadcast_arrays(atk1, def1, atk2, def2)
+    hp1 = np.full(atk1.size, hp)
+    hp2 = np.full(atk1.size, hp)
+    outcome = np.full(atk1.size, DUEL_ONGOING)
+    exchanges = np.zeros(atk1.size, dtype=np.int64)
+    active = np.arange(atk1.size)
+    while active.size:
+        hp1[active], hp2[active], outcome[active] = duel_rounds(
+            atk1[active], def1[active], hp1[active], atk2[active], def2[active], hp2[active], rng)
+        exchanges[active] += 1
+        if refight_draws:
+            drawn = active[outcome[active] == DUEL_DRAW]
+            hp1[drawn] = hp2[drawn] = hp
+            outcome[drawn] = DUEL_ONGOING
+        active = active[outcome[active] == DUEL_ONGOING]
+    return outcome, exchanges
+
+def simulate_duels(loadout1, loadout2, duels, rng, hp=MAX_HP):
+    """Fight `duels` bouts between two loadouts until someone falls in each.
+
+    Returns the fraction won by each side, the fraction drawn and the mean
+    number of exchanges a bout lasts.
+    """
+    atk1, def1 = loadout_bonus(loadout1)
+    atk2, def2 = loadout_bonus(loadout2)
+    outcome, exchanges = fight_to_the_fall(np.full(duels, atk1), def1, atk2, def2, rng, hp)
+    counts = np.bincount(outcome, minlength=DUEL_ONGOING) / duels
+    return counts[DUEL_FIRST], counts[DUEL_SECOND], counts[DUEL_DRAW], exchanges.mean()
+
+# ---------- TOURNAMENTS ----------
+# A guild's tournament lives in its ledger file, so entry fees, bracket
+# progress and the champion's prize commit with the purses they move. Each
+# bracket round is one batch: one loadout query, vectorised bouts, one
+# transaction and one summary posted to the tournament's channel. The
+# bracket is fought by a background task; if it stops part way (an error, a
+# restart) `start` resumes it from the knights still standing, and `cancel`
+# can call it off and return every entry fee.
+TOURNAMENT_MAX_ENTRANTS = 1024
+_brackets = {}  # guild_id -> task fighting that guild's bracket in this process
+
+def get_tournament(db, guild_id):
+    row = db.execute("SELECT channel_id, entry_fee, pot, round FROM tournaments WHERE guild_id=?", (guild_id,)).fetchone()
+    return dict(zip(("channel_id", "entry_fee", "pot", "round"), row)) if row else None
+
+def tournament_entrants(db, guild_id):
+    return [r[0] for r in db.execute(
+        "SELECT user_id FROM tournament_entrants WHERE guild_id=? AND eliminated_in IS NULL", (guild_id,))]
+
+def open_tournament(guild_id, channel_id, entry_fee=0):
+    with ledger_connect(guild_id) as db:
+        cur = db.execute("INSERT OR IGNORE INTO tournaments (guild_id, channel_id, entry_fee) VALUES (?,?,?)",
+                         (guild_id, channel_id, entry_fee))
+        db.commit()
+        return cur.rowcount == 1
+
+def join_tournament(user_id, guild_id):
+    """Enter a user, taking the entry fee; returns "joined" or why they could not"""
+    key = ledger_key(user_id, guild_id)
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        tournament = get_tournament(db, guild_id)
+        if tournament is None:
+            return "closed"
+        if tournament["round"]:
+            return "started"
+        if db.execute("SELECT 1 FROM tournament_entrants WHERE guild_id=? AND user_id=?", (guild_id, user_id)).fetchone():
+            return "entered"
+        if db.execute("SELECT COUNT(*) FROM tournament_entrants WHERE guild_id=?", (guild_id,)).fetchone()[0] >= TOURNAMENT_MAX_ENTRANTS:
+            return "full"
+        fee = tournament["entry_fee"]
+        if fee:
+            open_purses(db, [user_id], guild_id)
+            row = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+            if row[0] < fee:
+                return "poor"
+            gold, debt, debt_since = settle_coin(*row, -fee)
+            db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}", (gold, debt, debt_since, *key))
+            db.execute("UPDATE tournaments SET pot=pot+? WHERE guild_id=?", (fee, guild_id))
+        db.execute("INSERT INTO tournament_entrants (guild_id, user_id) VALUES (?,?)", (guild_id, user_id))
+        db.commit()
+        return "joined"
+
+def cancel_tournament(guild_id):
+    """Call off a tournament, begun or not, refunding every entry fee; returns the entrants"""
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        tournament = get_tournament(db, guild_id)
+        if tournament is None:
+            return None
+        # Knights already knocked out paid into the pot too
+        entrants = [r[0] for r in db.execute("SELECT user_id FROM tournament_entrants WHERE guild_id=?", (guild_id,))]
+        if tournament["entry_fee"]:
+            for user_id in entrants:
+                key = ledger_key(user_id, guild_id)
+                row = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+                gold, debt, debt_since = settle_coin(*row, tournament["entry_fee"])
+                db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}", (gold, debt, debt_since, *key))
+        db.execute("DELETE FROM tournament_entrants WHERE guild_id=?", (guild_id,))
+        db.execute("DELETE FROM tournaments WHERE guild_id=?", (guild_id,))
+        db.commit()
+        return entrants
+
+def begin_tournament(guild_id):
+    """Close entries, or pick up a bracket that stopped part way.
+
+    Returns (tournament, knights still standing), with entrants None if
+    there is nothing to fight.
+    """
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        tournament = get_tournament(db, guild_id)
+        entrants = tournament_entrants(db, guild_id) if tournament else []
+        if tournament is None or len(entrants) < 2:
+            return tournament, None
+        if not tournament["round"]:
+            db.execute("UPDATE tournaments SET round=1 WHERE guild_id=?", (guild_id,))
+            db.commit()
+            tournament["round"] = 1
+        return tournament, entrants
+
+def seed_bracket(entrants, rng):
+    """Shuffle entrants into first-round pairs; byes fill the bracket to a power of two"""
+    order = [entrants[i] for i in rng.permutation(len(entrants))]
+    byes = (1 << (len(order) - 1).bit_length()) - len(order)
+    return order[:byes], list(zip(order[byes::2], order[byes + 1::2]))
+
+def fight_tournament_round(guild_id, round_no, pairs, byes, rng):
+    """Resolve every bout of a round in one transaction.
+
+    Returns (winners in bracket order, [(winner, loser, exchanges)]), or
+    (None, []) if the tournament was called off meanwhile. When a single
+    champion remains the pot is paid out and the tournament closed.
+    """
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        tournament = get_tournament(db, guild_id)
+        if tournament is None or tournament["round"] != round_no:
+            db.rollback()
+            return None, []
+        fighters = [user_id for pair in pairs for user_id in pair]
+        combatants = load_combatants(db, fighters, guild_id)
+        first = [combatants[a] for a, _ in pairs]
+        second = [combatants[b] for _, b in pairs]
+        outcome, exchanges = fight_to_the_fall(
+            np.array([c.atk for c in first]), np.array([c.defense for c in first]),
+            np.array([c.atk for c in second]), np.array([c.defense for c in second]),
+            rng, refight_draws=True)
+        bouts = [(a, b, int(n)) if won == DUEL_FIRST else (b, a, int(n)) for (a, b), won, n in zip(pairs, outcome, exchanges)]
+        db.executemany("UPDATE tournament_entrants SET eliminated_in=? WHERE guild_id=? AND user_id=?",
+                       [(round_no, guild_id, loser) for _, loser, _ in bouts])
+        save_cooldowns(db, fighters, utcnow().isoformat(), guild_id)
+        winners = list(byes) + [winner for winner, _, _ in bouts]
+        if len(winners) == 1:
+            champion = combatants[winners[0]]
+            champion.gold, champion.debt, champion.debt_since = settle_coin(champion.gold, champion.debt, champion.debt_since,
+                                                                            tournament["pot"])
+            db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}",
+                       (champion.gold, champion.debt, champion.debt_since, *ledger_key(champion.user_id, guild_id)))
+            db.execute("DELETE FROM tournament_entrants WHERE guild_id=?", (guild_id,))
+            db.execute("DELETE FROM tournaments WHERE guild_id=?", (guild_id,))
+        else:
+            db.execute("UPDATE tournaments SET round=? WHERE guild_id=?", (round_no + 1, guild_id))
+        db.commit()
+    return winners, bouts
+
+def round_name(remaining):
+    return {2: "The Final", 4: "The Semi-Finals", 8: "The Quarter-Finals"}.get(remaining, f"Round of {remaining}")
+
+def member_name(guild, user_id):
+    member = guild.get_member(user_id)
+    return member.display_name if member else f"<@{user_id}>"
+
+def bracket_embeds(guild, round_no, remaining, bouts, byes):
+    name = functools.partial(member_name, guild)
+    lines = [f"⚔️ **{name(w)}** bested {name(l)} ({n} exchanges)" for w, l, n in bouts]
+    lines += [f"🛡️ **{name(user_id)}** advances unopposed" for user_id in byes]
+    return pack_embeds(pack_lines("📜 Results", lines), f"🏟️ {round_name(remaining)}",
+                       f"Round {round_no} of the royal tournament is fought!",
+                       "A champion is crowned" if remaining == 2 else f"{len(bouts) + len(byes)} knights advance",
+                       color_name="red")
+
+async def run_tournament(guild, tournament, entrants, rng=None):
+    """Fight the bracket from the current round, crying each round's results.
+
+    Returns the champion's id, or None if the tournament was called off.
+    """
+    rng = rng or np.random.default_rng()
+    channel = guild.get_channel(tournament["channel_id"])
+    byes, pairs = seed_bracket(entrants, rng)
+    round_no, remaining = tournament["round"], len(byes) + 2 * len(pairs)
+    while True:
+        winners, bouts = fight_tournament_round(guild.id, round_no, pairs, byes, rng)
+        if winners is None:
+            return None
+        if channel:
+            for message in pack_messages(bracket_embeds(guild, round_no, remaining, bouts, byes)):
+                outbound.send(channel, embeds=message)
+        if len(winners) == 1:
+            return winners[0]
+        byes, pairs = [], list(zip(winners[::2], winners[1::2]))
+        round_no, remaining = round_no + 1, len(winners)
+        await asyncio.sleep(0)  # Let other commands in between rounds
+
+async def hold_tournament(guild, tournament, entrants):
+    """Fight a begun bracket to its end and crown the champion; run with spawn()"""
+    channel = guild.get_channel(tournament["channel_id"])
+    try:
+        # Only one process fights a guild's bracket at a time
+        async with coordinator.lock(f"tournament:{guild.id}", timeout=1):
+            champion = await run_tournament(guild, tournament, entrants)
+    except CoordinatorTimeout:
+        return
+    except Exception as e:
+        print(f"❌ The tournament in {guild.name} halted; `start` resumes it: {e}")
+        return
+    finally:
+        _brackets.pop(guild.id, None)
+    if champion is None or not channel:
+        return
+    embed = medieval_embed(
+        title="👑 Champion of the Lists",
+        description=f"**{member_name(guild, champion)}** triumphs over **{len(entrants) - 1}** knights!",
+        color_name="gold"
+    )
+    if tournament["pot"]:
+        embed.add_field(name="💰 The Purse", value=f"**{tournament['pot']}** gold to the champion!", inline=False)
+    outbound.send(channel, embed=embed)
+
+# ---------- ORDER BOOK ----------
+# Player-to-player limit orders, matched by price then time. The orders table
+# in the ledger file is the record; each process keeps per-item heaps over it
+# and reloads a book only when its sequence number moved in another process.
+# Bids escrow gold and asks escrow goods, so a fill only moves what is held.
+TRADE_MAX_QTY = 10000
+UNTRADEABLE_TYPES = ("title",)  # Titles come with roles, so only the Crown sells them
+
+def tradeable(item):
+    return item in WARES and WARES[item]["type"] not in UNTRADEABLE_TYPES
+
+def book_scope(guild_id):
+    """Guild-mode purses trade in their own guild's books; global purses share one"""
+    return guild_id if PER_GUILD_ECONOMY else 0
+
+class OrderBook:
+    """Resting orders of one item, as price-time priority heaps with lazy deletion"""
+    __slots__ = ("seq", "orders", "heaps")
+
+    def __init__(self, seq=0, rows=()):
+        self.seq = seq
+        self.orders = {}  # order_id -> [side, user_id, price, qty]
+        self.heaps = {"bid": [], "ask": []}  # (-price | price, order_id)
+        for order_id, side, user_id, price, qty in rows:
+            self.orders[order_id] = [side, user_id, price, qty]
+            self.heaps[side].append((-price if side == "bid" else price, order_id))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def rest(self, order_id, side, user_id, price, qty):
+        self.orders[order_id] = [side, user_id, price, qty]
+        heapq.heappush(self.heaps[side], (-price if side == "bid" else price, order_id))
+
+    def _live(self, side, entry):
+        # Order ids are reused once the highest is deleted, so an entry must match its order's side and price
+        order = self.orders.get(entry[1])
+        return order is not None and order[0] == side and entry[0] == (-order[2] if side == "bid" else order[2])
+
+    def apply(self, order_id, side, user_id, price, qty):
+        """Bring one order in line with its row; side is None when the row is gone"""
+        resting = self.orders.get(order_id)
+        if resting and resting[:3] == [side, user_id, price]:
+            resting[3] = qty  # Only partial fills change a resting order
+            return
+        if resting:
+            self.cancel(order_id)
+        if side is not None:
+            self.rest(order_id, side, user_id, price, qty)
+
+    def best(self, side):
+        heap = self.heaps[side]
+        while heap and not self._live(side, heap[0]):
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+    def cancel(self, order_id):
+        side = self.orders.pop(order_id)[0]
+        heap = self.heaps[side]
+        if len(heap) > 2 * len(self.orders) + 64:
+            # Mostly dead entries: rebuild rather than pop them one by one
+            self.heaps[side] = [entry for entry in heap if self._live(side, entry)]
+            heapq.heapify(self.heaps[side])
+
+    def match(self, side, price, qty):
+        """Fill an incoming order against the other side; returns [(order_id, user_id, fill, price)]"""
+        other = "ask" if side == "bid" else "bid"
+        fills = []
+        while qty > 0:
+            order_id = self.best(other)
+            if order_id is None:
+                break
+            resting = self.orders[order_id]
+            crosses = resting[2] <= price if side == "bid" else resting[2] >= price
+            if not crosses:
+                break
+            fill = min(qty, resting[3])
+            fills.append((order_id, resting[1], fill, resting[2]))
+            resting[3] -= fill
+            qty -= fill
+            if resting[3] == 0:
+                del self.orders[order_id]
+                heapq.heappop(self.heaps[other])
+        return fills
+
+_order_books = {}  # (scope, item) -> OrderBook
+ORDER_CHANGES_KEPT = 1000  # Seqs of change log kept per book; a process further behind reloads the book
+
+def load_order_book(db, scope, item):
+    """This process's book for an item, caught up with whatever other processes changed"""
+    row = db.execute("SELECT seq FROM order_books WHERE book=? AND item=?", (scope, item)).fetchone()
+    seq = row[0] if row else 0
+    book = _order_books.get((scope, item))
+    if book is not None and book.seq < seq:
+        # Every seq logs at least one order, so a gap means the log was trimmed past us
+        oldest = db.execute("SELECT MIN(seq) FROM order_changes WHERE book=? AND item=? AND seq>?",
+                            (scope, item, book.seq)).fetchone()[0]
+        if oldest == book.seq + 1:
+            changes = db.execute(
+                "SELECT c.order_id, o.side, o.user_id, o.price, o.qty FROM "
+                "(SELECT DISTINCT order_id FROM order_changes WHERE book=? AND item=? AND seq>?) c "
+                "LEFT JOIN orders o ON o.order_id=c.order_id AND o.book=? AND o.item=?",
+                (scope, item, book.seq, scope, item))
+            for change in changes:
+                book.apply(*change)
+            book.seq = seq
+    if book is None or book.seq != seq:
+        rows = db.execute("SELECT order_id, side, user_id, price, qty FROM orders WHERE book=? AND item=?", (scope, item))
+        book = _order_books[(scope, item)] = OrderBook(seq, rows)
+    return book
+
+def bump_order_book(db, scope, item, book, order_ids):
+    """Record a change to the given orders of a book under its next seq"""
+    db.execute("INSERT OR IGNORE INTO order_books (book, item) VALUES (?,?)", (scope, item))
+    book.seq = db.execute("UPDATE order_books SET seq=seq+1 WHERE book=? AND item=? RETURNING seq", (scope, item)).fetchone()[0]
+    db.executemany("INSERT OR IGNORE INTO order_changes (book, item, seq, order_id) VALUES (?,?,?,?)",
+                   [(scope, item, book.seq, order_id) for order_id in order_ids])
+    db.execute("DELETE FROM order_changes WHERE book=? AND item=? AND seq<=?", (scope, item, book.seq - ORDER_CHANGES_KEPT))
+
+def credit_gold(db, user_id, amount, guild_id=None):
+    key = open_purses(db, [user_id], guild_id)[0]
+    gold, debt, debt_since = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+    gold, debt, debt_since = settle_coin(gold, debt, debt_since, amount)
+    db.execute(f"UPDATE economy SET gold=?, debt=?, debt_since=? WHERE {KEY_WHERE}", (gold, debt, debt_since, *key))
+
+def place_order(user_id, side, item, price, qty, guild_id=None):
+    """Escrow, match and rest a limit order in one transaction.
+
+    Returns (status, fills, resting) where status is "placed", "poor" (not
+    enough gold to cover a bid) or "lacking" (not enough goods to ask), fills
+    are (order_id, counterparty, qty, price) and resting is the unfilled
+    quantity left on the book.
+    """
+    scope = book_scope(guild_id)
+    key = ledger_key(user_id, guild_id)
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        open_purses(db, [user_id], guild_id)
+        if side == "bid":
+            gold, debt, debt_since = db.execute(f"SELECT gold, debt, debt_since FROM economy WHERE {KEY_WHERE}", key).fetchone()
+            if gold < price * qty:
+                return "poor", [], 0
+            db.execute(f"UPDATE economy SET gold=? WHERE {KEY_WHERE}", (gold - price * qty, *key))
+        elif take_item(db, user_id, item, qty, guild_id) is None:
+            return "lacking", [], 0
+        book = load_order_book(db, scope, item)
+        try:
+            fills = book.match(side, price, qty)
+            for order_id, counterparty, fill, fill_price in fills:
+                buyer, seller = (user_id, counterparty) if side == "bid" else (counterparty, user_id)
+                credit_item(db, buyer, item, fill, guild_id)
+                credit_gold(db, seller, fill * fill_price, guild_id)
+                if side == "bid" and fill_price < price:
+                    credit_gold(db, user_id, fill * (price - fill_price), guild_id)  # Escrowed above the fill price
+                if order_id in book.orders:
+                    db.execute("UPDATE orders SET qty=? WHERE order_id=?", (book.orders[order_id][3], order_id))
+                else:
+                    db.execute("DELETE FROM orders WHERE order_id=?", (order_id,))
+            resting = qty - sum(fill for _, _, fill, _ in fills)
+            changed = [order_id for order_id, _, _, _ in fills]
+            if resting:
+                cur = db.execute("INSERT INTO orders (book, item, side, user_id, price, qty, placed_at) VALUES (?,?,?,?,?,?,?)",
+                                 (scope, item, side, user_id, price, resting, utcnow().isoformat()))
+                book.rest(cur.lastrowid, side, user_id, price, resting)
+                changed.append(cur.lastrowid)
+            bump_order_book(db, scope, item, book, changed)
+            db.commit()
+        except BaseException:
+            # The heaps ran ahead of a transaction that never landed
+            _order_books.pop((scope, item), None)
+            raise
+    return "placed", fills, resting
+
+def cancel_order(user_id, order_id, guild_id=None):
+    """Withdraw one of a user's resting orders, returning its escrow; returns the order or None"""
+    scope = book_scope(guild_id)
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        row = db.execute("SELECT item, side, price, qty FROM orders WHERE order_id=? AND book=? AND user_id=?",
+                         (order_id, scope, user_id)).fetchone()
+        if row is None:
+            return None
+        item, side, price, qty = row
+        book = load_order_book(db, scope, item)
+        try:
+            if side == "bid":
+                credit_gold(db, user_id, price * qty, guild_id)
+            else:
+                credit_item(db, user_id, item, qty, guild_id)
+            db.execute("DELETE FROM orders WHERE order_id=?", (order_id,))
+            book.cancel(order_id)
+            bump_order_book(db, scope, item, book, [order_id])
+            db.commit()
+        except BaseException:
+            _order_books.pop((scope, item), None)
+            raise
+    return row
+
+def order_depth(item, guild_id=None, levels=5):
+    """Best price levels on each side of an item's book: {side: [(price, qty, orders)]}"""
+    scope = book_scope(guild_id)
+    with ledger_read(guild_id) as db:
+        return {side: db.execute(
+            f"SELECT price, SUM(qty), COUNT(*) FROM orders WHERE book=? AND item=? AND side=? "
+            f"GROUP BY price ORDER BY price {'DESC' if side == 'bid' else 'ASC'} LIMIT ?",
+            (scope, item, side, levels)).fetchall() for side in ("bid", "ask")}
+
+def user_orders(user_id, guild_id=None):
+    with ledger_read(guild_id) as db:
+        return db.execute("SELECT order_id, side, item, price, qty FROM orders WHERE book=? AND user_id=? ORDER BY order_id",
+                          (book_scope(guild_id), user_id)).fetchall()
+
+# ---------- AUCTION HOUSE ----------
+# Every open auction, across all guilds, waits on one scheduler task that
+# sleeps until the earliest close on a min-heap. Auctions and their bids live
+# in the ledger file, so a restart reloads them and a close settles in one
+# transaction. Bids are checked against briefly cached balances and bind
+# nobody's gold: at the close the highest bidder who can still pay wins.
+AUCTION_MAX_MINUTES = 7 * 24 * 60
+AUCTION_INCREMENT = 0.05  # Each bid must beat the last by 5%, and by at least 1 gold
+AUCTION_BALANCE_TTL = 30  # Seconds a purse balance is trusted for bid checks
+AUCTION_COLUMNS = "auction_id, guild_id, channel_id, seller_id, item, qty, min_bid, high_bid, high_bidder, closes_at"
+
+class Auction:
+    __slots__ = tuple(AUCTION_COLUMNS.split(", "))
+
+    def __init__(self, auction_id, guild_id, channel_id, seller_id, item, qty, min_bid, high_bid, high_bidder, closes_at):
+        self.auction_id, self.guild_id, self.channel_id = auction_id, guild_id, channel_id
+        self.seller_id, self.item, self.qty, self.min_bid = seller_id, item, qty, min_bid
+        self.high_bid, self.high_bidder = high_bid, high_bidder
+        self.closes_at = dt.fromisoformat(closes_at).replace(tzinfo=timezone.utc)
+
+    @property
+    def key(self):
+        # Auction ids are only unique within one ledger file
+        return self.guild_id, self.auction_id
+
+    def next_bid(self):
+        if self.high_bid is None:
+            return self.min_bid
+        return self.high_bid + max(1, int(self.high_bid * AUCTION_INCREMENT))
+
+def open_auction(seller_id, guild_id, channel_id, item, qty, min_bid, minutes):
+    """List goods for auction, escrowing them from the seller's sack.
+
+    A seller_id of None is the Crown selling a title. Returns the Auction, or
+    None if the seller lacks the goods.
+    """
+    closes_at = (utcnow() + timedelta(minutes=minutes)).isoformat()
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        if seller_id is not None and take_item(db, seller_id, item, qty, guild_id) is None:
+            return None
+        cur = db.execute("INSERT INTO auctions (guild_id, channel_id, seller_id, item, qty, min_bid, closes_at) VALUES (?,?,?,?,?,?,?)",
+                         (guild_id, channel_id, seller_id, item, qty, min_bid, closes_at))
+        db.commit()
+    return Auction(cur.lastrowid, guild_id, channel_id, seller_id, item, qty, min_bid, None, None, closes_at)
+
+def title_lot_role(auction):
+    """The role a title lot confers, or None if the guild, its setting or the role itself is gone"""
+    guild = bot.get_guild(auction.guild_id)
+    role_id = get_title_role(auction.guild_id, auction.item.removesuffix("_title"))
+    return guild.get_role(role_id) if guild and role_id else None
+
+def settle_auction(auction):
+    """Close an auction in one transaction.
+
+    Returns (winner, price, role), role being the title's role for a title
+    lot; (None, None, None) if unsold, or None if already closed. A title
+    whose role is gone cannot be granted, so its lot closes unsold.
+    """
+    guild_id = auction.guild_id
+    role = title_lot_role(auction) if WARES[auction.item]["type"] == "title" else None
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        if not db.execute("SELECT 1 FROM auctions WHERE auction_id=? AND guild_id=?", (auction.auction_id, guild_id)).fetchone():
+            return None  # Another process got there first
+        bids = db.execute("SELECT user_id, MAX(amount) FROM auction_bids WHERE auction_id=? GROUP BY user_id "
+                          "ORDER BY MAX(amount) DESC, MIN(placed_at)", (auction.auction_id,)).fetchall()
+        if WARES[auction.item]["type"] == "title" and role is None:
+            bids = []
+        winner = price = None
+        for user_id, amount in bids:
+            key = ledger_key(user_id, guild_id)
+            row = db.execute(f"SELECT gold FROM economy WHERE {KEY_WHERE}", key).fetchone()
+            if row and row[0] >= amount:
+                db.execute(f"UPDATE economy SET gold=? WHERE {KEY_WHERE}", (row[0] - amount, *key))
+                winner, price = user_id, amount
+                break
+        if winner is None:
+            if auction.seller_id is not None:
+                credit_item(db, auction.seller_id, auction.item, auction.qty, guild_id)
+        else:
+            if auction.seller_id is not None:
+                credit_gold(db, auction.seller_id, price, guild_id)
+            if WARES[auction.item]["type"] != "title":
+                credit_item(db, winner, auction.item, auction.qty, guild_id)
+        db.execute("DELETE FROM auction_bids WHERE auction_id=?", (auction.auction_id,))
+        db.execute("DELETE FROM auctions WHERE auction_id=?", (auction.auction_id,))
+        db.commit()
+    return winner, price, role if winner is not None else None
+
+class AuctionHouse:
+    def __init__(self):
+        self.auctions = {}  # (guild_id, auction_id) -> Auction
+        self._heap = []  # (closes_at, guild_id, auction_id)
+        self._balances = {}  # (guild_id, user_id) -> (gold, fetched at)
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """Reload every open auction from the ledgers and start the scheduler"""
+        self._wakeup = asyncio.Event()
+        for path in ledger_paths():
+            with db_connect(path) as db:
+                for row in db.execute(f"SELECT {AUCTION_COLUMNS} FROM auctions"):
+                    self.schedule(Auction(*row))
+        self._task = spawn(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    def schedule(self, auction):
+        if auction.key in self.auctions:
+            return
+        self.auctions[auction.key] = auction
+        heapq.heappush(self._heap, (auction.closes_at, *auction.key))
+        if self._wakeup:
+            self._wakeup.set()
+
+    def on_published(self, message):
+        """Pick up an auction opened or bid on by another process"""
+        guild_id, auction_id = message["guild_id"], message["auction_id"]
+        with ledger_read(guild_id) as db:
+            row = db.execute(f"SELECT {AUCTION_COLUMNS} FROM auctions WHERE auction_id=? AND guild_id=?", (auction_id, guild_id)).fetchone()
+        if row is None:
+            return
+        auction = Auction(*row)
+        known = self.auctions.get(auction.key)
+        if known:
+            known.high_bid, known.high_bidder = auction.high_bid, auction.high_bidder
+        else:
+            self.schedule(auction)
+
+    def publish(self, auction):
+        spawn(coordinator.publish("auctions", {"guild_id": auction.guild_id, "auction_id": auction.auction_id}))
+
+    def open(self, seller_id, guild_id, channel_id, item, qty, min_bid, minutes):
+        auction = open_auction(seller_id, guild_id, channel_id, item, qty, min_bid, minutes)
+        if auction:
+            self.schedule(auction)
+            self.publish(auction)
+        return auction
+
+    def balance(self, user_id, guild_id):
+        cached = self._balances.get((guild_id, user_id))
+        if cached and time.monotonic() - cached[1] < AUCTION_BALANCE_TTL:
+            return cached[0]
+        gold = get_pouch(user_id, guild_id=guild_id)[0]
+        self._balances[(guild_id, user_id)] = (gold, time.monotonic())
+        return gold
+
+    def bid(self, user_id, guild_id, auction_id, amount):
+        """Place a bid; returns (status, auction) with status "ok", "unknown", "own", "low" or "poor" """
+        auction = self.auctions.get((guild_id, auction_id))
+        if auction is None:
+            return "unknown", None
+        if auction.seller_id == user_id:
+            return "own", auction
+        if amount < auction.next_bid():
+            return "low", auction
+        if self.balance(user_id, guild_id) < amount:
+            return "poor", auction
+        with ledger_connect(guild_id) as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT high_bid, high_bidder FROM auctions WHERE auction_id=? AND guild_id=?", (auction_id, guild_id)).fetchone()
+            if row is None:
+                return "unknown", None
+            auction.high_bid, auction.high_bidder = row  # Another process may have outbid the cached state
+            if amount < auction.next_bid():
+                return "low", auction
+            db.execute("INSERT INTO auction_bids (auction_id, user_id, amount, placed_at) VALUES (?,?,?,?)",
+                       (auction_id, user_id, amount, utcnow().isoformat()))
+            db.execute("UPDATE auctions SET high_bid=?, high_bidder=? WHERE auction_id=?", (amount, user_id, auction_id))
+            db.commit()
+        auction.high_bid, auction.high_bidder = amount, user_id
+        self.publish(auction)
+        return "ok", auction
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            closes_at, guild_id, auction_id = self._heap[0]
+            delay = (closes_at - utcnow()).total_seconds()
+            if delay > 0:
+                # Sleep until the earliest close, or until a sooner auction is scheduled
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+            heapq.heappop(self._heap)
+            auction = self.auctions.pop((guild_id, auction_id), None)
+            if auction is None:
+                continue
+            try:
+                self.close(auction)
+            except Exception as e:
+                print(f"❌ Failed to close auction #{auction_id} in guild {guild_id}: {e}")
 
-def get_market_channel(guild_id):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT market_channel FROM guild_config WHERE guild_id=?", (guild_id,)).fetchone()
-        return row[0] if row else None
+    def close(self, auction):
+        result = settle_auction(auction)
+        if result is None:
+            return
+        winner, price, role = result
+        guild = bot.get_guild(auction.guild_id)
+        if guild is None:
+            return
+        item_display = auction.item.replace('_', ' ').title()
+        if winner is None and WARES[auction.item]["type"] == "title" and title_lot_role(auction) is None:
+            embed = medieval_embed(title="🔨 Auction Closed", color_name="blue",
+                                   description=f"The **{item_display}** (lot #{auction.auction_id}) has no role to bestow any longer; "
+                                               f"the lot is withdrawn and no coin was taken.")
+        elif winner is None:
+            embed = medieval_embed(title="🔨 Auction Closed", color_name="blue",
+                                   description=f"No worthy bid was made for **{auction.qty}× {item_display}** (lot #{auction.auction_id}).")
+        else:
+            self._balances.pop((auction.guild_id, winner), None)
+            embed = medieval_embed(title="🔨 Sold!", color_name="gold",
+                                   description=f"**{auction.qty}× {item_display}** (lot #{auction.auction_id}) goes to "
+                                               f"**{member_name(guild, winner)}** for **{price}** gold!")
+            if role:
+                spawn(self.crown(guild, auction, winner, price, role))
+        channel = guild.get_channel(auction.channel_id) if auction.channel_id else None
+        if channel:
+            outbound.send(channel, embed=embed)
 
-def set_title_role(guild_id, title, role_id):
-    column = "baron_role" if title == "baron" else "viscount_role" if title == "viscount" else None
-    if column:
-        with sqlite3.connect(DB_NAME) as db:
-            db.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (guild_id,))
-            db.execute(f"UPDATE guild_config SET {column}=? WHERE guild_id=?", (role_id, guild_id))
+    async def crown(self, guild, auction, user_id, price, role):
+        member = await resolve_member(guild, user_id)
+        if member:
+            outbound.add_role(member, role)
+            return
+        # The winner has left the realm; the Crown returns the price rather than keep it for nothing
+        with ledger_connect(guild.id) as db:
+            db.execute("BEGIN IMMEDIATE")
+            credit_gold(db, user_id, price, guild.id)
             db.commit()
+        self._balances.pop((guild.id, user_id), None)
+        print(f"🔨 Lot #{auction.auction_id} in guild {guild.id}: winner {user_id} is gone, {price} gold refunded")
 
-def get_title_role(guild_id, title):
-    column = "baron_role" if title == "baron" else "viscount_role" if title == "viscount" else None
-    if column:
-        with sqlite3.connect(DB_NAME) as db:
-            row = db.execute(f"SELECT {column} FROM guild_config WHERE guild_id=?", (guild_id,)).fetchone()
-            return row[0] if row else None
-    return None
+auction_house = AuctionHouse()
 
-def set_tax_roles(guild_id, role_ids):
-    roles_str = ",".join(map(str, role_ids))
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (guild_id,))
-        db.execute("UPDATE guild_config SET tax_roles=? WHERE guild_id=?", (roles_str, guild_id))
-        db.commit()
+# ---------- SHOPPING CARTS ----------
+# `!buy bread 10, ale 5` and `!use healing potion 3` settle a whole cart in
+# one transaction: one balance check, one upsert per distinct ware.
+CART_MAX_QTY = 1000
+CONSUMABLE_TYPES = ("food", "drink", "potion")
 
-def get_tax_roles(guild_id):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT tax_roles FROM guild_config WHERE guild_id=?", (guild_id,)).fetchone()
-        return row[0] if row else None
+def parse_cart(text):
+    """Split "bread 10, ale 5" into [(item_key, qty)], merging repeats.
 
-def set_prison_role(guild_id, role_id):
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (guild_id,))
-        db.execute("UPDATE guild_config SET prison_role=? WHERE guild_id=?", (role_id, guild_id))
+    A bare name means one. Returns (cart, None), or (None, piece) naming the
+    first piece whose quantity is out of range.
+    """
+    cart = {}
+    for piece in text.split(","):
+        words = piece.split()
+        if not words:
+            continue
+        qty = 1
+        if len(words) > 1 and words[-1].isdigit():
+            qty = int(words.pop())
+        elif len(words) > 1 and words[0].isdigit():
+            qty = int(words.pop(0))
+        item = "_".join(words).lower()
+        cart[item] = cart.get(item, 0) + qty
+        if not 0 < cart[item] <= CART_MAX_QTY:
+            return None, piece.strip()
+    return list(cart.items()), None
+
+def buy_cart(user_id, cart, guild_id=None):
+    """Charge for and deliver a priced cart of (item, qty, cost) in one transaction.
+
+    Returns (status, gold) where status is "bought" or "poor" and gold is the
+    purse after the purchase, or as found when it could not be afforded.
+    Titles are paid for here but granted as roles by the caller.
+    """
+    total = sum(cost for _, _, cost in cart)
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        key = open_purses(db, [user_id], guild_id)[0]
+        gold = db.execute(f"SELECT gold FROM economy WHERE {KEY_WHERE}", key).fetchone()[0]
+        if gold < total:
+            db.rollback()
+            return "poor", gold
+        credit_gold(db, user_id, -total, guild_id)
+        for item, qty, _ in cart:
+            if ROYAL_MARKET[item].get("type") != "title":
+                credit_item(db, user_id, item, qty, guild_id)
+        gold = db.execute(f"SELECT gold FROM economy WHERE {KEY_WHERE}", key).fetchone()[0]
         db.commit()
+    return "bought", gold
 
-def get_prison_role(guild_id):
-    with sqlite3.connect(DB_NAME) as db:
-        row = db.execute("SELECT prison_role FROM guild_config WHERE guild_id=?", (guild_id,)).fetchone()
-        return row[0] if row else None
+def healing(item):
+    data = ROYAL_MARKET.get(item, {})
+    return data.get("heal", 30) if data.get("type") == "potion" and "healing" in item else 0
 
-# ---------- DEBT & PRISON ----------
-@tasks.loop(hours=24)
-async def levy_debt_interest():
-    with sqlite3.connect(DB_NAME) as db:
-        rows = db.execute("SELECT user_id, debt FROM economy WHERE debt > 0").fetchall()
-        for uid, debt in rows:
-            new_debt = int(debt * (1 + DEBT_INTEREST_RATE))
-            db.execute("UPDATE economy SET debt=? WHERE user_id=?", (new_debt, uid))
+def use_cart(user_id, cart, guild_id=None):
+    """Consume a cart of (item, qty) and apply any healing in one transaction.
+
+    Returns (missing, hp, remaining): missing is the first item not held in
+    the quantity asked (nothing is used then), hp is the HP after healing or
+    None when nothing healed, and remaining maps each item to what is left.
+    Lasting wares such as weapons are only required to be held.
+    """
+    items = [item for item, _ in cart]
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        key = open_purses(db, [user_id], guild_id)[0]
+        held = dict(db.execute(f"SELECT item, qty FROM inventory WHERE {KEY_WHERE} AND item IN ({','.join('?' * len(items))})",
+                               (*key, *items)).fetchall())
+        consumed = {item: qty for item, qty in cart if ROYAL_MARKET.get(item, {}).get("type") in CONSUMABLE_TYPES}
+        for item, qty in cart:
+            if held.get(item, 0) < consumed.get(item, 1):
+                db.rollback()
+                return item, None, held
+        for item, qty in consumed.items():
+            take_item(db, user_id, item, qty, guild_id)
+        heal = sum(healing(item) * qty for item, qty in consumed.items())
+        hp = None
+        if heal:
+            now = utcnow()
+            hp, hp_updated_at = db.execute(f"SELECT hp, hp_updated_at FROM economy WHERE {KEY_WHERE}", key).fetchone()
+            hp = max(0, min(MAX_HP, hp_at(hp, hp_updated_at, now) + heal))
+            db.execute(f"UPDATE economy SET hp=?, hp_updated_at=? WHERE {KEY_WHERE}", (hp, now.isoformat(), *key))
         db.commit()
-    await check_prison_sentences()
+    return None, hp, {item: held[item] - consumed.get(item, 0) for item in items}
 
-async def check_prison_sentences():
-    now = utcnow()
-    with sqlite3.connect(DB_NAME) as db:
-        rows = db.execute("SELECT user_id, debt_since FROM economy WHERE debt > 0 AND debt_since IS NOT NULL").fetchall()
-        for uid, since_str in rows:
-            try:
-                since = dt.fromisoformat(since_str).replace(tzinfo=timezone.utc)
-                if (now - since).days >= DAYS_BEFORE_PRISON:
-                    for guild in bot.guilds:
-                        member = guild.get_member(uid)
-                        if not member:
-                            continue
-                        
-                        # Get prison role from config or fallback to name
-                        prison_role_id = get_prison_role(guild.id)
-                        if prison_role_id:
-                            role = guild.get_role(prison_role_id)
-                        else:
-                            role = discord.utils.get(guild.roles, name=PRISON_ROLE_NAME)
-                            
-                        if role and role not in member.roles:
-                            try:
-                                await member.add_roles(role)
-                                market_chan_id = get_market_channel(guild.id)
-                                if market_chan_id:
-                                    chan = guild.get_channel(market_chan_id)
-                                    if chan:
-                                        await chan.send(
-                                            f"⚖️ **Hear ye!** {member.display_name} hath been cast into debtor's prison "
-                                            f"for failing to settle debts to the Crown!"
-                                        )
-                            except discord.Forbidden:
-                                pass
-            except ValueError:
-                continue
+# ---------- CRAFTING ----------
+# Recipes form a graph from raw resources through intermediates such as
+# iron_ingot up to finished wares. It is compiled once at import into a
+# topological order, so a plan settles every product before its ingredients
+# in one pass, an index of the recipes each ware can feed, and each
+# product's bill of raw wares flattened through its intermediates.
+RECIPES = {  # product -> {ingredient: qty}; each craft makes one
+    "iron_ingot": {"iron_ore": 3},
+    "leather": {"furs": 2},
+    "dagger": {"iron_ingot": 2, "leather": 1},
+    "shortsword": {"iron_ingot": 4, "leather": 1},
+    "warhammer": {"iron_ingot": 6, "leather": 1},
+    "helmet": {"iron_ingot": 3},
+    "shield": {"iron_ingot": 1, "leather": 2},
+    "leather_armor": {"leather": 4},
+    "chainmail": {"iron_ingot": 8, "leather": 1},
+    "plate_armor": {"iron_ingot": 14, "leather": 2},
+    "lantern": {"iron_ingot": 1},
+    "healing_potion": {"herbs": 2, "ale": 1},
+    "mana_potion": {"herbs": 2, "mead": 1},
+    "enchanted_ring": {"gemstones": 4, "iron_ingot": 1, "mana_potion": 2},
+}
 
-@levy_debt_interest.before_loop
-async def before_interest():
-    await bot.wait_until_ready()
+def compile_recipes(recipes):
+    """Order every ware in the recipe graph ingredients-first (Kahn's algorithm).
 
-# ---------- DAILY TAX COLLECTION ----------
-@tasks.loop(hours=24)
-async def collect_royal_tax():
-    for guild in bot.guilds:
-        tax_roles_str = get_tax_roles(guild.id)
-        if not tax_roles_str:
+    Returns (order, feeds) where feeds maps each ware to every recipe it can
+    go into, directly or through intermediates. Raises ValueError on an
+    unknown ware or a cycle.
+    """
+    nodes = set(recipes) | {ingredient for needs in recipes.values() for ingredient in needs}
+    unknown = nodes - WARES.keys()
+    if unknown:
+        raise ValueError(f"Recipes name unknown wares: {', '.join(sorted(unknown))}")
+    products_of = {node: [] for node in nodes}
+    waiting = {node: len(recipes.get(node, ())) for node in nodes}
+    for product, needs in recipes.items():
+        for ingredient in needs:
+            products_of[ingredient].append(product)
+    ready = sorted(node for node, count in waiting.items() if count == 0)
+    order = []
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for product in products_of[node]:
+            waiting[product] -= 1
+            if waiting[product] == 0:
+                ready.append(product)
+    if len(order) < len(nodes):
+        raise ValueError(f"Recipes form a cycle through: {', '.join(sorted(nodes - set(order)))}")
+    feeds = {}
+    for node in reversed(order):  # Products first, so each ware inherits what its products feed
+        feeds[node] = frozenset(products_of[node]).union(*(feeds[product] for product in products_of[node]))
+    return order, feeds
+
+def flatten_recipes(recipes, order):
+    """Per product, the raw wares one craft needs in all and the intermediates on the way.
+
+    Returns (needs, parts): needs maps each product to {raw ware: qty} and
+    parts to the frozenset of crafted wares somewhere in its recipe tree.
+    """
+    needs, parts = {}, {}
+    for ware in order:  # Ingredients first, so each product sums settled bills
+        if ware not in recipes:
+            needs[ware], parts[ware] = {ware: 1}, frozenset()
             continue
-        tax_role_ids = [int(r) for r in tax_roles_str.split(',') if r]
-        if not tax_role_ids:
+        bill = collections.Counter()
+        for ingredient, count in recipes[ware].items():
+            for raw, qty in needs[ingredient].items():
+                bill[raw] += count * qty
+        needs[ware] = dict(bill)
+        parts[ware] = frozenset(i for i in recipes[ware] if i in recipes).union(*(parts[i] for i in recipes[ware]))
+    return {p: needs[p] for p in recipes}, {p: parts[p] for p in recipes}
+
+RECIPE_ORDER, RECIPE_FEEDS = compile_recipes(RECIPES)
+RECIPE_NEEDS, RECIPE_PARTS = flatten_recipes(RECIPES, RECIPE_ORDER)
+RECIPE_RANK = {ware: rank for rank, ware in enumerate(RECIPE_ORDER)}
+
+def craft_plan(product, qty, held):
+    """Inventory changes that craft qty of product out of held wares.
+
+    Walks the graph products-first, taking intermediates from the sack before
+    crafting more of them. Returns (changes, short): changes is a change_items
+    batch and short maps each raw ware to how many more would be needed.
+    """
+    wanted = {product: qty}
+    changes = {product: qty}
+    short = {}
+    for ware in reversed(RECIPE_ORDER):
+        want = wanted.get(ware, 0)
+        if not want:
             continue
+        if ware != product:
+            used = min(held.get(ware, 0), want)
+            if used:
+                changes[ware] = -used
+            want -= used
+        if want and ware in RECIPES:
+            for ingredient, count in RECIPES[ware].items():
+                wanted[ingredient] = wanted.get(ingredient, 0) + count * want
+        elif want:
+            short[ware] = want
+    return changes, short
 
-        # Collect tax from all non-bot members
-        total_tax = 0
-        taxed_members = []
-        for member in guild.members:
-            if member.bot:
-                continue
-            gold_before = get_pouch(member.id)[0]
-            add_coin(member.id, -DAILY_TAX)
-            gold_after = get_pouch(member.id)[0]
-            deducted = gold_before - gold_after
-            total_tax += deducted
-            if deducted > 0:
-                taxed_members.append((member, deducted))
-
-        # Find recipients
-        recipients = [m for m in guild.members if any(r.id in tax_role_ids for r in m.roles)]
-        if recipients:
-            share = total_tax // len(recipients)
-            remainder = total_tax % len(recipients)
-            for i, recipient in enumerate(recipients):
-                add_share = share + (1 if i < remainder else 0)
-                add_coin(recipient.id, add_share)
-
-            # Announce in market channel
-            market_chan_id = get_market_channel(guild.id)
-            if market_chan_id:
-                chan = guild.get_channel(market_chan_id)
-                if chan:
-                    embed = medieval_embed(
-                        title="🏰 Royal Tax Collection",
-                        description=f"**{total_tax}** gold hath been collected and distributed amongst the nobles!",
-                        color_name="gold"
-                    )
-                    if taxed_members:
-                        taxed_list = "\n".join([f"• {m.display_name}: {g}g" for m, g in taxed_members[:10]])
-                        if len(taxed_members) > 10:
-                            taxed_list += f"\n• ...and {len(taxed_members) - 10} more"
-                        embed.add_field(name="Taxed Subjects", value=taxed_list, inline=False)
-                    
-                    recipients_list = ", ".join([r.display_name for r in recipients[:5]])
-                    if len(recipients) > 5:
-                        recipients_list += f", and {len(recipients) - 5} more"
-                    embed.add_field(name="Noble Recipients", value=recipients_list, inline=False)
-                    
-                    await chan.send(embed=embed)
+def max_crafts(product, held, limit=CART_MAX_QTY):
+    """Most of product the held wares can make, up to limit, by bisecting over craft_plan"""
+    low, high = 0, limit + 1  # low can be made, high cannot (or is past the limit)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if craft_plan(product, middle, held)[1]:
+            high = middle
+        else:
+            low = middle
+    return low
 
-@collect_royal_tax.before_loop
-async def before_tax():
-    await bot.wait_until_ready()
+def craftable_from(held):
+    """{product: how many} for everything the held wares can make, ingredients-first.
 
-# ---------- SHOP VIEW ----------
-class MarketView(discord.ui.View):
-    def __init__(self, ctx, current_page=0, titles_only=False):
-        super().__init__(timeout=120)
-        self.ctx = ctx
-        self.current_page = current_page
-        self.titles_only = titles_only
-        items = {k: v for k, v in ROYAL_MARKET.items() if not titles_only or v.get("type") == "title"}
-        self.total_pages = (len(items) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
-        self.update_buttons()
+    Only recipes that something in the sack feeds are tried. Each is counted
+    in one pass over its flattened bill of raw wares; when the sack also
+    holds intermediates of that recipe, the count from raw wares alone is
+    not exact, so craft_plan is bisected below the bound the sack's raw
+    worth allows.
+    """
+    held = {ware: qty for ware, qty in held.items() if qty > 0}
+    candidates = set().union(*(RECIPE_FEEDS.get(ware, ()) for ware in held))
+    counts = {}
+    for product in candidates:
+        needs = RECIPE_NEEDS[product]
+        intermediates = RECIPE_PARTS[product].intersection(held)
+        # Raw wares in hand, plus those already worked into held intermediates
+        worth = collections.Counter({raw: held.get(raw, 0) for raw in needs})
+        for ware in intermediates:
+            for raw, qty in RECIPE_NEEDS[ware].items():
+                worth[raw] += held[ware] * qty
+        bound = min(CART_MAX_QTY, *(worth[raw] // qty for raw, qty in needs.items()))
+        counts[product] = max_crafts(product, held, bound) if intermediates and bound else bound
+    return {product: counts[product] for product in sorted(candidates, key=RECIPE_RANK.get) if counts[product]}
 
-    def update_buttons(self):
-        self.clear_items()
-        prev_button = discord.ui.Button(emoji="◀️", style=discord.ButtonStyle.gray, disabled=self.current_page == 0)
-        next_button = discord.ui.Button(emoji="▶️", style=discord.ButtonStyle.gray, disabled=self.current_page >= self.total_pages - 1)
-        prev_button.callback = self.prev_callback
-        next_button.callback = self.next_callback
-        self.add_item(prev_button)
-        self.add_item(next_button)
+def craft_ware(user_id, product, qty, guild_id=None):
+    """Plan against the sack and consume and produce in one transaction.
 
-    async def prev_callback(self, interaction: discord.Interaction):
-        if interaction.user.id != self.ctx.author.id:
-            await interaction.response.send_message("🚫 This market stall is not meant for thee, good sir!", ephemeral=True)
-            return
-        self.current_page -= 1
-        self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_page_embed(), view=self)
+    Returns (changes, short) as craft_plan does; nothing changes when short.
+    """
+    with ledger_connect(guild_id) as db:
+        db.execute("BEGIN IMMEDIATE")
+        held = dict(db.execute(f"SELECT item, qty FROM inventory WHERE {KEY_WHERE}", ledger_key(user_id, guild_id)).fetchall())
+        changes, short = craft_plan(product, qty, held)
+        if short:
+            db.rollback()
+            return changes, short
+        apply_item_changes(db, user_id, changes, guild_id)
+        db.commit()
+    return changes, short
 
-    async def next_callback(self, interaction: discord.Interaction):
-        if interaction.user.id != self.ctx.author.id:
-            await interaction.response.send_message("🚫 This market stall is not meant for thee, fair maiden!", ephemeral=True)
-            return
-        self.current_page += 1
-        self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_page_embed(), view=self)
+# ---------- COMMAND CORE ----------
+# Command logic lives in core_* coroutines that take an Actor and return a
+# Reply. Thin prefix and slash adapters feed them through dispatch(), which
+# is the one place that locks ledgers, records metrics and renders replies.
+command_metrics = collections.defaultdict(collections.Counter)  # command -> calls / errors / seconds
 
-    def get_page_embed(self):
-        items = {k: v for k, v in ROYAL_MARKET.items() if not self.titles_only or v.get("type") == "title"}
-        item_list = list(items.items())
-        start_idx = self.current_page * ITEMS_PER_PAGE
-        end_idx = start_idx + ITEMS_PER_PAGE
-        page_items = item_list[start_idx:end_idx]
-        title = "🏪 Royal Titles Shop" if self.titles_only else f"🏪 Royal Marketplace - Page {self.current_page + 1} of {self.total_pages}"
-        embed = medieval_embed(
-            title=title,
-            color_name="gold"
-        )
-        for item_key, data in page_items:
-            price = data["price"]
-            price_str = f"**{price}** gold"
-            type_icons = {
-                "weapon": "⚔️",
-                "armor": "🛡️",
-                "potion": "🧪",
-                "magic": "🔮",
-                "food": "🍞",
-                "drink": "🍺",
-                "tool": "🛠️",
-                "luxury": "💎",
-                "companion": "🐕",
-                "mount": "🐎",
-                "resource": "⛏️",
-                "title": "👑"
-            }
-            icon = type_icons.get(data["type"], "📦")
-            item_name = item_key.replace('_', ' ').title()
-            embed.add_field(
-                name=f"{icon} {item_name} - {price_str}",
-                value=f"{data['desc']}\n*Use: {data['use']}*",
-                inline=False
-            )
-        embed.set_footer(text=f"Use {PREFIX}buy <item_name> to purchase • {len(items)} total wares")
-        embed.description = "**Noble titles and privileges!**" if self.titles_only else "**Fine wares from across the realm!**"
-        return embed
+class Actor:
+    """Who invoked a command, in which guild and channel"""
+    __slots__ = ("author", "guild", "channel")
 
-# ---------- PREFIX COMMANDS ----------
-@bot.command(name="help")
-@commands.guild_only()
-async def _help(ctx):
+    def __init__(self, author, guild, channel=None):
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+
+class Reply:
+    """What a command wants said back, independent of how it was invoked"""
+    __slots__ = ("content", "embed", "view", "ephemeral")
+
+    def __init__(self, content=None, embed=None, view=None, ephemeral=False):
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.ephemeral = ephemeral
+
+def core_command(*serialize):
+    """Mark a command core; `serialize` names whose ledgers it holds ("author" or a member argument)"""
+    def decorator(func):
+        func.serialize = serialize
+        func.command_name = func.__name__.removeprefix("core_")
+        return func
+    return decorator
+
+async def dispatch(ctx, core, **kwargs):
+    if shutting_down:
+        # Buffers are being flushed; a command now could write after them
+        return await ctx.send(embed=medieval_response("The market is closing its stalls for the night. Return anon!", success=False))
+    # Shutdown waits on these before it flushes what they write
+    task = asyncio.current_task()
+    _in_flight.add(task)
+    try:
+        await run_command(ctx, core, **kwargs)
+    finally:
+        _in_flight.discard(task)
+
+async def run_command(ctx, core, **kwargs):
+    actor = Actor(ctx.author, ctx.guild, ctx.channel)
+    if actor.guild:
+        note_admin(actor.author)
+        if MEMBER_DIRECTORY == "database":
+            touch_member(actor.author)
+    metrics = command_metrics[core.command_name]
+    started = time.perf_counter()
+    try:
+        if core.serialize:
+            user_ids = [actor.author.id if name == "author" else kwargs[name].id
+                        for name in core.serialize if name == "author" or kwargs.get(name) is not None]
+            # Per-guild purses are independent, so their locks are too
+            scope = f"{actor.guild.id}:" if PER_GUILD_ECONOMY else ""
+            async with coordinator.user_locks(user_ids, scope):
+                reply = await core(actor, **kwargs)
+                if COORDINATOR_URL:
+                    # Another process may take these users next and must see their buffered writes
+                    write_behind.flush()
+        else:
+            reply = await core(actor, **kwargs)
+    except Exception:
+        metrics["errors"] += 1
+        raise
+    finally:
+        metrics["calls"] += 1
+        metrics["seconds"] += time.perf_counter() - started
+    if reply is not None:
+        message = await ctx.send(reply.content, embed=reply.embed, view=reply.view, ephemeral=reply.ephemeral)
+        if reply.view is not None:
+            reply.view.message = message
+
+# ---------- COMMANDS ----------
+@core_command()
+async def core_help(actor, marker=PREFIX):
     embed = medieval_embed(
         title="📜 The Royal Charter of Commands",
         description=f"{medieval_greeting()}\n\nHere be the edicts and privileges granted by His Majesty:",
@@ -710,85 +3691,65 @@ async def _help(ctx):
         "daily": f"Receive thy daily bounty from the royal coffers ({MAX_DAILY_GOLD} gold, once per day)",
         "market": "Peruse the wares of the grand marketplace",
         "titleshop": "Behold the exalted shop of noble titles",
-        "buy": "Acquire goods or honours from the merchants",
+        "buy": "Acquire goods or honours from the merchants, by the dozen or by the cart (`bread 10, ale 5`)",
         "pouch": "Examine the weight of thy purse",
         "sack": "Survey the contents of thy travelling sack",
-        "use": "Employ an item from thine inventory",
+        "use": "Employ items from thine inventory, several at once if thou wilt",
         "pay": "Bestow coin upon another subject of the realm",
         "gamble • slots • coinflip": "Test thy fortune in games of chance",
         "paydebt": "Settle thy obligations to the Crown",
         "battle": "Challenge another to a duel of honour",
+        "tournament": "Enter the lists of the royal tournament",
+        "bid • ask": "Offer to buy or sell goods to other subjects at thy price",
+        "orders • cancelorder": "Survey the trading book or withdraw thine orders",
+        "auction • auctionbid • auctions": "Put rare goods under the hammer, or bid on others' lots",
+        "craft • craftable": "Smelt, tan and forge thy raw materials into finer wares",
         "equip": "Arm thyself with weapon or armor",
+        "unequip": "Remove equipment",
         "use_potion": "Quaff a healing potion to mend wounds",
     }
     for name, desc in cmds.items():
-        embed.add_field(name=f"**{PREFIX}{name}**", value=f"_{desc}_", inline=False)
+        embed.add_field(name=f"**{marker}{name}**", value=f"_{desc}_", inline=False)
     embed.add_field(
         name="⚖️ Laws of the Realm",
         value=(
             f"• Daily toil: once per hour\n"
             f"• Royal stipend: once per day\n"
             f"• A tax of {DAILY_TAX} gold is levied daily upon all subjects\n"
+            f"• Wounds heal {HP_REGEN_PER_HOUR} HP each hour\n"
             f"• Debts accrue 2% interest each day\n"
             f"• Unpaid debt for {DAYS_BEFORE_PRISON} days leads to the debtor's prison"
         ),
         inline=False
     )
-    embed.add_field(
-        name="🔗 Slash Commands",
-        value="All commands are also available as modern `/` commands!",
-        inline=False
-    )
-    await ctx.send(embed=embed)
+    if marker == PREFIX:
+        embed.add_field(
+            name="🔗 Slash Commands",
+            value="All commands are also available as modern `/` commands!",
+            inline=False
+        )
+    return Reply(embed=embed)
 
-@bot.command(aliases=['work', 'toil'])
+@bot.command(name="help")
 @commands.guild_only()
-async def labour(ctx):
-    cd = get_cooldown(ctx.author.id, "labour")
-    if cd and utcnow() - cd < timedelta(hours=1):
-        remain = timedelta(hours=1) - (utcnow() - cd)
+async def _help(ctx):
+    await dispatch(ctx, core_help)
+
+@core_command("author")
+async def core_labour(actor):
+    cd = get_cooldown(actor.author.id, "labour", actor.guild.id)
+    if cd and utcnow() - cd < LABOUR_COOLDOWN:
+        remain = LABOUR_COOLDOWN - (utcnow() - cd)
         m = remain.seconds // 60
         s = remain.seconds % 60
-        return await ctx.send(embed=medieval_response(
+        return Reply(embed=medieval_response(
             f"Thou must rest thy weary bones! Return in **{m}** minutes and **{s}** seconds.",
             success=False
         ))
-    jobs = {
-        "mining": {
-            "gold": (5, 20),
-            "desc": "⛏️ Mining ore in the deep mines",
-            "flair": ["The earth yielded its treasures!", "A rich vein was struck!", "The pickaxe rang true in the depths!"]
-        },
-        "farming": {
-            "gold": (3, 10),
-            "desc": "🌾 Tilling the royal fields",
-            "flair": ["The harvest was bountiful!", "The soil yielded good crop!", "The fields were fertile this day!"]
-        },
-        "blacksmith": {
-            "gold": (5, 15),
-            "desc": "🔥 Forging at the royal smithy",
-            "flair": ["The anvil sang with each strike!", "Steel was tempered to perfection!", "The forge burned bright and hot!"]
-        },
-        "carpentry": {
-            "gold": (4, 12),
-            "desc": "🪵 Crafting in the royal workshop",
-            "flair": ["Wood was shaped with master skill!", "Joints were fitted without flaw!", "The saw made sweet music!"]
-        },
-        "merchant": {
-            "gold": (6, 25),
-            "desc": "💰 Trading in the market square",
-            "flair": ["A shrewd bargain was struck!", "Goods changed hands profitably!", "The market favored thy trade!"]
-        },
-        "guard": {
-            "gold": (4, 15),
-            "desc": "🛡️ Standing watch on castle walls",
-            "flair": ["The watch was uneventful but paid!", "No invaders this shift!", "The walls were well defended!"]
-        }
-    }
-    job_name, job_data = random.choice(list(jobs.items()))
+    job_name, job_data = random.choice(list(LABOUR_JOBS.items()))
     gold = random.randint(job_data["gold"][0], job_data["gold"][1])
-    add_coin(ctx.author.id, gold, ctx)
-    set_cooldown(ctx.author.id, "labour")
+    add_coin(actor.author.id, gold, actor)
+    set_cooldown(actor.author.id, "labour", actor.guild.id)
     coin_str = f"**{gold}** gold piece{'s' if gold > 1 else ''}"
     flair = random.choice(job_data["flair"])
     embed = medieval_embed(
@@ -796,31 +3757,34 @@ async def labour(ctx):
         description=f"**{job_data['desc']}**\n\n{flair}\n\nThou hast earned: {coin_str}.",
         color_name="green"
     )
-    if ctx.author.guild_permissions.administrator:
-        g, _, _, hp = get_pouch(ctx.author.id, ctx)
+    if actor.author.guild_permissions.administrator:
+        g, _, _, hp = get_pouch(actor.author.id, actor)
         admin_status = f"👑 **Royal Administrator:** {g}/{CAP_GOLD} gold"
         embed.set_footer(text=admin_status)
     else:
         embed.set_footer(text="Return in one hour for more work at the royal works")
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['stipend', 'allowance'])
+@bot.command(aliases=['work', 'toil'])
 @commands.guild_only()
-async def daily(ctx):
-    """Claim thy daily royal stipend (24 hour cooldown, max 10g)"""
-    cd = get_cooldown(ctx.author.id, "daily")
+async def labour(ctx):
+    await dispatch(ctx, core_labour)
+
+@core_command("author")
+async def core_daily(actor):
+    cd = get_cooldown(actor.author.id, "daily", actor.guild.id)
     if cd and utcnow() - cd < timedelta(days=1):
         remain = timedelta(days=1) - (utcnow() - cd)
         h = remain.seconds // 3600
         m = (remain.seconds % 3600) // 60
-        return await ctx.send(embed=medieval_response(
+        return Reply(embed=medieval_response(
             f"Thou hast already claimed today's stipend! Return in **{h}** hours and **{m}** minutes.",
             success=False
         ))
     # Daily reward - fixed at 10 gold maximum
     total_gold = MAX_DAILY_GOLD
-    add_coin(ctx.author.id, total_gold, ctx)
-    set_cooldown(ctx.author.id, "daily")
+    add_coin(actor.author.id, total_gold, actor)
+    set_cooldown(actor.author.id, "daily", actor.guild.id)
     daily_messages = [
         f"The Crown grants thee thy daily stipend!",
         f"Thy loyalty is rewarded with coin!",
@@ -833,39 +3797,62 @@ async def daily(ctx):
         color_name="green"
     )
     # Check admin status
-    if ctx.author.guild_permissions.administrator:
-        g, _, _, hp = get_pouch(ctx.author.id, ctx)
+    if actor.author.guild_permissions.administrator:
+        g, _, _, hp = get_pouch(actor.author.id, actor)
         admin_note = f"👑 **Royal Purse:** {g}/{CAP_GOLD} gold"
         embed.set_footer(text=admin_note)
     else:
         next_daily = utcnow() + timedelta(days=1)
         embed.set_footer(text=f"Next stipend: <t:{int(next_daily.timestamp())}:R> • Max: {MAX_DAILY_GOLD}g daily")
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
+
+@bot.command(aliases=['stipend', 'allowance'])
+@commands.guild_only()
+async def daily(ctx):
+    """Claim thy daily royal stipend (24 hour cooldown, max 10g)"""
+    await dispatch(ctx, core_daily)
+
+@core_command()
+async def core_market(actor):
+    view = MarketView(actor)
+    embed = view.get_page_embed()
+    return Reply(embed=embed, view=view)
 
 @bot.command(aliases=['shop', 'wares'])
 @commands.guild_only()
 async def market(ctx):
     """Browse the royal marketplace wares"""
-    view = MarketView(ctx)
+    await dispatch(ctx, core_market)
+
+@core_command()
+async def core_titleshop(actor):
+    view = MarketView(actor, titles_only=True)
     embed = view.get_page_embed()
-    await ctx.send(embed=embed, view=view)
+    return Reply(embed=embed, view=view)
 
 @bot.command(aliases=['titles', 'nobleshop'])
 @commands.guild_only()
 async def titleshop(ctx):
     """Browse the noble titles shop"""
-    view = MarketView(ctx, titles_only=True)
-    embed = view.get_page_embed()
-    await ctx.send(embed=embed, view=view)
+    await dispatch(ctx, core_titleshop)
 
-@bot.command(aliases=['purchase', 'acquire'])
-@commands.guild_only()
-async def buy(ctx, *, item_name: str):
-    """Purchase an item from the market"""
-    item_key = item_name.lower().replace(" ", "_")
-    if item_key not in ROYAL_MARKET:
+@core_command("author")
+async def core_buy(actor, item_name: str, qty: int = None):
+    cart, bad = parse_cart(item_name)
+    if cart and qty is not None and len(cart) == 1:
+        cart = [(cart[0][0], qty)]  # The slash command's quantity option
+    if not cart or not all(0 < n <= CART_MAX_QTY for _, n in cart):
+        return Reply(embed=medieval_response(
+            (f"'{bad}' is no fit quantity! " if bad else "") +
+            f"Name wares and quantities of 1 to {CART_MAX_QTY}, as in `{PREFIX}buy bread 10, ale 5`!",
+            success=False
+        ))
+    for item_key, _ in cart:
+        if item_key in ROYAL_MARKET:
+            continue
+        item_name = item_key.replace('_', ' ')
         # Try to find similar items
-        similar = [i for i in ROYAL_MARKET.keys() if item_key in i or item_name.lower() in i.replace('_', ' ')]
+        similar = [i for i in ROYAL_MARKET.keys() if item_key in i or item_name in i.replace('_', ' ')]
         if similar:
             suggestion = random.choice(similar)
             embed = medieval_response(
@@ -879,60 +3866,66 @@ async def buy(ctx, *, item_name: str):
                 success=False,
                 extra=f"Use `{PREFIX}market` to see what wares we offer."
             )
-        return await ctx.send(embed=embed)
-    
-    item_data = ROYAL_MARKET[item_key]
-    price = item_data["price"]
+        return Reply(embed=embed)
+    if any(n > 1 and ROYAL_MARKET[item].get("type") == "title" for item, n in cart):
+        return Reply(embed=medieval_response("A title can be bought but once!", success=False))
     
-    # Check if user has enough gold
-    g, debt, _, hp = get_pouch(ctx.author.id, ctx)
-    if g < price:
-        return await ctx.send(embed=medieval_response(
-            f"Thou hast only **{g}** gold, but needest **{price}** for this purchase!",
+    # Price the whole cart, then check the purse and pay once
+    priced = [(item, n, market_prices.quote(item, n)) for item, n in cart]
+    total = sum(cost for _, _, cost in priced)
+    status, g = buy_cart(actor.author.id, priced, actor.guild.id)
+    if status == "poor":
+        return Reply(embed=medieval_response(
+            f"Thou hast only **{g}** gold, but needest **{total}** for this purchase!",
             success=False
         ))
-    
-    # Make purchase
-    add_coin(ctx.author.id, -price, ctx)
-    if item_data.get("type") == "title":
-        title = "baron" if "baron" in item_key else "viscount" if "viscount" in item_key else None
-        if title:
-            role_id = get_title_role(ctx.guild.id, title)
-            if role_id:
-                role = ctx.guild.get_role(role_id)
-                if role:
-                    await ctx.author.add_roles(role)
-    else:
-        add_item(ctx.author.id, item_key)
+    for item_key, n, _ in priced:
+        market_prices.record(item_key, n)
+        if ROYAL_MARKET[item_key].get("type") == "title":
+            title = "baron" if "baron" in item_key else "viscount" if "viscount" in item_key else None
+            if title:
+                role_id = get_title_role(actor.guild.id, title)
+                if role_id:
+                    role = actor.guild.get_role(role_id)
+                    if role:
+                        await actor.author.add_roles(role)
     
     # Success message
-    item_display = item_key.replace('_', ' ').title()
-    price_str = f"**{price}** gold"
-    purchase_flairs = [
-        f"A fine choice! The {item_display} is now thine!",
-        f"Excellent purchase! The {item_display} shall serve thee well!",
-        f"Thou hast acquired the {item_display}! May it bring thee fortune!",
-        f"The {item_display} is wrapped and ready! A wise investment!",
-        f"The merchant smiles! The {item_display} is thine for {price_str}!",
-    ]
-    embed = medieval_embed(
-        title="🏪 Purchase Complete!",
-        description=f"{random.choice(purchase_flairs)}\n\n**Item:** {item_display}\n**Cost:** {price_str}\n**Use:** {item_data['use']}",
-        color_name="green"
-    )
+    if len(priced) == 1:
+        item_key, n, _ = priced[0]
+        item_display = item_key.replace('_', ' ').title()
+        price_str = f"**{total}** gold"
+        purchase_flairs = [
+            f"A fine choice! The {item_display} is now thine!",
+            f"Excellent purchase! The {item_display} shall serve thee well!",
+            f"Thou hast acquired the {item_display}! May it bring thee fortune!",
+            f"The {item_display} is wrapped and ready! A wise investment!",
+            f"The merchant smiles! The {item_display} is thine for {price_str}!",
+        ]
+        quantity = f" ×{n}" if n > 1 else ""
+        description = (f"{random.choice(purchase_flairs)}\n\n**Item:** {item_display}{quantity}\n**Cost:** {price_str}"
+                       f"\n**Use:** {ROYAL_MARKET[item_key]['use']}")
+        footer = f"Use {PREFIX}use {item_display.lower()} to employ thy new ware"
+    else:
+        lines = "\n".join(f"• {n}× {item_key.replace('_', ' ').title()}: **{cost}** gold" for item_key, n, cost in priced)
+        description = f"The merchant loads thy cart to the brim!\n\n{lines}\n**Total:** **{total}** gold"
+        footer = f"Use {PREFIX}sack to admire thy new wares"
+    embed = medieval_embed(title="🏪 Purchase Complete!", description=description, color_name="green")
     # Show remaining balance
-    g, debt, _, hp = get_pouch(ctx.author.id, ctx)
-    balance_desc = f"**{g}** gold"
-    embed.add_field(name="Remaining Purse", value=balance_desc, inline=False)
-    embed.set_footer(text=f"Use {PREFIX}use {item_display.lower()} to employ thy new ware")
-    await ctx.send(embed=embed)
+    embed.add_field(name="Remaining Purse", value=f"**{g}** gold", inline=False)
+    embed.set_footer(text=footer)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['purse', 'coins', 'wealth'])
+@bot.command(aliases=['purchase', 'acquire'])
 @commands.guild_only()
-async def pouch(ctx, member: discord.Member = None):
-    """Count the coin in thy purse"""
-    member = member or ctx.author
-    g, debt, debt_since, hp = get_pouch(member.id, ctx)
+async def buy(ctx, *, item_name: str):
+    """Purchase wares from the market: `bread`, `bread 50` or `bread 10, ale 5`"""
+    await dispatch(ctx, core_buy, item_name=item_name)
+
+@core_command()
+async def core_pouch(actor, member: discord.Member = None):
+    member = member or actor.author
+    g, debt, debt_since, hp = get_pouch(member.id, actor)
     # Coin descriptions
     coin_desc = f"**{g}** gold piece{'s' if g > 1 else ''}" if g > 0 else "**naught but dust and dreams**"
     embed = medieval_embed(
@@ -966,171 +3959,99 @@ async def pouch(ctx, member: discord.Member = None):
         embed.set_footer(text="👑 Royal Administrator • Purse fortified by 50%")
     else:
         embed.set_footer(text=f"Use {PREFIX}labour or {PREFIX}daily to earn coin")
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['inventory', 'possessions', 'bag'])
+@bot.command(aliases=['purse', 'coins', 'wealth'])
 @commands.guild_only()
-async def sack(ctx, member: discord.Member = None):
-    """Check thy possessions and inventory"""
-    member = member or ctx.author
-    inventory = get_inventory(member.id)
-    if not inventory:
+async def pouch(ctx, member: discord.Member = None):
+    """Count the coin in thy purse"""
+    await dispatch(ctx, core_pouch, member=member)
+
+@core_command()
+async def core_sack(actor, member: discord.Member = None):
+    member = member or actor.author
+    rows = get_sack(member.id, actor.guild.id)
+    if not rows:
         embed = medieval_response(
             "Thy sack is empty as a beggar's bowl!",
             success=False,
             extra=f"Visit the {PREFIX}market to purchase wares."
         )
-        return await ctx.send(embed=embed)
-    
-    # Categorize items
-    categories = {
-        "⚔️ Weapons": {},
-        "🛡️ Armor": {},
-        "🔮 Magic": {},
-        "🧪 Potions": {},
-        "🍞 Provisions": {},
-        "🛠️ Tools": {},
-        "💎 Luxuries": {},
-        "🐕 Companions": {},
-        "⛏️ Resources": {},
-        "👑 Titles": {},
-        "📦 Miscellaneous": {}
-    }
-    
-    # Initialize all categories first
-    for item_key, qty in inventory.items():
-        item_data = ROYAL_MARKET.get(item_key, {})
-        item_type = item_data.get("type", "misc")
-        item_name = item_key.replace('_', ' ').title()
-        if item_type == "weapon":
-            categories["⚔️ Weapons"][item_name] = qty
-        elif item_type == "armor":
-            categories["🛡️ Armor"][item_name] = qty
-        elif item_type == "magic":
-            categories["🔮 Magic"][item_name] = qty
-        elif item_type == "potion":
-            categories["🧪 Potions"][item_name] = qty
-        elif item_type in ["food", "drink"]:
-            categories["🍞 Provisions"][item_name] = qty
-        elif item_type == "tool":
-            categories["🛠️ Tools"][item_name] = qty
-        elif item_type == "luxury":
-            categories["💎 Luxuries"][item_name] = qty
-        elif item_type in ["companion", "mount"]:
-            categories["🐕 Companions"][item_name] = qty
-        elif item_type == "resource":
-            categories["⛏️ Resources"][item_name] = qty
-        elif item_type == "title":
-            categories["👑 Titles"][item_name] = qty
-        else:
-            categories["📦 Miscellaneous"][item_name] = qty
-    
-    total_items = sum(inventory.values())
-    embed = medieval_embed(
-        title=f"🎒 Sack of {member.display_name}",
-        description=f"**Total Items:** {total_items}\n**Unique Wares:** {len(inventory)}",
-        color_name="blue"
-    )
-    
-    for category_name, items in categories.items():
-        if items:
-            items_list = "\n".join([f"• {k}: **{v}**" for k, v in items.items()])
-            embed.add_field(name=category_name, value=items_list, inline=False)
-    
-    # Show equipped items
-    equipped = get_equipped(member.id)
-    if equipped:
-        equipped_list = ", ".join([e.replace('_', ' ').title() for e in equipped])
-        embed.add_field(name="⚔️ Equipped", value=equipped_list, inline=False)
+        return Reply(embed=embed)
     
+    total_items = sum(qty for _, qty, _ in rows)
     if member.guild_permissions.administrator:
-        embed.set_footer(text="👑 Royal Administrator's Possessions")
+        footer = "👑 Royal Administrator's Possessions"
     elif total_items > 20:
-        embed.set_footer(text="A well-stocked adventurer indeed!")
+        footer = "A well-stocked adventurer indeed!"
     elif total_items > 10:
-        embed.set_footer(text="Thy sack grows heavy with wares!")
+        footer = "Thy sack grows heavy with wares!"
     else:
-        embed.set_footer(text="More room for treasures and trinkets!")
-    
-    await ctx.send(embed=embed)
+        footer = "More room for treasures and trinkets!"
+    pages = sack_pages(member.display_name, rows, footer)
+    return Reply(embed=pages[0], view=SackView(actor.author.id, pages) if len(pages) > 1 else None)
 
-@bot.command(aliases=['employ', 'consume', 'drink', 'eat'])
+@bot.command(aliases=['inventory', 'possessions', 'bag'])
 @commands.guild_only()
-async def use(ctx, *, item_name: str):
-    """Use an item from thy inventory"""
-    item_key = item_name.lower().replace(" ", "_")
-    if not has_item(ctx.author.id, item_key):
+async def sack(ctx, member: discord.Member = None):
+    """Check thy possessions and inventory"""
+    await dispatch(ctx, core_sack, member=member)
+
+@core_command("author")
+async def core_use(actor, item_name: str, qty: int = None):
+    cart, bad = parse_cart(item_name)
+    if cart and qty is not None and len(cart) == 1:
+        cart = [(cart[0][0], qty)]  # The slash command's quantity option
+    if not cart or not all(0 < n <= CART_MAX_QTY for _, n in cart):
+        return Reply(embed=medieval_response(
+            (f"'{bad}' is no fit quantity! " if bad else "") +
+            f"Name wares and quantities of 1 to {CART_MAX_QTY}, as in `{PREFIX}use healing potion 3`!",
+            success=False
+        ))
+    missing, new_hp, remaining = use_cart(actor.author.id, cart, actor.guild.id)
+    if missing:
+        held = remaining.get(missing, 0)
         embed = medieval_response(
-            f"Thou dost not possess '{item_name}' in thy sack!",
+            f"Thou hast but **{held}** {missing.replace('_', ' ')} in thy sack!" if held
+            else f"Thou dost not possess '{missing.replace('_', ' ')}' in thy sack!",
             success=False,
             extra=f"Use {PREFIX}sack to check thy possessions."
         )
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     
-    item_data = ROYAL_MARKET.get(item_key, {})
-    item_display = item_key.replace('_', ' ').title()
+    def effect_of(item_key, n):
+        heal_amount = healing(item_key) * n
+        if heal_amount:
+            return f"Restores **{heal_amount}** HP! Thy vitality is now {new_hp}/{MAX_HP}"
+        return WARES.get(item_key, {}).get("use", "Mystical effect")
     
-    # Different effects based on item type
-    item_type = item_data.get("type", "misc")
-    effect = item_data.get("use", "Mystical effect")
+    if len(cart) > 1:
+        lines = []
+        for item_key, n in cart:
+            consumed = ROYAL_MARKET.get(item_key, {}).get("type") in CONSUMABLE_TYPES
+            lines.append(f"• **{n}× {item_key.replace('_', ' ').title()}**: {effect_of(item_key, n)}" + (" *(consumed)*" if consumed else ""))
+        embed = medieval_embed(title="✨ Using Thy Wares", description="\n".join(lines), color_name="purple")
+        left = [f"{item_key.replace('_', ' ').title()}: **{remaining[item_key]}**" for item_key, _ in cart
+                if ROYAL_MARKET.get(item_key, {}).get("type") in CONSUMABLE_TYPES]
+        if left:
+            embed.add_field(name="Remaining", value="\n".join(left), inline=False)
+        return Reply(embed=embed)
     
-    # Handle specific item types
-    if item_type == "potion" and "healing" in item_key:
-        # Healing potion
-        heal_amount = item_data.get("heal", 30)
-        new_hp = update_hp(ctx.author.id, heal_amount)
-        effect = f"Restores **{heal_amount}** HP! Thy vitality is now {new_hp}/{MAX_HP}"
+    item_key, n = cart[0]
+    item_data = WARES.get(item_key, {})
+    item_display = item_key.replace('_', ' ').title() + (f" ×{n}" if n > 1 else "")
     
-    use_messages = {
-        "food": [
-            f"Thou consumest the {item_display}. {effect}!",
-            f"The {item_display} fills thy belly. {effect}!",
-            f"Thou feastest upon the {item_display}. {effect}!",
-        ],
-        "drink": [
-            f"Thou drinkest the {item_display}. {effect}!",
-            f"The {item_display} quenches thy thirst. {effect}!",
-            f"Thou raisest the {item_display} in toast. {effect}!",
-        ],
-        "potion": [
-            f"Thou drinkest the {item_display}. {effect}!",
-            f"The {item_display} takes effect. {effect}!",
-            f"Thou consumest the mystical {item_display}. {effect}!",
-        ],
-        "weapon": [
-            f"Thou wieldest the {item_display}. {effect}!",
-            f"The {item_display} feels balanced in thy hand. {effect}!",
-            f"Thou brandishest the {item_display}. {effect}!",
-        ],
-        "armor": [
-            f"Thou donnest the {item_display}. {effect}!",
-            f"The {item_display} protects thee. {effect}!",
-            f"Thou equippest the protective {item_display}. {effect}!",
-        ],
-        "magic": [
-            f"Thou channelest the {item_display}'s power. {effect}!",
-            f"The {item_display} glows with energy. {effect}!",
-            f"Thou employest the magical {item_display}. {effect}!",
-        ],
-        "tool": [
-            f"Thou usest the {item_display}. {effect}!",
-            f"The {item_display} serves thee well. {effect}!",
-            f"Thou employest the practical {item_display}. {effect}!",
-        ],
-        "title": [
-            f"Thou assumest the {item_display}. {effect}!",
-            f"The {item_display} elevates thy status. {effect}!",
-        ]
-    }
+    # Different effects based on item type
+    item_type = item_data.get("type", "misc")
+    effect = effect_of(item_key, n)
     
     # Get appropriate message
-    messages = use_messages.get(item_type, [f"Thou usest the {item_display}. {effect}!"])
-    message = random.choice(messages)
+    messages = USE_MESSAGES.get(item_type, DEFAULT_USE_MESSAGES)
+    message = random.choice(messages).format(item=item_display, effect=effect)
     
-    # Remove item after use (for consumables)
-    if item_type in ["food", "drink", "potion"]:
-        remove_item(ctx.author.id, item_key, 1)
-        message += "\n\n*The item is consumed.*"
+    # Consumables were taken from the sack by use_cart
+    if item_type in CONSUMABLE_TYPES:
+        message += "\n\n*The item is consumed.*" if n == 1 else f"\n\n*All {n} are consumed.*"
     
     embed = medieval_embed(
         title=f"✨ Using {item_display}",
@@ -1138,30 +4059,33 @@ async def use(ctx, *, item_name: str):
         color_name="purple"
     )
     
-    if item_type in ["food", "drink", "potion"]:
+    if item_type in CONSUMABLE_TYPES:
         # Check remaining quantity
-        remaining = get_inventory(ctx.author.id).get(item_key, 0)
-        if remaining > 0:
-            embed.add_field(name="Remaining", value=f"**{remaining}** left in thy sack", inline=False)
+        if remaining[item_key] > 0:
+            embed.add_field(name="Remaining", value=f"**{remaining[item_key]}** left in thy sack", inline=False)
         else:
             embed.set_footer(text="Thou hast no more of this item")
     
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command()
+@bot.command(aliases=['employ', 'consume', 'drink', 'eat'])
 @commands.guild_only()
-async def equip(ctx, *, item_name: str):
-    """Equip a weapon or armor"""
+async def use(ctx, *, item_name: str):
+    """Use items from thy inventory: `healing potion`, `healing potion 3` or `bread 2, ale 1`"""
+    await dispatch(ctx, core_use, item_name=item_name)
+
+@core_command("author")
+async def core_equip(actor, item_name: str):
     item_key = item_name.lower().replace(" ", "_")
-    if not has_item(ctx.author.id, item_key):
+    if not has_item(actor.author.id, item_key, guild_id=actor.guild.id):
         embed = medieval_response(
             f"Thou dost not possess '{item_name}'!",
             success=False,
             extra=f"Use {PREFIX}sack to check thy possessions."
         )
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     
-    if equip_item(ctx.author.id, item_key):
+    if equip_item(actor.author.id, item_key, actor.guild.id):
         item_display = item_key.replace('_', ' ').title()
         embed = medieval_embed(
             title="⚔️ Item Equipped",
@@ -1174,16 +4098,20 @@ async def equip(ctx, *, item_name: str):
             success=False
         )
     
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
 @bot.command()
 @commands.guild_only()
-async def unequip(ctx, *, item_name: str):
-    """Unequip a weapon or armor"""
+async def equip(ctx, *, item_name: str):
+    """Equip a weapon or armor"""
+    await dispatch(ctx, core_equip, item_name=item_name)
+
+@core_command("author")
+async def core_unequip(actor, item_name: str):
     item_key = item_name.lower().replace(" ", "_")
     
-    with sqlite3.connect(DB_NAME) as db:
-        db.execute("UPDATE inventory SET equipped=0 WHERE user_id=? AND item=?", (ctx.author.id, item_key))
+    with ledger_connect(actor.guild.id) as db:
+        db.execute(f"UPDATE inventory SET equipped=0 WHERE {KEY_WHERE} AND item=?", (*ledger_key(actor.author.id, actor.guild.id), item_key))
         db.commit()
     
     item_display = item_key.replace('_', ' ').title()
@@ -1192,48 +4120,52 @@ async def unequip(ctx, *, item_name: str):
         description=f"Thou hast unequipped the **{item_display}**!",
         color_name="blue"
     )
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-# ---------- PAY COMMAND ----------
-@bot.command(aliases=['send', 'give', 'transfer'])
+@bot.command()
 @commands.guild_only()
-async def pay(ctx, member: discord.Member, amount: str, *, note: str = ""):
-    """Send coin to another soul"""
-    if member == ctx.author:
+async def unequip(ctx, *, item_name: str):
+    """Unequip a weapon or armor"""
+    await dispatch(ctx, core_unequip, item_name=item_name)
+
+# ---------- PAY COMMAND ----------
+@core_command("author", "member")
+async def core_pay(actor, member: discord.Member, amount: str, note: str = ""):
+    if member == actor.author:
         embed = medieval_response(
             "Thou cannot pay coin to thyself! That would be wizardry!",
             success=False
         )
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     if member.bot:
         embed = medieval_response(
             "Thou cannot pay coin to automatons or spirits!",
             success=False
         )
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     try:
         # Parse amount
         if amount.lower() in ["all", "max"]:
-            g, debt, _, hp = get_pouch(ctx.author.id, ctx)
+            g, debt, _, hp = get_pouch(actor.author.id, actor)
             amount_gold = g
             amount_desc = "all thy gold"
         else:
             amount_gold = int(amount)
             amount_desc = f"**{amount_gold}** gold"
         if amount_gold <= 0:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 "Thou must send a positive amount of coin!",
                 success=False
             ))
-        if amount_gold > get_pouch(ctx.author.id, ctx)[0]:
-            return await ctx.send(embed=medieval_response(
+        if amount_gold > get_pouch(actor.author.id, actor)[0]:
+            return Reply(embed=medieval_response(
                 f"Thou hast not enough gold for this payment!",
                 success=False
             ))
         # Make the payment - remove from sender
-        add_coin(ctx.author.id, -amount_gold, ctx)
+        add_coin(actor.author.id, -amount_gold, actor)
         # Add to receiver
-        add_coin(member.id, amount_gold, ctx)
+        add_coin(member.id, amount_gold, actor)
         # Create response
         payment_messages = [
             f"Thou hast paid {amount_desc} to {member.display_name}!",
@@ -1249,7 +4181,7 @@ async def pay(ctx, member: discord.Member, amount: str, *, note: str = ""):
         if note:
             embed.add_field(name="📝 Note", value=note, inline=False)
         # Show sender's remaining balance
-        g, debt, _, hp = get_pouch(ctx.author.id, ctx)
+        g, debt, _, hp = get_pouch(actor.author.id, actor)
         remaining_desc = f"**{g}** gold"
         embed.add_field(name="Thy Remaining Purse", value=remaining_desc, inline=False)
         # Check if receiver is admin
@@ -1257,53 +4189,54 @@ async def pay(ctx, member: discord.Member, amount: str, *, note: str = ""):
             embed.set_footer(text=f"👑 Paid to Royal Administrator • {member.display_name}")
         else:
             embed.set_footer(text=f"Payment recorded in royal ledgers")
-        await ctx.send(embed=embed)
-        # Send DM to receiver if possible
-        try:
-            dm_embed = medieval_embed(
-                title="💰 Coin Received!",
-                description=f"**{ctx.author.display_name}** hath paid thee {amount_desc} in **{ctx.guild.name}**!",
-                color_name="green"
-            )
-            if note:
-                dm_embed.add_field(name="📝 Note", value=note, inline=False)
-            await member.send(embed=dm_embed)
-        except:
-            pass # Cannot send DM, but that's okay
+        # Send DM to receiver if possible (closed DMs are dropped by the queue)
+        dm_embed = medieval_embed(
+            title="💰 Coin Received!",
+            description=f"**{actor.author.display_name}** hath paid thee {amount_desc} in **{actor.guild.name}**!",
+            color_name="green"
+        )
+        if note:
+            dm_embed.add_field(name="📝 Note", value=note, inline=False)
+        outbound.dm(member, dm_embed)
+        return Reply(embed=embed)
     except ValueError:
         embed = medieval_response(
             "Prithee, enter a valid amount or 'all' for thy payment.",
             success=False
         )
-        await ctx.send(embed=embed)
+        return Reply(embed=embed)
 
-# ---------- GAMBLING COMMANDS ----------
-@bot.command(aliases=['dice', 'wager'])
+@bot.command(aliases=['send', 'give', 'transfer'])
 @commands.guild_only()
-async def gamble(ctx, wager: str = "10"):
-    """Wager coin at the dice game (no cooldown)"""
+async def pay(ctx, member: discord.Member, amount: str, *, note: str = ""):
+    """Send coin to another soul"""
+    await dispatch(ctx, core_pay, member=member, amount=amount, note=note)
+
+# ---------- GAMBLING COMMANDS ----------
+@core_command("author")
+async def core_gamble(actor, wager: str = "10"):
     try:
         # Parse wager
         if wager.lower() in ["all", "max"]:
-            g, debt, _, hp = get_pouch(ctx.author.id, ctx)
+            g, debt, _, hp = get_pouch(actor.author.id, actor)
             wager_amount = g
             wager_desc = "all thy gold"
         else:
             wager_amount = int(wager)
             wager_desc = f"**{wager_amount}** gold"
         if wager_amount <= 0:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 "Thou must wager a positive amount of coin, good sir!",
                 success=False
             ))
-        if wager_amount > get_pouch(ctx.author.id, ctx)[0]:
-            return await ctx.send(embed=medieval_response(
+        if wager_amount > get_pouch(actor.author.id, actor)[0]:
+            return Reply(embed=medieval_response(
                 f"Thou hast not enough gold for this wager!",
                 success=False
             ))
         # Roll the dice with medieval flair
-        player_roll = random.randint(1, 12)
-        house_roll = random.randint(1, 12)
+        player_roll = random.randint(1, DICE_SIDES)
+        house_roll = random.randint(1, DICE_SIDES)
         dice_names = {
             1: "The Snake Eyes", 2: "The Deuce", 3: "The Trey", 4: "The Square",
             5: "The Cinque", 6: "The Six", 7: "The Seven", 8: "The Eight",
@@ -1314,7 +4247,7 @@ async def gamble(ctx, wager: str = "10"):
         if player_roll > house_roll:
             outcome = "VICTORY! 🏆"
             result_desc = f"Thy **{player_name}** bested the house's **{house_name}**!"
-            add_coin(ctx.author.id, wager_amount, ctx)
+            add_coin(actor.author.id, wager_amount, actor)
             color = "green"
             win_lose = f"Thou gainest **{wager_amount}** gold!"
             flair = random.choice([
@@ -1326,7 +4259,7 @@ async def gamble(ctx, wager: str = "10"):
         elif player_roll < house_roll:
             outcome = "DEFEAT! 💀"
             result_desc = f"The house's **{house_name}** bested thy **{player_name}**!"
-            add_coin(ctx.author.id, -wager_amount, ctx)
+            add_coin(actor.author.id, -wager_amount, actor)
             color = "red"
             win_lose = f"Thou losest **{wager_amount}** gold."
             flair = random.choice([
@@ -1354,57 +4287,32 @@ async def gamble(ctx, wager: str = "10"):
             "Prithee, enter a valid number, 'all', or 'max' for thy wager.",
             success=False
         )
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['machines', 'fortunewheel'])
+@bot.command(aliases=['dice', 'wager'])
 @commands.guild_only()
-async def slots(ctx):
-    """Try thy luck at the royal slots (no cooldown)"""
-    cost = 1
-    if get_pouch(ctx.author.id, ctx)[0] < cost:
-        return await ctx.send(embed=medieval_response(
+async def gamble(ctx, wager: str = "10"):
+    """Wager coin at the dice game (no cooldown)"""
+    await dispatch(ctx, core_gamble, wager=wager)
+
+@core_command("author")
+async def core_slots(actor):
+    cost = SLOT_COST
+    if get_pouch(actor.author.id, actor)[0] < cost:
+        return Reply(embed=medieval_response(
             f"Thou needest at least **{cost}** gold to play the slots!",
             success=False
         ))
     
-    add_coin(ctx.author.id, -cost, ctx)
-    symbols = ["🍒", "⭐", "🔔", "👑", "💎", "⚔️", "🛡️", "🐉", "⚜️", "🏰"]
-    slot1 = random.choice(symbols)
-    slot2 = random.choice(symbols)
-    slot3 = random.choice(symbols)
+    add_coin(actor.author.id, -cost, actor)
+    slot1 = random.choice(SLOT_SYMBOLS)
+    slot2 = random.choice(SLOT_SYMBOLS)
+    slot3 = random.choice(SLOT_SYMBOLS)
     result = f"**[ {slot1} | {slot2} | {slot3} ]**"
     # Medieval slot outcomes
-    if slot1 == slot2 == slot3:
-        if slot1 == "💎":
-            win = 40
-            msg = "**JACKPOT! DIAMONDS OF LEGEND!** 💎"
-            flavor = "The gods of fortune shower thee with riches!"
-        elif slot1 == "👑":
-            win = 20
-            msg = "**ROYAL FLUSH!** 👑"
-            flavor = "A king's ransom is thine!"
-        elif slot1 == "🐉":
-            win = 30
-            msg = "**DRAGON'S HOARD!** 🐉"
-            flavor = "Thou hast found a dragon's treasure trove!"
-        elif slot1 == "🏰":
-            win = 16
-            msg = "**CASTLE FORTUNE!** 🏰"
-            flavor = "The castle treasury opens for thee!"
-        else:
-            win = 8
-            msg = "**THREE OF A KIND!**"
-            flavor = "A most fortunate alignment of symbols!"
-    elif slot1 == slot2 or slot2 == slot3 or slot1 == slot3:
-        win = 2
-        msg = "**PAIR WIN!**"
-        flavor = "Not the grand prize, but coin nonetheless!"
-    else:
-        win = 0
-        msg = "**NO WIN**"
-        flavor = "Fortune favors not the bold this day..."
+    win, msg, flavor = slot_outcome(slot1, slot2, slot3)
     if win > 0:
-        add_coin(ctx.author.id, win, ctx)
+        add_coin(actor.author.id, win, actor)
         color = "green"
         result_msg = f"**{msg}**\n{flavor}\n\nThou hast won **{win}** gold!"
     else:
@@ -1419,12 +4327,16 @@ async def slots(ctx):
         embed.set_footer(text="🎉 A truly legendary win!")
     elif win > 0:
         embed.set_footer(text="🎊 Fortune smiles upon thee!")
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['headsails', 'bet'])
+@bot.command(aliases=['machines', 'fortunewheel'])
 @commands.guild_only()
-async def coinflip(ctx, choice: str = "", wager: str = "10"):
-    """Heads or tails bet with fortune (no cooldown)"""
+async def slots(ctx):
+    """Try thy luck at the royal slots (no cooldown)"""
+    await dispatch(ctx, core_slots)
+
+@core_command("author")
+async def core_coinflip(actor, choice: str = "", wager: str = "10"):
     if choice.lower() not in ["heads", "tails", "h", "t"]:
         embed = medieval_embed(
             title="🪙 Royal Coin Flip",
@@ -1432,22 +4344,22 @@ async def coinflip(ctx, choice: str = "", wager: str = "10"):
             color_name="orange"
         )
         embed.set_footer(text="Heads bears the King's likeness, tails the Royal Crest")
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     try:
         if wager.lower() in ["all", "max"]:
-            g, debt, _, hp = get_pouch(ctx.author.id, ctx)
+            g, debt, _, hp = get_pouch(actor.author.id, actor)
             wager_amount = g
             wager_desc = "all thy gold"
         else:
             wager_amount = int(wager)
             wager_desc = f"**{wager_amount}** gold"
         if wager_amount <= 0:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 "A wager must be positive coin, good sirrah!",
                 success=False
             ))
-        if wager_amount > get_pouch(ctx.author.id, ctx)[0]:
-            return await ctx.send(embed=medieval_response(
+        if wager_amount > get_pouch(actor.author.id, actor)[0]:
+            return Reply(embed=medieval_response(
                 f"Thou hast not enough gold for this wager!",
                 success=False
             ))
@@ -1458,13 +4370,13 @@ async def coinflip(ctx, choice: str = "", wager: str = "10"):
         else:
             player_choice = "tails"
             choice_desc = "**Tails** (the Royal Crest)"
-        result = random.choice(["heads", "tails"])
+        result = random.choice(COINFLIP_SIDES)
         result_desc = "**Heads** (the King's likeness)" if result == "heads" else "**Tails** (the Royal Crest)"
         # Medieval coin flip descriptions
         if player_choice == result:
             outcome = "VICTORY! 🏆"
             result_text = f"Thou guessed correctly, noble sir!"
-            add_coin(ctx.author.id, wager_amount, ctx)
+            add_coin(actor.author.id, wager_amount, actor)
             color = "green"
             win_lose = f"Thou gainest **{wager_amount}** gold!"
             flair = random.choice([
@@ -1476,7 +4388,7 @@ async def coinflip(ctx, choice: str = "", wager: str = "10"):
         else:
             outcome = "DEFEAT! 💀"
             result_text = f"Alas, thy guess was wrong!"
-            add_coin(ctx.author.id, -wager_amount, ctx)
+            add_coin(actor.author.id, -wager_amount, actor)
             color = "red"
             win_lose = f"Thou losest **{wager_amount}** gold."
             flair = random.choice([
@@ -1498,15 +4410,19 @@ async def coinflip(ctx, choice: str = "", wager: str = "10"):
             "Prithee, enter a valid number, 'all', or 'max' for thy wager.",
             success=False
         )
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['repay', 'settle'])
+@bot.command(aliases=['headsails', 'bet'])
 @commands.guild_only()
-async def paydebt(ctx, amount: str = "all"):
-    """Repay debt to the Crown (no cooldown)"""
-    g, debt, _, hp = get_pouch(ctx.author.id, ctx)
+async def coinflip(ctx, choice: str = "", wager: str = "10"):
+    """Heads or tails bet with fortune (no cooldown)"""
+    await dispatch(ctx, core_coinflip, choice=choice, wager=wager)
+
+@core_command("author")
+async def core_paydebt(actor, amount: str = "all"):
+    g, debt, _, hp = get_pouch(actor.author.id, actor)
     if debt <= 0:
-        return await ctx.send(embed=medieval_response(
+        return Reply(embed=medieval_response(
             "Thou hast no debt to the Crown! Thy ledger is clean.",
             success=True
         ))
@@ -1516,21 +4432,21 @@ async def paydebt(ctx, amount: str = "all"):
         else:
             pay_amount = int(amount)
         if pay_amount <= 0:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 "Thou must pay a positive amount to settle thy debt!",
                 success=False
             ))
         if pay_amount > g:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 f"Thou hast only **{g}** gold, but wishest to pay **{pay_amount}**!",
                 success=False
             ))
         if pay_amount > debt:
             pay_amount = debt
         # Pay the debt
-        add_coin(ctx.author.id, -pay_amount, ctx)
+        add_coin(actor.author.id, -pay_amount, actor)
         new_debt = debt - pay_amount
-        set_debt(ctx.author.id, new_debt)
+        set_debt(actor.author.id, new_debt, actor.guild.id)
         if new_debt <= 0:
             message = f"Thy debt to the Crown is fully settled! Thou art free of obligation!"
             extra = "The royal scribe stamps thy ledger CLEAR."
@@ -1540,8 +4456,8 @@ async def paydebt(ctx, amount: str = "all"):
         embed = medieval_response(message, success=True, extra=extra)
         # Check if user was in prison and should be released
         if new_debt <= 0:
-            for guild in bot.guilds:
-                member = guild.get_member(ctx.author.id)
+            for guild in [actor.guild] if PER_GUILD_ECONOMY else bot.guilds:
+                member = actor.author if guild is actor.guild else await resolve_member(guild, actor.author.id)
                 if member:
                     prison_role_id = get_prison_role(guild.id)
                     if prison_role_id:
@@ -1550,95 +4466,105 @@ async def paydebt(ctx, amount: str = "all"):
                         role = discord.utils.get(guild.roles, name=PRISON_ROLE_NAME)
                     
                     if role and role in member.roles:
-                        try:
-                            await member.remove_roles(role)
-                            market_chan_id = get_market_channel(guild.id)
-                            if market_chan_id:
-                                chan = guild.get_channel(market_chan_id)
-                                if chan:
-                                    await chan.send(
-                                        f"🏰 **Hear ye!** {member.display_name} hath settled all debts "
-                                        f"and is released from debtor's prison!"
-                                    )
-                        except discord.Forbidden:
-                            pass
+                        outbound.remove_role(member, role, on_success=functools.partial(announce_release, guild, member))
     except ValueError:
         embed = medieval_response(
             "Prithee, enter a valid number or 'all' to pay thy debt.",
             success=False
         )
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-# ---------- ADMIN COMMANDS ----------
-@bot.command(aliases=['setmarkethall'])
-@commands.has_permissions(administrator=True)
+@bot.command(aliases=['repay', 'settle'])
 @commands.guild_only()
-async def setmarket(ctx, channel: discord.TextChannel):
-    """Set the market announcement hall"""
-    set_market_channel(ctx.guild.id, channel.id)
+async def paydebt(ctx, amount: str = "all"):
+    """Repay debt to the Crown (no cooldown)"""
+    await dispatch(ctx, core_paydebt, amount=amount)
+
+# ---------- ADMIN COMMANDS ----------
+@core_command()
+async def core_setmarket(actor, channel: discord.TextChannel):
+    set_market_channel(actor.guild.id, channel.id)
     embed = medieval_response(
         f"The royal market announcements shall now echo in {channel.mention}!",
         success=True
     )
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['settitle'])
+@bot.command(aliases=['setmarkethall'])
 @commands.has_permissions(administrator=True)
 @commands.guild_only()
-async def ntset(ctx, title: str, role: discord.Role):
-    """Set noble title role (Admin)"""
+async def setmarket(ctx, channel: discord.TextChannel):
+    """Set the market announcement hall"""
+    await dispatch(ctx, core_setmarket, channel=channel)
+
+@core_command()
+async def core_ntset(actor, title: str, role: discord.Role):
     title_lower = title.lower()
     if title_lower not in ["baron", "viscount"]:
         embed = medieval_response("Invalid title! Use 'baron' or 'viscount'.", success=False)
-        return await ctx.send(embed=embed)
-    set_title_role(ctx.guild.id, title_lower, role.id)
+        return Reply(embed=embed)
+    set_title_role(actor.guild.id, title_lower, role.id)
     embed = medieval_response(f"The {title} title role set to {role.mention}!", success=True)
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['settaxroles'])
+@bot.command(aliases=['settitle'])
 @commands.has_permissions(administrator=True)
 @commands.guild_only()
-async def taxrset(ctx, *roles: discord.Role):
-    """Set tax recipient roles (Admin)"""
+async def ntset(ctx, title: str, role: discord.Role):
+    """Set noble title role (Admin)"""
+    await dispatch(ctx, core_ntset, title=title, role=role)
+
+@core_command()
+async def core_taxrset(actor, roles):
     if not roles:
         embed = medieval_response("Thou must specify at least one role!", success=False)
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     role_ids = [r.id for r in roles]
-    set_tax_roles(ctx.guild.id, role_ids)
+    set_tax_roles(actor.guild.id, role_ids)
+    if MEMBER_DIRECTORY == "database":
+        spawn(backfill_directory(actor.guild))  # The role bits follow the new list
     role_mentions = " ".join(r.mention for r in roles)
     embed = medieval_response(f"Tax recipients set to: {role_mentions}!", success=True)
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['setprison'])
+@bot.command(aliases=['settaxroles'])
 @commands.has_permissions(administrator=True)
 @commands.guild_only()
-async def prisonrole(ctx, role: discord.Role):
-    """Set prison role for debtors (Admin)"""
-    set_prison_role(ctx.guild.id, role.id)
+async def taxrset(ctx, *roles: discord.Role):
+    """Set tax recipient roles (Admin)"""
+    await dispatch(ctx, core_taxrset, roles=roles)
+
+@core_command()
+async def core_prisonrole(actor, role: discord.Role):
+    set_prison_role(actor.guild.id, role.id)
     embed = medieval_response(f"Prison role set to {role.mention}!", success=True)
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
 
-@bot.command(aliases=['collect', 'seize', 'confiscate'])
+@bot.command(aliases=['setprison'])
 @commands.has_permissions(administrator=True)
 @commands.guild_only()
-async def take(ctx, member: discord.Member, amount: str, *, reason: str = ""):
-    """Take coin from another soul (Admin only)"""
+async def prisonrole(ctx, role: discord.Role):
+    """Set prison role for debtors (Admin)"""
+    await dispatch(ctx, core_prisonrole, role=role)
+
+@core_command("author", "member")
+async def core_take(actor, member: discord.Member, amount: str, reason: str = ""):
     try:
         # Parse amount
         if amount.lower() in ["all", "max"]:
-            g, debt, _, hp = get_pouch(member.id, ctx)
+            g, debt, _, hp = get_pouch(member.id, actor)
             amount_gold = g
             amount_desc = "all their gold"
         else:
             amount_gold = int(amount)
             amount_desc = f"**{amount_gold}** gold"
         if amount_gold <= 0:
-            return await ctx.send(embed=medieval_response(
+            return Reply(embed=medieval_response(
                 "Thou must take a positive amount of coin!",
                 success=False
             ))
         # Take the coin - remove from target
-        add_coin(member.id, -amount_gold, ctx)
+        add_coin(member.id, -amount_gold, actor)
         # Optional: Add to treasury or keep it
         # For now, just remove it from circulation
         # Create response
@@ -1656,222 +4582,190 @@ async def take(ctx, member: discord.Member, amount: str, *, reason: str = ""):
         if reason:
             embed.add_field(name="📜 Reason", value=reason, inline=False)
         # Show target's remaining balance
-        g, debt, _, hp = get_pouch(member.id, ctx)
+        g, debt, _, hp = get_pouch(member.id, actor)
         remaining_desc = f"**{g}** gold" if g > 0 else "**Empty**"
         embed.add_field(name="Their Remaining Purse", value=remaining_desc, inline=False)
-        embed.set_footer(text=f"👑 Royal Authority exercised by {ctx.author.display_name}")
-        await ctx.send(embed=embed)
+        embed.set_footer(text=f"👑 Royal Authority exercised by {actor.author.display_name}")
+        return Reply(embed=embed)
     except ValueError as e:
         embed = medieval_response(
             "Prithee, enter a valid amount or 'all' for the collection.",
             success=False
         )
-        await ctx.send(embed=embed)
+        return Reply(embed=embed)
+
+@bot.command(aliases=['collect', 'seize', 'confiscate'])
+@commands.has_permissions(administrator=True)
+@commands.guild_only()
+async def take(ctx, member: discord.Member, amount: str, *, reason: str = ""):
+    """Take coin from another soul (Admin only)"""
+    await dispatch(ctx, core_take, member=member, amount=amount, reason=reason)
+
+@core_command()
+async def core_metrics(actor):
+    embed = medieval_embed(title="⏳ Royal Command Ledger", color_name="teal")
+    for name, metrics in sorted(command_metrics.items()):
+        stats = slash_stats.get(name, {})
+        deferred = stats.get("predicted", 0) + stats.get("watchdog", 0)
+        average = metrics["seconds"] / metrics["calls"] * 1000 if metrics["calls"] else 0
+        embed.add_field(
+            name=f"{PREFIX}{name}",
+            value=(f"Calls: **{metrics['calls']}** • Errors: **{metrics['errors']}** • Avg: **{average:.0f}** ms\n"
+                   f"Slash: **{stats.get('invoked', 0)}** • Deferred: **{deferred}** "
+                   f"({stats.get('predicted', 0)} predicted, {stats.get('watchdog', 0)} late)"),
+            inline=False
+        )
+    if not command_metrics:
+        embed.description = "No commands have been heard since the bot awoke."
+    return Reply(embed=embed)
+
+@bot.command(aliases=['deferrals', 'slashstats'])
+@commands.has_permissions(administrator=True)
+@commands.guild_only()
+async def metrics(ctx):
+    """Show command latency, errors and slash deferrals (Admin)"""
+    await dispatch(ctx, core_metrics)
 
 # ---------- SLASH COMMANDS ----------
+# Slash commands dispatch the same command cores through an interaction-backed
+# context. Discord drops an interaction that is not answered within three
+# seconds, so the context defers up front when a command is predicted to be
+# slow, defers from a watchdog if it turns out slow anyway, and routes every
+# reply after the first through followups.
+DEFER_AFTER = float(os.getenv("DEFER_AFTER", "2.0"))  # Watchdog deadline, inside Discord's 3s window
+DEFER_PREDICT = float(os.getenv("DEFER_PREDICT", "1.0"))  # Defer up front when typical latency exceeds this
+LATENCY_SMOOTHING = 0.2
+slash_latency = {}  # command -> smoothed seconds
+slash_stats = collections.defaultdict(collections.Counter)  # command -> invoked / predicted / watchdog
+
+class InteractionContext:
+    def __init__(self, interaction, command_name):
+        self.interaction = interaction
+        self.author = interaction.user
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.command_name = command_name
+        self._respond_lock = asyncio.Lock()
+        self._watchdog = None
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        slash_stats[self.command_name]["invoked"] += 1
+        if slash_latency.get(self.command_name, 0) > DEFER_PREDICT:
+            await self.defer("predicted")
+        else:
+            self._watchdog = asyncio.create_task(self._defer_when_late())
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._watchdog:
+            self._watchdog.cancel()
+        elapsed = time.perf_counter() - self._started
+        previous = slash_latency.get(self.command_name, elapsed)
+        slash_latency[self.command_name] = previous + LATENCY_SMOOTHING * (elapsed - previous)
+
+    async def _defer_when_late(self):
+        await asyncio.sleep(DEFER_AFTER)
+        await self.defer("watchdog")
+
+    async def defer(self, reason):
+        async with self._respond_lock:
+            if not self.interaction.response.is_done():
+                await self.interaction.response.defer(thinking=True)
+                slash_stats[self.command_name][reason] += 1
+
+    async def send(self, content=None, **kwargs):
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        async with self._respond_lock:
+            if not self.interaction.response.is_done():
+                if self._watchdog:
+                    self._watchdog.cancel()
+                await self.interaction.response.send_message(content, **kwargs)
+                # Views that redraw themselves later need the message handle
+                return await self.interaction.original_response() if "view" in kwargs else None
+        return await self.interaction.followup.send(content, wait="view" in kwargs, **kwargs)
+
+async def run_slash(interaction, core, **kwargs):
+    async with InteractionContext(interaction, core.command_name) as ctx:
+        await dispatch(ctx, core, **kwargs)
+
 @tree.command(name="help", description="View the royal charter of commands")
 @app_commands.guild_only
 async def slash_help(interaction: discord.Interaction):
-    embed = medieval_embed(
-        title="📜 The Royal Charter of Commands",
-        description=f"{medieval_greeting()}\n\nHere be the edicts and privileges granted by His Majesty:",
-        color_name="purple"
-    )
-    cmds = {
-        "labour": "Toil in the king's works for honest coin (once per hour)",
-        "daily": f"Receive thy daily bounty from the royal coffers ({MAX_DAILY_GOLD} gold, once per day)",
-        "market": "Peruse the wares of the grand marketplace",
-        "titleshop": "Behold the exalted shop of noble titles",
-        "buy": "Acquire goods or honours from the merchants",
-        "pouch": "Examine the weight of thy purse",
-        "sack": "Survey the contents of thy travelling sack",
-        "use": "Employ an item from thine inventory",
-        "pay": "Bestow coin upon another subject of the realm",
-        "gamble": "Wager coin at the dice game",
-        "slots": "Try thy luck at the royal slots",
-        "coinflip": "Heads or tails bet with fortune",
-        "paydebt": "Settle thy obligations to the Crown",
-        "equip": "Arm thyself with weapon or armor",
-        "unequip": "Remove equipment",
-    }
-    for name, desc in cmds.items():
-        embed.add_field(name=f"**/{name}**", value=f"_{desc}_", inline=False)
-    embed.add_field(
-        name="⚖️ Laws of the Realm",
-        value=(
-            f"• Daily toil: once per hour\n"
-            f"• Royal stipend: once per day\n"
-            f"• A tax of {DAILY_TAX} gold is levied daily upon all subjects\n"
-            f"• Debts accrue 2% interest each day\n"
-            f"• Unpaid debt for {DAYS_BEFORE_PRISON} days leads to the debtor's prison"
-        ),
-        inline=False
-    )
-    await interaction.response.send_message(embed=embed)
+    await run_slash(interaction, core_help, marker="/")
 
 @tree.command(name="labour", description="Toil in the king's works for honest coin (once per hour)")
 @app_commands.guild_only
 async def slash_labour(interaction: discord.Interaction):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await labour(ctx)
+    await run_slash(interaction, core_labour)
 
 @tree.command(name="daily", description="Receive thy daily bounty from the royal coffers")
 @app_commands.guild_only
 async def slash_daily(interaction: discord.Interaction):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await daily(ctx)
+    await run_slash(interaction, core_daily)
 
 @tree.command(name="market", description="Peruse the wares of the grand marketplace")
 @app_commands.guild_only
 async def slash_market(interaction: discord.Interaction):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await market(ctx)
+    await run_slash(interaction, core_market)
 
 @tree.command(name="titleshop", description="Behold the exalted shop of noble titles")
 @app_commands.guild_only
 async def slash_titleshop(interaction: discord.Interaction):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await titleshop(ctx)
+    await run_slash(interaction, core_titleshop)
 
 @tree.command(name="buy", description="Acquire goods or honours from the merchants")
-@app_commands.describe(item="The item to purchase")
+@app_commands.describe(item="The item to purchase, or a cart such as 'bread 10, ale 5'", quantity="How many to buy (default 1)")
 @app_commands.guild_only
-async def slash_buy(interaction: discord.Interaction, item: str):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await buy(ctx, item_name=item)
+async def slash_buy(interaction: discord.Interaction, item: str, quantity: int = None):
+    await run_slash(interaction, core_buy, item_name=item, qty=quantity)
 
 @tree.command(name="pouch", description="Examine the weight of thy purse")
 @app_commands.describe(member="The member to check (optional)")
 @app_commands.guild_only
 async def slash_pouch(interaction: discord.Interaction, member: discord.Member = None):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await pouch(ctx, member=member)
+    await run_slash(interaction, core_pouch, member=member)
 
 @tree.command(name="sack", description="Survey the contents of thy travelling sack")
 @app_commands.describe(member="The member to check (optional)")
 @app_commands.guild_only
 async def slash_sack(interaction: discord.Interaction, member: discord.Member = None):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await sack(ctx, member=member)
+    await run_slash(interaction, core_sack, member=member)
 
 @tree.command(name="use", description="Employ an item from thine inventory")
-@app_commands.describe(item="The item to use")
+@app_commands.describe(item="The item to use, or several such as 'bread 2, ale 1'", quantity="How many to use (default 1)")
 @app_commands.guild_only
-async def slash_use(interaction: discord.Interaction, item: str):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await use(ctx, item_name=item)
+async def slash_use(interaction: discord.Interaction, item: str, quantity: int = None):
+    await run_slash(interaction, core_use, item_name=item, qty=quantity)
 
 @tree.command(name="equip", description="Arm thyself with weapon or armor")
 @app_commands.describe(item="The item to equip")
 @app_commands.guild_only
 async def slash_equip(interaction: discord.Interaction, item: str):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await equip(ctx, item_name=item)
+    await run_slash(interaction, core_equip, item_name=item)
 
 @tree.command(name="unequip", description="Remove equipment")
 @app_commands.describe(item="The item to unequip")
 @app_commands.guild_only
 async def slash_unequip(interaction: discord.Interaction, item: str):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await unequip(ctx, item_name=item)
+    await run_slash(interaction, core_unequip, item_name=item)
 
 @tree.command(name="pay", description="Bestow coin upon another subject of the realm")
 @app_commands.describe(member="The member to pay", amount="Amount to pay (number or 'all')", note="Optional note")
 @app_commands.guild_only
 async def slash_pay(interaction: discord.Interaction, member: discord.Member, amount: str, note: str = ""):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await pay(ctx, member=member, amount=amount, note=note)
+    await run_slash(interaction, core_pay, member=member, amount=amount, note=note)
 
 @tree.command(name="gamble", description="Wager coin at the dice game")
 @app_commands.describe(wager="Amount to wager (number or 'all')")
 @app_commands.guild_only
 async def slash_gamble(interaction: discord.Interaction, wager: str = "10"):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await gamble(ctx, wager=wager)
+    await run_slash(interaction, core_gamble, wager=wager)
 
 @tree.command(name="slots", description="Try thy luck at the royal slots")
 @app_commands.guild_only
 async def slash_slots(interaction: discord.Interaction):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await slots(ctx)
+    await run_slash(interaction, core_slots)
 
 @tree.command(name="coinflip", description="Heads or tails bet with fortune")
 @app_commands.describe(choice="Heads or tails", wager="Amount to wager (number or 'all')")
@@ -1881,27 +4775,13 @@ async def slash_slots(interaction: discord.Interaction):
 ])
 @app_commands.guild_only
 async def slash_coinflip(interaction: discord.Interaction, choice: app_commands.Choice[str], wager: str = "10"):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await coinflip(ctx, choice=choice.value, wager=wager)
+    await run_slash(interaction, core_coinflip, choice=choice.value, wager=wager)
 
 @tree.command(name="paydebt", description="Settle thy obligations to the Crown")
 @app_commands.describe(amount="Amount to pay (number or 'all')")
 @app_commands.guild_only
 async def slash_paydebt(interaction: discord.Interaction, amount: str = "all"):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await paydebt(ctx, amount=amount)
+    await run_slash(interaction, core_paydebt, amount=amount)
 
 # ---------- ADMIN SLASH COMMANDS ----------
 @tree.command(name="setmarket", description="Set the market announcement hall (Admin)")
@@ -1909,28 +4789,14 @@ async def slash_paydebt(interaction: discord.Interaction, amount: str = "all"):
 @app_commands.checks.has_permissions(administrator=True)
 @app_commands.guild_only
 async def slash_setmarket(interaction: discord.Interaction, channel: discord.TextChannel):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await setmarket(ctx, channel=channel)
+    await run_slash(interaction, core_setmarket, channel=channel)
 
 @tree.command(name="ntset", description="Set noble title role (Admin)")
 @app_commands.describe(title="The title (baron or viscount)", role="The role to assign")
 @app_commands.checks.has_permissions(administrator=True)
 @app_commands.guild_only
 async def slash_ntset(interaction: discord.Interaction, title: str, role: discord.Role):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await ntset(ctx, title=title, role=role)
+    await run_slash(interaction, core_ntset, title=title, role=role)
 
 @tree.command(name="taxrset", description="Set tax recipient roles (Admin)")
 @app_commands.describe(roles="The roles to receive taxes")
@@ -1950,165 +4816,477 @@ async def slash_taxrset(interaction: discord.Interaction, roles: str):
         await interaction.response.send_message("No valid roles found!", ephemeral=True)
         return
     
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await taxrset(ctx, *role_objects)
+    await run_slash(interaction, core_taxrset, roles=role_objects)
 
 @tree.command(name="prisonrole", description="Set prison role for debtors (Admin)")
 @app_commands.describe(role="The prison role")
 @app_commands.checks.has_permissions(administrator=True)
 @app_commands.guild_only
 async def slash_prisonrole(interaction: discord.Interaction, role: discord.Role):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await prisonrole(ctx, role=role)
+    await run_slash(interaction, core_prisonrole, role=role)
 
 @tree.command(name="take", description="Take coin from another soul (Admin only)")
 @app_commands.describe(member="The member to take from", amount="Amount to take (number or 'all')", reason="Reason for taking (optional)")
 @app_commands.checks.has_permissions(administrator=True)
 @app_commands.guild_only
 async def slash_take(interaction: discord.Interaction, member: discord.Member, amount: str, reason: str = ""):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await take(ctx, member=member, amount=amount, reason=reason)
+    await run_slash(interaction, core_take, member=member, amount=amount, reason=reason)
 
 # ---------- BATTLE COMMAND (Basic Implementation) ----------
-@bot.command()
-@commands.guild_only()
-async def battle(ctx, opponent: discord.Member):
-    """Challenge another to a duel of honour"""
-    if opponent == ctx.author:
+@core_command("author", "opponent")
+async def core_battle(actor, opponent: discord.Member):
+    if opponent == actor.author:
         embed = medieval_response("Thou cannot battle thyself!", success=False)
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     if opponent.bot:
         embed = medieval_response("Thou cannot battle automatons!", success=False)
-        return await ctx.send(embed=embed)
+        return Reply(embed=embed)
     
-    # Check cooldown
-    cd = get_cooldown(ctx.author.id, "battle")
-    if cd and utcnow() - cd < timedelta(hours=1):
-        remain = timedelta(hours=1) - (utcnow() - cd)
+    first, second, outcome, reward = fight_duel(actor.author.id, opponent.id, actor.guild.id)
+    if second is None:
+        remain = BATTLE_COOLDOWN - (utcnow() - first.last_battle)
         m = remain.seconds // 60
         s = remain.seconds % 60
         embed = medieval_response(f"Thou must rest between battles! Return in **{m}** minutes and **{s}** seconds.", success=False)
-        return await ctx.send(embed=embed)
-    
-    # Get HP and equipment
-    p1_gold, p1_debt, _, p1_hp = get_pouch(ctx.author.id, ctx)
-    p2_gold, p2_debt, _, p2_hp = get_pouch(opponent.id, ctx)
-    
-    # Calculate bonuses from equipment
-    p1_atk_bonus = 0
-    p1_def_bonus = 0
-    p2_atk_bonus = 0
-    p2_def_bonus = 0
-    
-    for item in get_equipped(ctx.author.id):
-        item_data = ROYAL_MARKET.get(item, {})
-        p1_atk_bonus += item_data.get("atk_bonus", 0)
-        p1_def_bonus += item_data.get("def_bonus", 0)
-    
-    for item in get_equipped(opponent.id):
-        item_data = ROYAL_MARKET.get(item, {})
-        p2_atk_bonus += item_data.get("atk_bonus", 0)
-        p2_def_bonus += item_data.get("def_bonus", 0)
-    
-    # Battle calculation
-    p1_roll = random.randint(1, 20) + p1_atk_bonus
-    p2_roll = random.randint(1, 20) + p2_atk_bonus
-    
-    # Apply defense
-    p1_damage = max(1, p2_roll - p1_def_bonus)
-    p2_damage = max(1, p1_roll - p2_def_bonus)
-    
-    # Update HP
-    new_p1_hp = update_hp(ctx.author.id, -p1_damage)
-    new_p2_hp = update_hp(opponent.id, -p2_damage)
+        return Reply(embed=embed)
     
     # Determine winner
-    if new_p1_hp <= 0 and new_p2_hp <= 0:
+    if outcome == DUEL_DRAW:
         winner = None
         result = "A DRAW! Both warriors fall! ⚔️"
-        reward = 0
-    elif new_p1_hp <= 0:
+    elif outcome == DUEL_SECOND:
         winner = opponent
         result = f"**{opponent.display_name}** VICTORIOUS! 🏆"
-        reward = min(50, p1_gold // 10)
-        if reward > 0:
-            add_coin(opponent.id, reward)
-            add_coin(ctx.author.id, -reward)
-    elif new_p2_hp <= 0:
-        winner = ctx.author
-        result = f"**{ctx.author.display_name}** VICTORIOUS! 🏆"
-        reward = min(50, p2_gold // 10)
-        if reward > 0:
-            add_coin(ctx.author.id, reward)
-            add_coin(opponent.id, -reward)
+    elif outcome == DUEL_FIRST:
+        winner = actor.author
+        result = f"**{actor.author.display_name}** VICTORIOUS! 🏆"
     else:
-        winner = ctx.author if p1_roll > p2_roll else opponent if p2_roll > p1_roll else None
+        winner = None
         result = "The battle continues! ⚔️"
-        reward = 0
     
     # Create embed
     embed = medieval_embed(
         title="⚔️ Royal Duel",
-        description=f"**{ctx.author.display_name}** challenges **{opponent.display_name}** to honorable combat!\n\n{result}",
+        description=f"**{actor.author.display_name}** challenges **{opponent.display_name}** to honorable combat!\n\n{result}",
         color_name="red"
     )
     
     embed.add_field(
-        name=f"{ctx.author.display_name}",
-        value=f"Roll: **{p1_roll}** (Atk+{p1_atk_bonus}, Def+{p1_def_bonus})\nDamage taken: **{p1_damage}**\nHP: {new_p1_hp}/{MAX_HP}",
+        name=f"{actor.author.display_name}",
+        value=f"Roll: **{first.roll}** (Atk+{first.atk}, Def+{first.defense})\nDamage taken: **{first.damage}**\nHP: {first.hp}/{MAX_HP}",
         inline=True
     )
     
     embed.add_field(
         name=f"{opponent.display_name}",
-        value=f"Roll: **{p2_roll}** (Atk+{p2_atk_bonus}, Def+{p2_def_bonus})\nDamage taken: **{p2_damage}**\nHP: {new_p2_hp}/{MAX_HP}",
+        value=f"Roll: **{second.roll}** (Atk+{second.atk}, Def+{second.defense})\nDamage taken: **{second.damage}**\nHP: {second.hp}/{MAX_HP}",
         inline=True
     )
     
     if reward > 0 and winner:
         embed.add_field(name="🏆 Spoils of War", value=f"**{winner.display_name}** claims **{reward}** gold!", inline=False)
     
-    if new_p1_hp <= 0 or new_p2_hp <= 0:
+    if outcome != DUEL_ONGOING:
         embed.add_field(name="💀 Defeated", value="The fallen warrior must use healing potions or wait for natural recovery.", inline=False)
     
     embed.set_footer(text="Battle again in 1 hour")
-    set_cooldown(ctx.author.id, "battle")
-    set_cooldown(opponent.id, "battle")
-    
-    await ctx.send(embed=embed)
+    return Reply(embed=embed)
+
+@bot.command()
+@commands.guild_only()
+async def battle(ctx, opponent: discord.Member):
+    """Challenge another to a duel of honour"""
+    await dispatch(ctx, core_battle, opponent=opponent)
 
 @tree.command(name="battle", description="Challenge another to a duel of honour")
 @app_commands.describe(opponent="The opponent to battle")
 @app_commands.guild_only
 async def slash_battle(interaction: discord.Interaction, opponent: discord.Member):
-    class MockCtx:
-        def __init__(self, interaction):
-            self.author = interaction.user
-            self.guild = interaction.guild
-            self.send = interaction.response.send_message
-    
-    ctx = MockCtx(interaction)
-    await battle(ctx, opponent=opponent)
+    await run_slash(interaction, core_battle, opponent=opponent)
+
+# ---------- TOURNAMENT COMMAND ----------
+TOURNAMENT_REFUSALS = {
+    "closed": "No tournament hath been proclaimed in this realm!",
+    "started": "The lists are closed; the tournament is already underway!",
+    "entered": "Thy name is already upon the roll of combatants!",
+    "full": "The lists are full; no more knights may enter!",
+    "poor": "Thou canst not afford the entry fee!",
+}
+
+@core_command("author")
+async def core_tournament(actor, action: str = "status", fee: int = 0):
+    action = action.lower()
+    guild_id = actor.guild.id
+    if action in ("open", "start", "cancel") and not actor.author.guild_permissions.administrator:
+        return Reply(embed=medieval_response("Only the Crown's stewards may proclaim or call a tournament!", success=False))
+    if action == "open":
+        if fee < 0:
+            return Reply(embed=medieval_response("The entry fee cannot be negative!", success=False))
+        if not open_tournament(guild_id, actor.channel.id if actor.channel else None, fee):
+            return Reply(embed=medieval_response("A tournament is already proclaimed in this realm!", success=False))
+        embed = medieval_embed(
+            title="🏟️ A Tournament is Proclaimed!",
+            description=f"Knights of **{actor.guild.name}**, enter the lists with `{PREFIX}tournament join`!",
+            color_name="red"
+        )
+        embed.add_field(name="💰 Entry Fee", value=f"**{fee}** gold, all of it to the champion" if fee else "None; glory alone awaits", inline=False)
+        return Reply(embed=embed)
+    if action == "join":
+        status = join_tournament(actor.author.id, guild_id)
+        if status != "joined":
+            return Reply(embed=medieval_response(TOURNAMENT_REFUSALS[status], success=False))
+        return Reply(embed=medieval_response("Thy name is entered upon the roll of combatants! ⚔️", success=True))
+    if action == "cancel":
+        entrants = cancel_tournament(guild_id)
+        if entrants is None:
+            return Reply(embed=medieval_response("There is no tournament to call off!", success=False))
+        return Reply(embed=medieval_response(f"The tournament is called off; **{len(entrants)}** knights have their fees returned.", success=True))
+    if action == "start":
+        if np is None:
+            return Reply(embed=medieval_response("The tourney grounds are not built (numpy is not installed)!", success=False))
+        if guild_id in _brackets:
+            return Reply(embed=medieval_response("The tournament is already underway!", success=False))
+        tournament, entrants = begin_tournament(guild_id)
+        if entrants is None:
+            return Reply(embed=medieval_response("There must be a proclaimed tournament with at least two knights to begin!", success=False))
+        _brackets[guild_id] = spawn(hold_tournament(actor.guild, tournament, entrants))
+        resumed = f"resumes at round {tournament['round']}" if tournament["round"] > 1 else "begins"
+        return Reply(embed=medieval_response(
+            f"The tournament {resumed} with **{len(entrants)}** knights! Each round's results will be cried in the lists.",
+            success=True))
+    with ledger_read(guild_id) as db:
+        tournament = get_tournament(db, guild_id)
+        entrants = tournament_entrants(db, guild_id) if tournament else []
+    if tournament is None:
+        return Reply(embed=medieval_response(TOURNAMENT_REFUSALS["closed"], success=False))
+    embed = medieval_embed(
+        title="🏟️ The Royal Tournament",
+        description=f"Round {tournament['round']} is underway!" if tournament["round"] else "The lists are open!",
+        color_name="red"
+    )
+    embed.add_field(name="⚔️ Knights", value=f"**{len(entrants)}**", inline=True)
+    embed.add_field(name="💰 Purse", value=f"**{tournament['pot']}** gold", inline=True)
+    embed.add_field(name="🎟️ Entry Fee", value=f"**{tournament['entry_fee']}** gold", inline=True)
+    return Reply(embed=embed)
+
+@bot.command()
+@commands.guild_only()
+async def tournament(ctx, action: str = "status", fee: int = 0):
+    """Proclaim, enter or begin a tournament"""
+    await dispatch(ctx, core_tournament, action=action, fee=fee)
+
+@tree.command(name="tournament", description="Proclaim, enter or begin a tournament")
+@app_commands.describe(action="open, join, start, cancel or status", fee="Entry fee in gold when opening")
+@app_commands.guild_only
+async def slash_tournament(interaction: discord.Interaction, action: str = "status", fee: int = 0):
+    await run_slash(interaction, core_tournament, action=action, fee=fee)
+
+# ---------- TRADING COMMANDS ----------
+async def trade(actor, side, item, price, qty):
+    item = item.lower()
+    if not tradeable(item):
+        return Reply(embed=medieval_response(f"**{item}** cannot be traded between subjects!", success=False))
+    if not 0 < price <= CAP_GOLD or not 0 < qty <= TRADE_MAX_QTY:
+        return Reply(embed=medieval_response(f"Price must be 1 to {CAP_GOLD} gold and quantity 1 to {TRADE_MAX_QTY}!", success=False))
+    status, fills, resting = place_order(actor.author.id, side, item, price, qty, actor.guild.id)
+    if status == "poor":
+        return Reply(embed=medieval_response(f"Thou needest **{price * qty}** gold in hand to back this bid!", success=False))
+    if status == "lacking":
+        return Reply(embed=medieval_response(f"Thou hast not **{qty}× {item}** to offer!", success=False))
+    verb = "buy" if side == "bid" else "sell"
+    embed = medieval_embed(
+        title="📈 Order Placed" if side == "bid" else "📉 Order Placed",
+        description=f"Thou offerest to {verb} **{qty}× {item}** at **{price}** gold apiece.",
+        color_name="green" if fills else "blue"
+    )
+    if fills:
+        filled = sum(fill for _, _, fill, _ in fills)
+        value = sum(fill * fill_price for _, _, fill, fill_price in fills)
+        embed.add_field(name="🤝 Filled", value=f"**{filled}×** for **{value}** gold in {len(fills)} trade(s)", inline=False)
+    if resting:
+        embed.add_field(name="📜 Resting on the Book", value=f"**{resting}×** await a counterparty", inline=False)
+    return Reply(embed=embed)
+
+@core_command("author")
+async def core_bid(actor, item: str, price: int, qty: int = 1):
+    return await trade(actor, "bid", item, price, qty)
+
+@core_command("author")
+async def core_ask(actor, item: str, price: int, qty: int = 1):
+    return await trade(actor, "ask", item, price, qty)
+
+@core_command()
+async def core_orders(actor, item: str = None):
+    if item:
+        item = item.lower()
+        if not tradeable(item):
+            return Reply(embed=medieval_response(f"**{item}** cannot be traded between subjects!", success=False))
+        depth = order_depth(item, actor.guild.id)
+        embed = medieval_embed(title=f"📊 The Book for {item.replace('_', ' ').title()}", color_name="blue")
+        for side, name in (("ask", "📉 Sellers"), ("bid", "📈 Buyers")):
+            lines = [f"**{qty}×** at **{price}** gold ({count} order{'s' if count > 1 else ''})" for price, qty, count in depth[side]]
+            embed.add_field(name=name, value="\n".join(lines) or "_None_", inline=True)
+        return Reply(embed=embed)
+    orders = user_orders(actor.author.id, actor.guild.id)
+    lines = [f"`#{order_id}` {'Buy' if side == 'bid' else 'Sell'} **{qty}× {name}** at **{price}**"
+             for order_id, side, name, price, qty in orders]
+    embed = medieval_embed(
+        title="📜 Thine Open Orders",
+        description="\n".join(lines[:25]) or f"Thou hast no orders. Use `{PREFIX}bid` or `{PREFIX}ask` to trade.",
+        color_name="blue"
+    )
+    if len(lines) > 25:
+        embed.set_footer(text=f"…and {len(lines) - 25} more")
+    return Reply(embed=embed)
+
+@core_command("author")
+async def core_cancelorder(actor, order_id: int):
+    row = cancel_order(actor.author.id, order_id, actor.guild.id)
+    if row is None:
+        return Reply(embed=medieval_response(f"Thou hast no open order `#{order_id}`!", success=False))
+    item, side, price, qty = row
+    refund = f"**{price * qty}** gold" if side == "bid" else f"**{qty}× {item}**"
+    return Reply(embed=medieval_response(f"Order `#{order_id}` withdrawn; {refund} returned to thee.", success=True))
+
+@bot.command()
+@commands.guild_only()
+async def bid(ctx, item: str, price: int, qty: int = 1):
+    """Offer to buy goods at thy price"""
+    await dispatch(ctx, core_bid, item=item, price=price, qty=qty)
+
+@bot.command()
+@commands.guild_only()
+async def ask(ctx, item: str, price: int, qty: int = 1):
+    """Offer to sell goods at thy price"""
+    await dispatch(ctx, core_ask, item=item, price=price, qty=qty)
+
+@bot.command()
+@commands.guild_only()
+async def orders(ctx, item: str = None):
+    """Survey an item's trading book, or thine own orders"""
+    await dispatch(ctx, core_orders, item=item)
+
+@bot.command()
+@commands.guild_only()
+async def cancelorder(ctx, order_id: int):
+    """Withdraw one of thine orders"""
+    await dispatch(ctx, core_cancelorder, order_id=order_id)
+
+@tree.command(name="bid", description="Offer to buy goods at thy price")
+@app_commands.describe(item="Item to buy", price="Most thou wilt pay apiece", qty="How many")
+@app_commands.guild_only
+async def slash_bid(interaction: discord.Interaction, item: str, price: int, qty: int = 1):
+    await run_slash(interaction, core_bid, item=item, price=price, qty=qty)
+
+@tree.command(name="ask", description="Offer to sell goods at thy price")
+@app_commands.describe(item="Item to sell", price="Least thou wilt take apiece", qty="How many")
+@app_commands.guild_only
+async def slash_ask(interaction: discord.Interaction, item: str, price: int, qty: int = 1):
+    await run_slash(interaction, core_ask, item=item, price=price, qty=qty)
+
+@tree.command(name="orders", description="Survey an item's trading book, or thine own orders")
+@app_commands.describe(item="Item whose book to show (leave empty for thine own orders)")
+@app_commands.guild_only
+async def slash_orders(interaction: discord.Interaction, item: str = None):
+    await run_slash(interaction, core_orders, item=item)
+
+@tree.command(name="cancelorder", description="Withdraw one of thine orders")
+@app_commands.describe(order_id="Number of the order to withdraw")
+@app_commands.guild_only
+async def slash_cancelorder(interaction: discord.Interaction, order_id: int):
+    await run_slash(interaction, core_cancelorder, order_id=order_id)
+
+# ---------- AUCTION COMMANDS ----------
+@core_command("author")
+async def core_auction(actor, item: str, min_bid: int, minutes: int = 60, qty: int = 1):
+    item = item.lower().replace(" ", "_")
+    if item not in WARES:
+        return Reply(embed=medieval_response(f"No such ware as '{item}' exists in the realm!", success=False))
+    if WARES[item]["type"] != "title" and not tradeable(item):
+        return Reply(embed=medieval_response(f"**{item.replace('_', ' ').title()}** cannot be put under the hammer!", success=False))
+    if min_bid < 1 or not 1 <= minutes <= AUCTION_MAX_MINUTES or not 0 < qty <= TRADE_MAX_QTY:
+        return Reply(embed=medieval_response(
+            f"The opening bid must be at least 1 gold, the auction 1 to {AUCTION_MAX_MINUTES} minutes long "
+            f"and the lot 1 to {TRADE_MAX_QTY} strong!", success=False))
+    seller_id = actor.author.id
+    if WARES[item]["type"] == "title":
+        # Titles are the Crown's to sell, one at a time
+        if not actor.author.guild_permissions.administrator:
+            return Reply(embed=medieval_response("Only the Crown's stewards may auction noble titles!", success=False))
+        if not get_title_role(actor.guild.id, item.removesuffix("_title")):
+            return Reply(embed=medieval_response(f"Set the title's role with `{PREFIX}ntset` before auctioning it!", success=False))
+        seller_id, qty = None, 1
+    auction = auction_house.open(seller_id, actor.guild.id, actor.channel.id if actor.channel else None, item, qty, min_bid, minutes)
+    if auction is None:
+        return Reply(embed=medieval_response(f"Thou hast not **{qty}× {item}** to put under the hammer!", success=False))
+    item_display = item.replace('_', ' ').title()
+    embed = medieval_embed(
+        title=f"🔨 Lot #{auction.auction_id}: {item_display}",
+        description=f"**{qty}× {item_display}**, offered by {'the Crown' if seller_id is None else actor.author.display_name}",
+        color_name="gold"
+    )
+    embed.add_field(name="💰 Opening Bid", value=f"**{min_bid}** gold", inline=True)
+    embed.add_field(name="⏳ Closes", value=f"<t:{int(auction.closes_at.timestamp())}:R>", inline=True)
+    embed.set_footer(text=f"Bid with {PREFIX}auctionbid {auction.auction_id} <amount>")
+    return Reply(embed=embed)
+
+AUCTION_REFUSALS = {
+    "unknown": "No such lot is under the hammer!",
+    "own": "Thou canst not bid on thine own lot!",
+    "poor": "Thy purse cannot cover such a bid!",
+}
+
+@core_command("author")
+async def core_auctionbid(actor, auction_id: int, amount: int):
+    status, auction = auction_house.bid(actor.author.id, actor.guild.id, auction_id, amount)
+    if status == "low":
+        return Reply(embed=medieval_response(f"Thy bid must be at least **{auction.next_bid()}** gold!", success=False))
+    if status != "ok":
+        return Reply(embed=medieval_response(AUCTION_REFUSALS[status], success=False))
+    return Reply(embed=medieval_response(
+        f"Thou leadest the bidding for lot #{auction_id} at **{amount}** gold!",
+        success=True,
+        extra=f"The hammer falls <t:{int(auction.closes_at.timestamp())}:R>. Keep the coin in thy purse to claim it."
+    ))
+
+@core_command()
+async def core_auctions(actor):
+    lots = sorted((a for a in auction_house.auctions.values() if a.guild_id == actor.guild.id), key=lambda a: a.closes_at)
+    lines = []
+    for a in lots[:20]:
+        bid = f"**{a.high_bid}** by {member_name(actor.guild, a.high_bidder)}" if a.high_bid else f"opens at **{a.min_bid}**"
+        lines.append(f"`#{a.auction_id}` {a.qty}× {a.item.replace('_', ' ').title()}: {bid}, closes <t:{int(a.closes_at.timestamp())}:R>")
+    embed = medieval_embed(
+        title="🔨 The Auction House",
+        description="\n".join(lines) or f"No lots are under the hammer. Use `{PREFIX}auction` to offer one.",
+        color_name="gold"
+    )
+    if len(lots) > 20:
+        embed.set_footer(text=f"…and {len(lots) - 20} more lots")
+    return Reply(embed=embed)
+
+@bot.command()
+@commands.guild_only()
+async def auction(ctx, item: str, min_bid: int, minutes: int = 60, qty: int = 1):
+    """Put goods under the hammer"""
+    await dispatch(ctx, core_auction, item=item, min_bid=min_bid, minutes=minutes, qty=qty)
+
+@bot.command()
+@commands.guild_only()
+async def auctionbid(ctx, auction_id: int, amount: int):
+    """Bid on a lot under the hammer"""
+    await dispatch(ctx, core_auctionbid, auction_id=auction_id, amount=amount)
+
+@bot.command()
+@commands.guild_only()
+async def auctions(ctx):
+    """Survey the lots under the hammer"""
+    await dispatch(ctx, core_auctions)
+
+@tree.command(name="auction", description="Put goods under the hammer")
+@app_commands.describe(item="Item to auction", min_bid="Opening bid in gold", minutes="How long bidding stays open", qty="How many")
+@app_commands.guild_only
+async def slash_auction(interaction: discord.Interaction, item: str, min_bid: int, minutes: int = 60, qty: int = 1):
+    await run_slash(interaction, core_auction, item=item, min_bid=min_bid, minutes=minutes, qty=qty)
+
+@tree.command(name="auctionbid", description="Bid on a lot under the hammer")
+@app_commands.describe(auction_id="Lot number", amount="Thy bid in gold")
+@app_commands.guild_only
+async def slash_auctionbid(interaction: discord.Interaction, auction_id: int, amount: int):
+    await run_slash(interaction, core_auctionbid, auction_id=auction_id, amount=amount)
+
+@tree.command(name="auctions", description="Survey the lots under the hammer")
+@app_commands.guild_only
+async def slash_auctions(interaction: discord.Interaction):
+    await run_slash(interaction, core_auctions)
+
+# ---------- CRAFTING COMMANDS ----------
+def ware_list(wares):
+    return ", ".join(f"{qty}× {ware.replace('_', ' ').title()}" for ware, qty in wares)
+
+@core_command("author")
+async def core_craft(actor, item_name: str, qty: int = None):
+    cart, bad = parse_cart(item_name)
+    if cart and qty is not None and len(cart) == 1:
+        cart = [(cart[0][0], qty)]  # The slash command's quantity option
+    if not cart or len(cart) > 1 or not 0 < cart[0][1] <= CART_MAX_QTY:
+        return Reply(embed=medieval_response(
+            f"Name one ware and a quantity of 1 to {CART_MAX_QTY}, as in `{PREFIX}craft shortsword 2`!",
+            success=False
+        ))
+    product, n = cart[0]
+    if product not in RECIPES:
+        return Reply(embed=medieval_response(
+            f"No smith in the realm knows how to make '{product.replace('_', ' ')}'!",
+            success=False,
+            extra=f"Use `{PREFIX}craftable` to see what thou canst make."
+        ))
+    changes, short = craft_ware(actor.author.id, product, n, actor.guild.id)
+    if short:
+        return Reply(embed=medieval_response(
+            f"Thou lackest {ware_list(sorted(short.items()))} to make {n}× {product.replace('_', ' ').title()}!",
+            success=False,
+            extra=f"A {product.replace('_', ' ')} takes {ware_list(RECIPES[product].items())}."
+        ))
+    used = sorted(((ware, -qty) for ware, qty in changes.items() if qty < 0), key=lambda c: RECIPE_RANK[c[0]])
+    embed = medieval_embed(
+        title="🔨 Crafted!",
+        description=f"Hammer rings on anvil! Thou hast made **{n}× {product.replace('_', ' ').title()}**.",
+        color_name="green"
+    )
+    embed.add_field(name="Consumed", value=ware_list(used), inline=False)
+    embed.set_footer(text=f"Use {PREFIX}sack to admire thy handiwork")
+    return Reply(embed=embed)
+
+@core_command()
+async def core_craftable(actor):
+    counts = craftable_from(get_inventory(actor.author.id, actor.guild.id))
+    lines = [f"• **{ware.replace('_', ' ').title()}**: up to **{count}** ({ware_list(RECIPES[ware].items())} each)"
+             for ware, count in counts.items()]
+    if not lines:
+        return Reply(embed=medieval_response(
+            "Thy sack holds naught that a smith could work!",
+            success=False,
+            extra=f"Gather iron ore, furs or herbs from the {PREFIX}market, then `{PREFIX}craft`."
+        ))
+    pages = pack_embeds(pack_lines("🔨 Thou Canst Make", lines), "🔨 The Workshop",
+                        "Intermediates such as iron ingots are smelted along the way.",
+                        f"Use {PREFIX}craft <ware> [quantity] to set to work", "blue")
+    return Reply(embed=pages[0])
+
+@bot.command(aliases=['forge', 'smith'])
+@commands.guild_only()
+async def craft(ctx, *, item_name: str):
+    """Craft a ware from thy materials: `shortsword` or `iron ingot 5`"""
+    await dispatch(ctx, core_craft, item_name=item_name)
+
+@bot.command(aliases=['recipes'])
+@commands.guild_only()
+async def craftable(ctx):
+    """See everything thy materials can make"""
+    await dispatch(ctx, core_craftable)
+
+@tree.command(name="craft", description="Craft a ware from thy materials")
+@app_commands.describe(item="The ware to craft", quantity="How many to craft (default 1)")
+@app_commands.guild_only
+async def slash_craft(interaction: discord.Interaction, item: str, quantity: int = None):
+    await run_slash(interaction, core_craft, item_name=item, qty=quantity)
+
+@tree.command(name="craftable", description="See everything thy materials can make")
+@app_commands.guild_only
+async def slash_craftable(interaction: discord.Interaction):
+    await run_slash(interaction, core_craftable)
 
 # ---------- ON READY ----------
+@bot.event
+async def setup_hook():
+    await coordinator.subscribe("invalidate", _apply_invalidation)
+    await coordinator.subscribe("auctions", auction_house.on_published)
+    outbound.start()
+    auction_house.start()
+    market_prices.start()
+    scheduler.start()
+
 @bot.event
 async def on_ready():
     print(f'🏪 Royal Market Bot hath awakened as {bot.user} (ID: {bot.user.id})')
@@ -2127,18 +5305,48 @@ async def on_ready():
         print(f"✅ Synced {len(synced)} slash commands")
     except Exception as e:
         print(f"❌ Failed to sync slash commands: {e}")
-    
-    # Start the background tasks after bot is ready
-    if not levy_debt_interest.is_running():
-        levy_debt_interest.start()
-    if not collect_royal_tax.is_running():
-        collect_royal_tax.start()
+    if MEMBER_DIRECTORY == "database":
+        spawn(backfill_new_guilds())
+
+@bot.event
+async def on_guild_join(guild):
+    stock_admins(guild.id, guild_admins(guild))
+    if MEMBER_DIRECTORY == "database":
+        await backfill_directory(guild)
+
+@bot.event
+async def on_member_join(member):
+    if MEMBER_DIRECTORY == "database":
+        record_members(member.guild.id, [member])
+
+@bot.event
+async def on_raw_member_remove(payload):
+    _known_admins[payload.guild_id].discard(payload.user.id)
+    if MEMBER_DIRECTORY == "database":
+        forget_member(payload.guild_id, payload.user.id)
+
+@bot.event
+async def on_member_update(before, after):
+    if MEMBER_DIRECTORY == "database" and before.roles != after.roles:
+        record_members(after.guild.id, [after])
+    if before.guild_permissions.administrator != after.guild_permissions.administrator:
+        note_admin(after)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if after.permissions.administrator and not before.permissions.administrator:
+        stock_admins(after.guild.id, [member.id for member in after.members if not member.bot])
 
 # ---------- ERROR HANDLER ----------
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         return
+    if isinstance(error, commands.CommandInvokeError) and isinstance(error.original, CoordinatorTimeout):
+        return await ctx.send(embed=medieval_response(
+            "The royal ledger is busy with thy other dealings! Try again anon.",
+            success=False
+        ))
     
     # Medieval error messages
     error_messages = {
@@ -2200,16 +5408,131 @@ async def on_command_error(ctx, error):
 
 @tree.error
 async def on_app_command_error(interaction: discord.Interaction, error):
+    # The command may already have deferred or replied
+    respond = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
     if isinstance(error, app_commands.MissingPermissions):
-        await interaction.response.send_message("🚫 Thou lacketh the merchant's seal for this command!", ephemeral=True)
+        await respond("🚫 Thou lacketh the merchant's seal for this command!", ephemeral=True)
     elif isinstance(error, app_commands.CommandNotFound):
         return
+    elif isinstance(error, app_commands.CommandInvokeError) and isinstance(error.original, CoordinatorTimeout):
+        await respond("The royal ledger is busy with thy other dealings! Try again anon.", ephemeral=True)
     else:
-        await interaction.response.send_message("An ill omen befell the royal merchants!", ephemeral=True)
+        await respond("An ill omen befell the royal merchants!", ephemeral=True)
         print("🏪 Slash command error:", type(error).__name__, error)
 
+# ---------- LIFECYCLE ----------
+# SIGTERM (a deploy) or SIGINT stops the bot in dependency order: no new
+# commands, job slots or auction closings start; commands and work already
+# running get two thirds of SHUTDOWN_TIMEOUT to finish (chunked jobs cut short resume
+# from their checkpoints); announcements are cried and delivered in what is
+# left; buffered writes are flushed; then the gateway and database
+# connections close and each WAL is checkpointed into its database file.
+shutting_down = False
+_in_flight = set()  # Tasks running a command through dispatch
+
+async def settle_commands(timeout):
+    """Let commands already past dispatch's gate reply and write; returns how many outlived timeout"""
+    if not _in_flight:
+        return 0
+    _, pending = await asyncio.wait(set(_in_flight), timeout=timeout)
+    return len(pending)
+
+async def settle_tasks(timeout):
+    """Let spawned work (job runs, sentences, backfills) finish; cancel what outlives timeout"""
+    herald.flush()  # Its timers are spawned tasks too, and would only sleep out the window
+    pending = set(_background_tasks)
+    if pending:
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
+
+def checkpoint_databases():
+    for path in dict.fromkeys([DB_NAME, *ledger_paths()]):
+        with db_connect(path) as db:
+            busy, _, _ = db.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            print(f"⚠️ {path} is still in use elsewhere; its WAL was left in place")
+
+async def shutdown(timeout=SHUTDOWN_TIMEOUT):
+    global shutting_down
+    if shutting_down:
+        return
+    shutting_down = True
+    deadline = time.monotonic() + timeout
+    print("🌙 The market is closing its stalls...")
+    await scheduler.stop()
+    await auction_house.stop()
+    await market_prices.stop()
+    settle_by = time.monotonic() + timeout * 2 / 3
+    unfinished = await settle_commands(timeout * 2 / 3)
+    if unfinished:
+        print(f"⚠️ {unfinished} command(s) still running at the deadline")
+    cancelled = await settle_tasks(max(0, settle_by - time.monotonic()))
+    if cancelled:
+        print(f"⚠️ {cancelled} background task(s) cut short at the deadline")
+    herald.flush()
+    if not await outbound.drain(max(0, deadline - time.monotonic())):
+        print("⚠️ Some heralds' messages were not delivered before the deadline")
+    await outbound.stop()
+    write_behind.flush()
+    await bot.close()
+    await coordinator.close()
+    close_readers()
+    checkpoint_databases()
+    print("🏰 The market is closed. Fare thee well!")
+
+async def serve():
+    """Run the bot until it disconnects for good or a signal asks it to stop"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    def on_signal(sig):
+        print(f"📯 Received {sig.name}")
+        # A second signal falls through to the default handler and ends the process at once
+        loop.remove_signal_handler(sig)
+        stop.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):  # No loop signal handlers on Windows
+            loop.add_signal_handler(sig, on_signal, sig)
+    discord.utils.setup_logging()
+    async with bot:
+        runner = asyncio.create_task(bot.start(TOKEN))
+        stopping = asyncio.create_task(stop.wait())
+        await asyncio.wait({runner, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        await shutdown()
+        await runner  # Re-raises a login or connection failure once everything is flushed
+
 # ---------- RUN ----------
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["coordinator"]:
+        # Run the shared coordination server that bot processes connect to
+        asyncio.run(CoordinatorServer().serve(sys.argv[2] if len(sys.argv) > 2 else COORDINATOR_URL or "unix:royal_market.sock"))
+        sys.exit(0)
+    if sys.argv[1:2] == ["migrate-guilds"]:
+        # ECONOMY_MODE=guild python pot.py migrate-guilds [--copy-all | --leave-homeless] <guild_id> [<guild_id> ...]
+        # Users move to the first listed guild they belong to, by the member
+        # directory or else the REST member lists; --copy-all gives every guild
+        # a copy of every user instead. Holders who belong to none of the
+        # guilds stop the migration unless --leave-homeless is given.
+        if not PER_GUILD_ECONOMY:
+            sys.exit("⚠️ Run migrate-guilds with ECONOMY_MODE=guild and the ECONOMY_SHARDS the bot will use")
+        init_db()
+        flags = {"--copy-all", "--leave-homeless"}
+        guild_ids = [int(g) for g in sys.argv[2:] if g not in flags]
+        homes = None if "--copy-all" in sys.argv[2:] else asyncio.run(home_guilds(guild_ids))
+        if homes is not None:
+            homeless = homeless_users(homes)
+            if not homes:
+                sys.exit("⚠️ No member of the listed guilds could be found; nothing would move")
+            if homeless and "--leave-homeless" not in sys.argv[2:]:
+                sys.exit(f"⚠️ {len(homeless)} holders belong to none of the listed guilds (e.g. {', '.join(map(str, homeless[:5]))}); "
+                         f"list their guilds too, or pass --leave-homeless to leave them in {DB_NAME}")
+        migrate_to_guild_shards(guild_ids, homes)
+        sys.exit(0)
     init_db()
     print("🏪 Initializing Royal Market Economy Bot...")
     print("💰 Loading coin purses and ledgers...")
@@ -2221,4 +5544,4 @@ if __name__ == "__main__":
     print(f"📅 Daily stipend: {MAX_DAILY_GOLD}g maximum")
     print("⏰ Cooldown system: Labour (1 hour), Daily (24 hours), Battle (1 hour), Gambling (no cooldown)")
     print("🔗 Loading slash commands...")
-    bot.run(TOKEN)
+    asyncio.run(serve())
@@ -0,0 +1,198 @@
+# simulate.py — Monte Carlo economy simulator for the Royal Market
+# Plays millions of player-days with NumPy using the bot's own payout tables,
+# so designers can see inflation, house edge, inequality and debtor's prison
+# rates before changing a constant in pot.py.
+#
+#   python simulate.py --players 100000 --days 30
+#   python simulate.py --duels 2000     # equipment balance round robin
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from pot import (
+    CAP_GOLD, COINFLIP_SIDES, DAILY_TAX, DAYS_BEFORE_PRISON, DEBT_INTEREST_RATE, DICE_SIDES,
+    LABOUR_JOBS, MAX_DAILY_GOLD, ROYAL_MARKET, SLOT_COST, SLOT_JACKPOTS, SLOT_PAIR, SLOT_SYMBOLS, SLOT_TRIPLE,
+    loadout_bonus, simulate_duels, slot_outcome,
+)
+
+STARTING_GOLD = 10  # What get_pouch grants a newcomer
+
+# Labour wage ranges as arrays, one row per job
+JOB_LOW = np.array([job["gold"][0] for job in LABOUR_JOBS.values()])
+JOB_HIGH = np.array([job["gold"][1] for job in LABOUR_JOBS.values()])
+# Three-of-a-kind payout per symbol index
+SLOT_TRIPLE_WIN = np.array([SLOT_JACKPOTS.get(sym, SLOT_TRIPLE)[0] for sym in SLOT_SYMBOLS])
+
+class Economy:
+    """Purses of every simulated player, settled like add_coin settles them"""
+    def __init__(self, players, rng):
+        self.rng = rng
+        self.gold = np.full(players, STARTING_GOLD, dtype=np.int64)
+        self.debt = np.zeros(players, dtype=np.int64)
+        self.debt_days = np.zeros(players, dtype=np.int64)  # Days since debt_since, 0 when clear
+        self.wagered = {"gamble": 0, "slots": 0, "coinflip": 0}
+        self.returned = {"gamble": 0, "slots": 0, "coinflip": 0}
+
+    def settle(self, delta):
+        """Vectorised settle_coin: income pays debt first, overdrafts become debt"""
+        income = delta > 0
+        repay = np.where(income, np.minimum(delta, self.debt), 0)
+        self.debt -= repay
+        delta = delta - repay
+        new_gold = self.gold + delta
+        overdraft = new_gold < 0
+        self.debt += np.where(overdraft, -new_gold, 0)
+        self.gold = np.minimum(np.maximum(new_gold, 0), CAP_GOLD)
+        self.debt_days[self.debt == 0] = 0
+
+    def labour(self, shifts):
+        for _ in range(shifts):
+            job = self.rng.integers(0, len(JOB_LOW), self.gold.size)
+            self.settle(self.rng.integers(JOB_LOW[job], JOB_HIGH[job] + 1))
+
+    def daily(self):
+        self.settle(np.full(self.gold.size, MAX_DAILY_GOLD, dtype=np.int64))
+
+    def gamble(self, plays, wager):
+        for _ in range(plays):
+            playing = self.gold >= wager
+            player = self.rng.integers(1, DICE_SIDES + 1, self.gold.size)
+            house = self.rng.integers(1, DICE_SIDES + 1, self.gold.size)
+            result = np.where(playing, np.sign(player - house) * wager, 0)
+            self.wagered["gamble"] += int(playing.sum()) * wager
+            self.returned["gamble"] += int((np.where(playing, wager, 0) + result).sum())
+            self.settle(result)
+
+    def coinflip(self, plays, wager):
+        for _ in range(plays):
+            playing = self.gold >= wager
+            won = self.rng.integers(0, len(COINFLIP_SIDES), self.gold.size) == 0
+            result = np.where(playing, np.where(won, wager, -wager), 0)
+            self.wagered["coinflip"] += int(playing.sum()) * wager
+            self.returned["coinflip"] += int((np.where(playing, wager, 0) + result).sum())
+            self.settle(result)
+
+    def slots(self, spins):
+        for _ in range(spins):
+            playing = self.gold >= SLOT_COST
+            reels = self.rng.integers(0, len(SLOT_SYMBOLS), (self.gold.size, 3))
+            a, b, c = reels[:, 0], reels[:, 1], reels[:, 2]
+            triple = (a == b) & (b == c)
+            pair = ~triple & ((a == b) | (b == c) | (a == c))
+            win = np.where(triple, SLOT_TRIPLE_WIN[a], np.where(pair, SLOT_PAIR[0], 0))
+            self.wagered["slots"] += int(playing.sum()) * SLOT_COST
+            self.returned["slots"] += int(np.where(playing, win, 0).sum())
+            self.settle(np.where(playing, -SLOT_COST, 0))
+            self.settle(np.where(playing, win, 0))
+
+    def royal_tax(self, nobles):
+        """Tax everyone DAILY_TAX and share what was actually collected among the nobles"""
+        before = self.gold.copy()
+        self.settle(np.full(self.gold.size, -DAILY_TAX, dtype=np.int64))
+        total = int((before - self.gold).sum())
+        if nobles.any():
+            count = int(nobles.sum())
+            share = np.zeros(self.gold.size, dtype=np.int64)
+            share[nobles] = total // count
+            share[np.flatnonzero(nobles)[:total % count]] += 1
+            self.settle(share)
+
+    def levy_interest(self):
+        indebted = self.debt > 0
+        self.debt = np.where(indebted, (self.debt * (1 + DEBT_INTEREST_RATE)).astype(np.int64), 0)
+        self.debt_days[indebted] += 1
+
+    def report(self):
+        gold = np.sort(self.gold)
+        total = gold.sum()
+        n = gold.size
+        gini = (2 * np.arange(1, n + 1) @ gold / (n * total) - (n + 1) / n) if total else 0.0
+        return {
+            "money_supply": int(total),
+            "mean_gold": float(gold.mean()),
+            "total_debt": int(self.debt.sum()),
+            "gini": float(gini),
+            "in_debt": float((self.debt > 0).mean()),
+            "in_prison": float((self.debt_days >= DAYS_BEFORE_PRISON).mean()),
+        }
+
+def slots_return_to_player():
+    """Exact slots payback per gold spent, by enumerating every reel combination"""
+    combos = list(itertools.product(SLOT_SYMBOLS, repeat=3))
+    return sum(slot_outcome(*combo)[0] for combo in combos) / (len(combos) * SLOT_COST)
+
+def simulate(players, days, shifts, gamble_plays, coinflip_plays, slot_spins, wager, noble_fraction, seed, report_every):
+    rng = np.random.default_rng(seed)
+    economy = Economy(players, rng)
+    nobles = rng.random(players) < noble_fraction
+    started = time.perf_counter()
+    print(f"{'day':>5} {'money supply':>14} {'mean gold':>10} {'total debt':>12} {'gini':>6} {'in debt':>8} {'prison':>7}")
+    for day in range(1, days + 1):
+        economy.labour(shifts)
+        economy.daily()
+        economy.gamble(gamble_plays, wager)
+        economy.coinflip(coinflip_plays, wager)
+        economy.slots(slot_spins)
+        economy.royal_tax(nobles)
+        economy.levy_interest()
+        if day % report_every == 0 or day == days:
+            r = economy.report()
+            print(f"{day:>5} {r['money_supply']:>14,} {r['mean_gold']:>10.1f} {r['total_debt']:>12,} "
+                  f"{r['gini']:>6.3f} {r['in_debt']:>7.1%} {r['in_prison']:>7.1%}")
+    elapsed = time.perf_counter() - started
+    print()
+    for game in economy.wagered:
+        wagered = economy.wagered[game]
+        edge = 1 - economy.returned[game] / wagered if wagered else 0.0
+        print(f"🎲 {game:<9} wagered {wagered:>14,}  house edge {edge:>7.2%}")
+    print(f"🎰 slots exact payback: {slots_return_to_player():.2%} of every gold spent")
+    print(f"⏱️  {players * days:,} player-days in {elapsed:.2f}s ({players * days / elapsed:,.0f}/s)")
+    return economy
+
+def duel_round_robin(duels, seed):
+    """Every weapon/armour loadout fights every other until someone falls"""
+    rng = np.random.default_rng(seed)
+    weapons = [None] + [item for item, data in ROYAL_MARKET.items() if data.get("type") == "weapon"]
+    armours = [None] + [item for item, data in ROYAL_MARKET.items() if data.get("type") == "armor"]
+    loadouts = [[item for item in pair if item] for pair in itertools.product(weapons, armours)]
+    started = time.perf_counter()
+    results = []
+    for loadout in loadouts:
+        wins = rounds = 0.0
+        for rival in loadouts:
+            won, _, drawn, length = simulate_duels(loadout, rival, duels, rng)
+            wins += won + drawn / 2
+            rounds += length
+        results.append((wins / len(loadouts), rounds / len(loadouts), loadout))
+    elapsed = time.perf_counter() - started
+    print(f"{'loadout':<28} {'atk':>4} {'def':>4} {'win rate':>9} {'rounds':>7}")
+    for win_rate, rounds, loadout in sorted(results, key=lambda r: -r[0]):
+        atk, defense = loadout_bonus(loadout)
+        print(f"{' + '.join(loadout) or 'bare hands':<28} {atk:>4} {defense:>4} {win_rate:>8.1%} {rounds:>7.1f}")
+    bouts = duels * len(loadouts) ** 2
+    print(f"⏱️  {bouts:,} duels in {elapsed:.2f}s ({bouts / elapsed:,.0f}/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the Royal Market economy")
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--shifts", type=int, default=4, help="labour shifts per player per day (max 24)")
+    parser.add_argument("--gamble", type=int, default=2, help="dice games per player per day")
+    parser.add_argument("--coinflip", type=int, default=2, help="coin flips per player per day")
+    parser.add_argument("--slots", type=int, default=10, help="slot pulls per player per day")
+    parser.add_argument("--wager", type=int, default=10, help="gold staked on each dice game and coin flip")
+    parser.add_argument("--nobles", type=float, default=0.01, help="fraction of players holding a tax role")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report-every", type=int, default=5)
+    parser.add_argument("--duels", type=int, default=0, help="instead of the economy, fight this many duels per loadout pairing")
+    args = parser.parse_args()
+    if args.duels:
+        duel_round_robin(args.duels, args.seed)
+        return
+    simulate(args.players, args.days, min(args.shifts, 24), args.gamble, args.coinflip, args.slots,
+             args.wager, args.nobles, args.seed, args.report_every)
+
+if __name__ == "__main__":
+    main()